@@ -0,0 +1,55 @@
+"""Compare two run.py result files phase by phase.
+
+    python benchmarks/compare.py baseline.json results.json --threshold 10
+
+Prints the best time of every phase in both files and the change.  Exits
+with 1 if any phase got slower than the threshold (in percent), so it can
+gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold):
+    """Yield (phase, old seconds, new seconds, change %, regressed)."""
+    for phase, result in new["phases"].items():
+        before = old["phases"].get(phase)
+        if before is None:
+            yield phase, None, result["best"], None, False
+            continue
+        change = (result["best"] / before["best"] - 1) * 100 if before["best"] else 0.0
+        yield phase, before["best"], result["best"], change, change > threshold
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark results.")
+    parser.add_argument("old", help="baseline results")
+    parser.add_argument("new", help="results to check")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="slowdown in percent that counts as a regression (default: 10)")
+    args = parser.parse_args(argv)
+
+    old, new = load(args.old), load(args.new)
+    if old["meta"].get("fixture") != new["meta"].get("fixture"):
+        print("warning: results come from different fixtures", file=sys.stderr)
+
+    print(f"{old['meta'].get('commit') or 'old':>22} -> {new['meta'].get('commit') or 'new'}")
+    regressed = False
+    for phase, before, after, change, slower in compare(old, new, args.threshold):
+        if before is None:
+            print(f"{phase:>10}: {'-':>9}   {after:9.3f}s   (new)")
+            continue
+        mark = "  REGRESSION" if slower else ""
+        print(f"{phase:>10}: {before:9.3f}s  {after:9.3f}s  {change:+7.1f}%{mark}")
+        regressed = regressed or slower
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
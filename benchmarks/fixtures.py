@@ -0,0 +1,140 @@
+"""Synthetic input folders for the benchmarks.
+
+    python benchmarks/fixtures.py /tmp/bench-100k --preset 100k --layout deep
+
+Trees are reproducible: the same preset, layout and seed always give the
+same names and sizes.  A fixture.json in the root records how it was made
+so run.py can reuse it instead of building it again.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+PRESETS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+LAYOUTS = ("flat", "deep")
+
+# (share of files, smallest, largest size in bytes).  Mostly small files
+# with a long tail, about 15 KB per file on average.
+SIZE_MIX = (
+    (0.90, 0, 4 * 1024),
+    (0.095, 4 * 1024, 64 * 1024),
+    (0.005, 64 * 1024, 4 * 1024 * 1024),
+)
+
+# Presets this big are written sparse unless asked otherwise
+SPARSE_FROM = 1_000_000
+
+# Deep layout: folders this many levels down, each with this many children
+DEEP_LEVELS = 5
+DEEP_FANOUT = 6
+
+NAME_PATTERNS = (
+    "IMG_{n:06d}.JPG",
+    "DSC{n:05d}.jpg",
+    "document {n}.pdf",
+    "Report_{n:04d}_final.docx",
+    "scan-{n:07d}.tiff",
+    "café_{n}.txt",
+    "track {n:03d} - intro.mp3",
+    "{n:08x}.bin",
+)
+
+MANIFEST = "fixture.json"
+
+
+def _folders(layout):
+    if layout == "flat":
+        return [""]
+    folders = [""]
+    level = [""]
+    for depth in range(DEEP_LEVELS):
+        level = [os.path.join(parent, f"dir{depth}_{k}") for parent in level for k in range(DEEP_FANOUT)]
+        folders.extend(level)
+    return folders
+
+
+def plan_tree(count, layout="flat", seed=0):
+    """[(relative path, size)] of a fixture, without touching the disk."""
+    rng = random.Random(seed)
+    folders = _folders(layout)
+    shares = [share for share, _, _ in SIZE_MIX]
+    files = []
+    for n in range(count):
+        _, low, high = rng.choices(SIZE_MIX, weights=shares)[0]
+        name = NAME_PATTERNS[n % len(NAME_PATTERNS)].format(n=n)
+        files.append((os.path.join(folders[n % len(folders)], name), rng.randint(low, high)))
+    return files
+
+
+def _write_folder(root, entries, sparse, block):
+    for path, size in entries:
+        with open(os.path.join(root, path), "wb") as f:
+            if sparse:
+                f.truncate(size)
+                continue
+            remaining = size
+            while remaining:
+                n = f.write(block[:remaining])
+                remaining -= n
+
+
+def make_tree(root, count, layout="flat", seed=0, sparse=None, workers=16):
+    """Build (or reuse) a fixture under root and return its manifest."""
+    if sparse is None:
+        sparse = count >= SPARSE_FROM
+    spec = {"count": count, "layout": layout, "seed": seed, "sparse": sparse}
+
+    manifest_path = os.path.join(root, MANIFEST)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if {key: manifest.get(key) for key in spec} == spec:
+            return manifest
+    except (OSError, ValueError):
+        pass
+
+    files = plan_tree(count, layout, seed)
+    by_folder = {}
+    for path, size in files:
+        by_folder.setdefault(os.path.dirname(path), []).append((path, size))
+
+    data = os.path.join(root, "data")
+    for folder in by_folder:
+        os.makedirs(os.path.join(data, folder), exist_ok=True)
+    block = random.Random(seed).randbytes(1024 * 1024)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(lambda entries: _write_folder(data, entries, sparse, block),
+                              by_folder.values()):
+            pass
+
+    manifest = dict(spec, data=data, bytes=sum(size for _, size in files),
+                    folders=len(by_folder))
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a benchmark input folder.")
+    parser.add_argument("root", help="folder to build the fixture in")
+    parser.add_argument("--preset", choices=PRESETS, default="1k")
+    parser.add_argument("--count", type=int, help="number of files, overrides --preset")
+    parser.add_argument("--layout", choices=LAYOUTS, default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sparse", action=argparse.BooleanOptionalAction, default=None,
+                        help=f"create files without writing their data "
+                             f"(default: on from {SPARSE_FROM:,} files)")
+    args = parser.parse_args(argv)
+
+    count = args.count or PRESETS[args.preset]
+    manifest = make_tree(args.root, count, args.layout, args.seed, args.sparse)
+    json.dump(manifest, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
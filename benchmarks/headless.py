@@ -0,0 +1,161 @@
+"""Run SimpleFileRenamer without a display.
+
+install() puts a stand-in tkinter into sys.modules before app is imported.
+Every widget accepts any call, the Treeview keeps just enough state for
+VirtualTable, dialogs answer "yes" and root.after() only records the
+callback: the benchmark pumps _drain_ui_events itself.  What gets timed
+is our own code, not Tk's drawing.
+"""
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Widget:
+    def __init__(self, *args, **kwargs):
+        self.options = dict(kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("winfo_"):
+            return lambda *args, **kwargs: 0
+        return lambda *args, **kwargs: None
+
+    def config(self, *args, **kwargs):
+        self.options.update(kwargs)
+
+    configure = config
+
+    def cget(self, key):
+        return self.options.get(key)
+
+
+class Root(Widget):
+    clipboard = ""
+
+    def after(self, ms, fn=None, *args):
+        return "after#0"
+
+    def clipboard_get(self):
+        return self.clipboard
+
+
+class Canvas(Widget):
+    def create_rectangle(self, *args, **kwargs):
+        return 1
+
+
+class Treeview(Widget):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items = {}
+        self.order = []
+
+    def insert(self, parent, index, iid=None, **kwargs):
+        self.items[iid] = kwargs
+        self.order.append(iid)
+        return iid
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.order.remove(iid)
+            del self.items[iid]
+
+    def detach(self, iid):
+        if iid in self.order:
+            self.order.remove(iid)
+
+    def move(self, iid, parent, index):
+        if iid in self.order:
+            self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def item(self, iid, **kwargs):
+        self.items[iid].update(kwargs)
+
+    def get_children(self, item=""):
+        return tuple(self.order)
+
+    def identify_row(self, y):
+        return ""
+
+
+class Variable:
+    def __init__(self, master=None, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def trace_add(self, mode, callback):
+        pass
+
+
+def install():
+    """Register the stand-in tkinter modules; call before importing app."""
+    tk = types.ModuleType("tkinter")
+    for name in ("Frame", "Label", "Entry", "Button", "Spinbox", "LabelFrame", "Menu",
+                 "Toplevel", "Listbox", "Checkbutton", "Scrollbar"):
+        setattr(tk, name, Widget)
+    tk.Tk = Root
+    tk.Canvas = Canvas
+    tk.StringVar = tk.IntVar = tk.BooleanVar = Variable
+    tk.END = "end"
+    tk.TclError = RuntimeError
+
+    ttk = types.ModuleType("tkinter.ttk")
+    ttk.Style = ttk.Combobox = ttk.Scrollbar = Widget
+    ttk.Treeview = Treeview
+
+    messagebox = types.ModuleType("tkinter.messagebox")
+    messagebox.askyesno = lambda *args, **kwargs: True
+    messagebox.showinfo = messagebox.showwarning = messagebox.showerror = lambda *args, **kwargs: None
+
+    filedialog = types.ModuleType("tkinter.filedialog")
+    filedialog.askdirectory = filedialog.askopenfilename = lambda *args, **kwargs: ""
+
+    tk.ttk, tk.messagebox, tk.filedialog = ttk, messagebox, filedialog
+    sys.modules.update({
+        "tkinter": tk,
+        "tkinter.ttk": ttk,
+        "tkinter.messagebox": messagebox,
+        "tkinter.filedialog": filedialog,
+    })
+
+    src = os.path.join(ROOT, "src")
+    if src not in sys.path:
+        sys.path.insert(0, src)
+
+
+def make_app(visible_rows=12):
+    """A SimpleFileRenamer on the stand-in Tk with a table of visible_rows."""
+    install()
+    import app
+
+    renamer = app.SimpleFileRenamer(app.tk.Tk())
+    # settings of the developer's own GUI must not leak into a benchmark
+    renamer.input_dir = renamer.output_dir = None
+    height = (visible_rows + 1) * app.ROW_HEIGHT
+    renamer.table._on_resize(types.SimpleNamespace(height=height))
+    return renamer
+
+
+def pump(renamer, busy, timeout=None):
+    """Drain UI events at UI_REFRESH_HZ while busy() is true."""
+    import app
+
+    interval = 1 / app.UI_REFRESH_HZ
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        renamer._drain_ui_events()
+        if not busy():
+            renamer._drain_ui_events()
+            return
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError("GUI did not finish in time")
+        time.sleep(interval)
@@ -0,0 +1,275 @@
+"""Time every phase of a rename job on a synthetic folder.
+
+    python benchmarks/run.py --preset 100k --layout deep --out results.json
+    python benchmarks/compare.py baseline.json results.json
+
+Phases: scan (folder listing), validate (validate_filename per name),
+preflight (check_plan), rules (apply_rules) and preview (one incremental
+rule edit), transfer (RenameEngine.run) and the GUI paths ui_load
+(load_files), ui_reopen (load_files from the scan cache, until the rows
+show), ui_paste (paste_names) and ui_rename (rename through
+_rename_thread), driven on a stand-in Tk (see headless.py).  Each phase
+runs --repeat times; the JSON holds every run plus the best and median.
+--drop-caches empties the Linux page cache (root only) before each
+writing phase, so transfers read the fixture from disk.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fixtures
+import headless
+
+headless.install()
+
+from renamer import (  # noqa: E402
+    DEFAULT_WORKERS, SCHEDULE_MODES, TRANSFER_MODES, RenameEngine, RulePipeline, apply_rules, check_plan,
+    list_files, make_rule, validate_filename,
+)
+
+PHASES = (
+    "scan", "validate", "preflight", "rules", "preview", "transfer",
+    "ui_load", "ui_reopen", "ui_paste", "ui_rename",
+)
+
+# Phases that write a full copy of the fixture
+WRITING_PHASES = ("transfer", "ui_rename")
+
+RULES = (
+    ("regex", r"^IMG_(\d+)", r"photo-\1"),
+    ("case", "lower", ""),
+    ("template", "{name}_{counter:07}{ext}", ""),
+)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=headless.ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Bench:
+    """State shared by the phases of one fixture."""
+
+    def __init__(self, manifest, scratch, mode, workers, schedule="plan"):
+        self.data = manifest["data"]
+        self.recursive = manifest["layout"] != "flat"
+        self.scratch = scratch
+        self.mode = mode
+        self.workers = workers
+        self.schedule = schedule
+        self.files = list_files(self.data, recursive=self.recursive)
+        self.names = [os.path.basename(path) for path, _ in self.files]
+        self.plan = [(index, path, path) for index, (path, _) in enumerate(self.files)]
+        self.bytes = sum(size or 0 for _, size in self.files)
+
+    def output(self):
+        path = os.path.join(self.scratch, "out")
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return path
+
+    def scan(self):
+        return len(list_files(self.data, recursive=self.recursive))
+
+    def validate(self):
+        for name in self.names:
+            validate_filename(name)
+        return len(self.names)
+
+    def preflight(self):
+        check_plan(self.plan, self.output())
+        return len(self.plan)
+
+    def rules(self):
+        apply_rules([make_rule(*spec) for spec in RULES], self.names)
+        return len(self.names)
+
+    def preview(self):
+        pipeline = RulePipeline(self.names)
+        for spec in RULES:
+            pipeline.append(make_rule(*spec))
+        start = time.perf_counter()
+        pipeline.replace(0, make_rule("regex", r"^IMG_(\d+)", r"pic-\1"))
+        # only the edit is timed, building the pipeline is setup
+        return len(self.names), time.perf_counter() - start
+
+    def transfer(self):
+        engine = RenameEngine(self.data, self.output(), mode=self.mode, workers=self.workers,
+                              schedule=self.schedule)
+        counts = engine.run(self.plan)
+        return counts["done"]
+
+    def _gui(self):
+        gui = headless.make_app()
+        gui.input_dir = self.data
+        gui.output_dir = self.output()
+        gui.subfolders.set("mirror" if self.recursive else "off")
+        gui.transfer_mode.set(self.mode)
+        gui.workers.set(self.workers)
+        gui.schedule.set(self.schedule)
+        # every phase but ui_reopen times a real scan
+        gui.scan_cache = False
+        return gui
+
+    def ui_load(self):
+        gui = self._gui()
+        gui.load_files()
+        headless.pump(gui, lambda: gui.is_scanning)
+        return len(gui.files)
+
+    def ui_reopen(self):
+        gui = self._gui()
+        gui.scan_cache = True
+        gui.load_files()
+        headless.pump(gui, lambda: gui.is_scanning or gui.refreshing)
+        if gui.cache_thread is not None:
+            gui.cache_thread.join()
+        # a fresh window, as after a restart; the reconcile it starts is not timed
+        gui = self._gui()
+        gui.scan_cache = True
+        start = time.perf_counter()
+        gui.load_files()
+        headless.pump(gui, lambda: gui.is_scanning)
+        return len(gui.files), time.perf_counter() - start
+
+    def ui_paste(self):
+        gui = self._gui()
+        gui.load_files()
+        headless.pump(gui, lambda: gui.is_scanning)
+        gui.root.clipboard = "\n".join(f"pasted_{n}.dat" for n in range(len(gui.files)))
+        gui.table.click(0)
+        start = time.perf_counter()
+        gui.paste_names(None)
+        return len(gui.files), time.perf_counter() - start
+
+    def ui_rename(self):
+        gui = self._gui()
+        gui.load_files()
+        headless.pump(gui, lambda: gui.is_scanning)
+        start = time.perf_counter()
+        gui.rename()
+        headless.pump(gui, lambda: gui.is_renaming)
+        return len(gui.files), time.perf_counter() - start
+
+
+def drop_caches():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def run_phase(bench, phase, repeat, cold=False):
+    runs = []
+    items = 0
+    for _ in range(repeat):
+        if cold and phase in WRITING_PHASES:
+            drop_caches()
+        start = time.perf_counter()
+        result = getattr(bench, phase)()
+        elapsed = time.perf_counter() - start
+        if isinstance(result, tuple):
+            items, elapsed = result
+        else:
+            items = result
+        runs.append(elapsed)
+    best = min(runs)
+    return {
+        "items": items,
+        "runs": runs,
+        "best": best,
+        "median": statistics.median(runs),
+        "per_second": items / best if best else None,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the renamer on a synthetic folder.")
+    parser.add_argument("--preset", choices=fixtures.PRESETS, default="1k")
+    parser.add_argument("--count", type=int, help="number of files, overrides --preset")
+    parser.add_argument("--layout", choices=fixtures.LAYOUTS, default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sparse", action=argparse.BooleanOptionalAction, default=None,
+                        help="create fixture files without writing their data")
+    parser.add_argument("--fixture", metavar="DIR",
+                        help="build or reuse the fixture here instead of a temporary folder")
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=PHASES)
+    parser.add_argument("--skip-writes", action="store_true",
+                        help=f"leave out {' and '.join(WRITING_PHASES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mode", choices=TRANSFER_MODES, default="copy")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--schedule", choices=SCHEDULE_MODES, default="plan")
+    parser.add_argument("--drop-caches", action="store_true",
+                        help="start every writing phase with a cold page cache (Linux, root)")
+    parser.add_argument("--out", metavar="FILE", help="write the results here (default: stdout)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    count = args.count or fixtures.PRESETS[args.preset]
+    phases = [p for p in args.phases if not (args.skip_writes and p in WRITING_PHASES)]
+    out = os.path.abspath(args.out) if args.out else None
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory(prefix="renamer-bench-") as scratch:
+        # journals, scan caches and renamer_settings.json of the GUI runs stay in scratch
+        os.environ["XDG_STATE_HOME"] = os.environ["XDG_CACHE_HOME"] = os.environ["LOCALAPPDATA"] = scratch
+        if sys.platform == "darwin":
+            os.environ["HOME"] = scratch
+        os.chdir(scratch)
+
+        root = os.path.join(cwd, args.fixture) if args.fixture else os.path.join(scratch, "fixture")
+        start = time.perf_counter()
+        manifest = fixtures.make_tree(root, count, args.layout, args.seed, args.sparse)
+        setup = time.perf_counter() - start
+
+        bench = Bench(manifest, scratch, args.mode, args.workers, args.schedule)
+        results = {}
+        for phase in phases:
+            results[phase] = run_phase(bench, phase, max(1, args.repeat), args.drop_caches)
+            print(f"{phase:>10}: {results[phase]['best']:.3f}s", file=sys.stderr)
+        os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "mode": args.mode,
+            "workers": args.workers,
+            "schedule": args.schedule,
+            "fixture": {
+                key: manifest[key]
+                for key in ("count", "layout", "seed", "sparse", "bytes", "folders")
+            },
+            "fixture_seconds": setup,
+        },
+        "phases": results,
+    }
+    text = json.dumps(report, indent=2)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,599 @@
+import math
 import os
-import shutil
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import json
 import threading
 import time
+import queue
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from renamer import (
+    COPY_CHUNK, DEFAULT_WORKERS, DEFERRED, DONE, ERROR, SKIPPED, SYNC_MODES, TRANSFER_MODES, UP_TO_DATE,
+    CASE_MODES, LAYOUTS, RULE_TYPES, FileInfo, Journal, RenameEngine, RulePipeline, find_unfinished,
+    MAPPING_TYPES, SCHEDULE_MODES, VERIFY_MODES, RateLimiter, human_readable_size, join_mapping, make_rule, metrics_dir, output_name,
+    diff_snapshot, load_scan, peak_memory, read_mapping, redo_candidate, redo_job, save_scan, scan_files,
+    undo_candidate, undo_job, walk_files,
+)
+
+# Worker threads never touch Tk directly, they post events that the main
+# thread applies in batches this many times per second.
+UI_REFRESH_HZ = 20
+
+ROW_HEIGHT = 28
+
+# Status codes of the rows in FileModel
+PENDING, READY, FINISHED, FAILED, PASSED, CURRENT, UNDONE, WAITING = range(8)
+
+# Treeview tag per status code
+STATUS_TAGS = ("pending", "ready", DONE, ERROR, SKIPPED, UP_TO_DATE, "pending", DEFERRED)
+
+# Status column text per code; PENDING adds the size, FAILED the error
+STATUS_TEXT = ("Pending", "Ready", "✓ Done", "✗ Error", "⏭️ Skipped", "✓ Up to date", "↩ Undone",
+               "⏸ Exists, waiting")
+
+# Status code for a RenameEngine result tag
+RESULT_STATUS = {DONE: FINISHED, ERROR: FAILED, SKIPPED: PASSED, UP_TO_DATE: CURRENT,
+                 DEFERRED: WAITING}
+
+# "off" lists the input folder only, the layouts also walk its subfolders
+SUBFOLDER_MODES = ("off",) + LAYOUTS
+
+# Rule preview is recomputed once typing pauses this long (ms)
+RULE_PREVIEW_DELAY = 150
+
+# Filter box: refilter once typing pauses this long (ms), and the status tags it offers
+FILTER_DELAY = 60
+FILTER_TAGS = ("all",) + tuple(dict.fromkeys(STATUS_TAGS))
+
+# An incremental refresh edits the rows in place up to this many changes,
+# beyond that rebuilding the arrays once is cheaper
+REFRESH_IN_PLACE = 512
+
+# Auto refresh polls the input folder this often (ms)
+WATCH_INTERVAL = 3000
+
+# Field labels of the rules dialog per rule type
+RULE_FIELDS = {
+    "replace": ("Find", "Replace with"),
+    "regex": ("Pattern", "Replace with (\\1, \\g<name>)"),
+    "template": ("{name} {ext} {counter} {size} {mtime}", "Counter start"),
+    "case": (" / ".join(CASE_MODES), ""),
+    "insert": ("Text", "Position (0 = start, end)"),
+    "strip": ("Characters", "Count (-N = from end)"),
+}
+
+
+class FileModel:
+    """The file list, kept in parallel arrays rather than one object per row.
+
+    ``originals`` and ``news`` hold the names, ``sizes``, ``mtimes`` and
+    ``inodes`` are arrays with -1, NaN and 0 for "unknown", ``codes`` has
+    one status byte per row and ``messages`` only the rows that failed.
+    About 110 bytes a row with the names included, where a list per row cost
+    well over twice that.  The status text shown in the table is made from
+    the code on demand.  Size, mtime and inode double as the snapshot an
+    incremental refresh compares the folder with.
+    """
+
+    def __init__(self):
+        self.originals = []
+        self.news = []
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        self.inodes = array("Q")
+        self.codes = bytearray()
+        self.messages = {}
+        # bumped on every change, names_version only when names change and
+        # rows_version when rows are added, removed or reordered
+        self.version = 0
+        self.names_version = 0
+        self.rows_version = 0
+
+    def __len__(self):
+        return len(self.originals)
+
+    def extend(self, rows, new_names=None):
+        """Append (original, size, mtime, inode) rows, as a details scan
+        yields them; the new names default to the file names."""
+        start = len(self.originals)
+        for original, size, mtime, inode in rows:
+            self.originals.append(original)
+            self.sizes.append(-1 if size is None else size)
+            self.mtimes.append(mtime)
+            self.inodes.append(inode)
+        added = len(self.originals) - start
+        if new_names is None:
+            # a bare name is its own basename, no second string is made
+            new_names = map(os.path.basename, self.originals[start:])
+        self.news.extend(new_names)
+        self.codes.extend(bytes(added))
+        self.version += 1
+        self.names_version += 1
+        self.rows_version += 1
+
+    @classmethod
+    def from_columns(cls, originals, sizes, mtimes, inodes):
+        """A model over ready-made columns, such as a CachedScan's; they
+        are taken over, not copied."""
+        model = cls()
+        model.originals = originals
+        model.news = list(map(os.path.basename, originals))
+        model.sizes = sizes
+        model.mtimes = mtimes
+        model.inodes = inodes
+        model.codes = bytearray(len(originals))
+        model.version = model.names_version = model.rows_version = 1
+        return model
+
+    def sort(self):
+        order = sorted(range(len(self.originals)), key=self.originals.__getitem__)
+        self.originals = [self.originals[i] for i in order]
+        self.news = [self.news[i] for i in order]
+        self.sizes = array("q", (self.sizes[i] for i in order))
+        self.mtimes = array("d", (self.mtimes[i] for i in order))
+        self.inodes = array("Q", (self.inodes[i] for i in order))
+        self.codes = bytearray(self.codes[i] for i in order)
+        position = {old: new for new, old in enumerate(order) if old in self.messages}
+        self.messages = {position[old]: message for old, message in self.messages.items()}
+        self.version += 1
+        self.names_version += 1
+        self.rows_version += 1
+
+    def snapshot(self):
+        """Copies of the arrays diff_snapshot() needs, safe to hand to a thread."""
+        return self.originals[:], self.sizes[:], self.mtimes[:], self.inodes[:]
+
+    def apply_diff(self, diff):
+        """Bring the rows in line with a SnapshotDiff.
+
+        Files still there keep their new name and status.  A file renamed on
+        disk keeps them too under its new original name if its new name was
+        edited, else the new name becomes the name on disk.  Returns True if
+        rows were added or removed, which changes the row indices.
+        """
+        for row, size, mtime, inode in diff.changed:
+            self.sizes[row] = size
+            self.mtimes[row] = mtime
+            self.inodes[row] = inode
+        self.version += 1
+        if not (diff.removed or diff.added or diff.moved):
+            return False
+
+        carried = []
+        for row, entry in diff.moved:
+            new = self.news[row]
+            if self.codes[row] == READY or new != os.path.basename(self.originals[row]):
+                carried.append((entry, new, self.codes[row], self.messages.get(row)))
+            else:
+                # a name nobody edited follows the file's name on disk
+                carried.append((entry, os.path.basename(entry[0]), PENDING, None))
+        carried += [(entry, os.path.basename(entry[0]), PENDING, None) for entry in diff.added]
+        gone = sorted(diff.removed + [row for row, _ in diff.moved])
+        gone_set = set(gone)
+
+        if len(gone) + len(carried) > REFRESH_IN_PLACE:
+            self._drop(gone)
+            start = len(self.originals)
+            self.extend([entry for entry, _, _, _ in carried], [new for _, new, _, _ in carried])
+            for offset, (_, _, code, message) in enumerate(carried):
+                self.set(start + offset, code=code, message=message)
+            self.sort()
+            return True
+
+        columns = (self.originals, self.news, self.sizes, self.mtimes, self.inodes, self.codes)
+        for row in reversed(gone):
+            for column in columns:
+                del column[row]
+        if self.messages:
+            self.messages = {
+                index - bisect_left(gone, index): message
+                for index, message in self.messages.items()
+                if index not in gone_set
+            }
+        for (name, size, mtime, inode), new, code, message in sorted(carried, key=lambda item: item[0][0]):
+            row = bisect_right(self.originals, name)
+            if self.messages:
+                self.messages = {
+                    index + (index >= row): text for index, text in self.messages.items()
+                }
+            for column, value in zip(columns, (name, new, -1 if size is None else size, mtime, inode, code)):
+                column.insert(row, value)
+            if message:
+                self.messages[row] = message
+        self.names_version += 1
+        self.rows_version += 1
+        return True
+
+    def _drop(self, rows):
+        keep = bytearray(b"\x01") * len(self.originals)
+        for row in rows:
+            keep[row] = 0
+        order = [row for row, flag in enumerate(keep) if flag]
+        self.originals = [self.originals[i] for i in order]
+        self.news = [self.news[i] for i in order]
+        self.sizes = array("q", (self.sizes[i] for i in order))
+        self.mtimes = array("d", (self.mtimes[i] for i in order))
+        self.inodes = array("Q", (self.inodes[i] for i in order))
+        self.codes = bytearray(self.codes[i] for i in order)
+        position = {old: new for new, old in enumerate(order) if old in self.messages}
+        self.messages = {position[old]: text for old, text in self.messages.items() if old in position}
+
+    def size(self, index):
+        size = self.sizes[index]
+        return None if size < 0 else size
+
+    def set(self, index, new=None, code=None, message=None):
+        self.version += 1
+        if new is not None:
+            self.news[index] = new
+            self.names_version += 1
+        if code is not None:
+            self.codes[index] = code
+            if message:
+                self.messages[index] = message
+            else:
+                self.messages.pop(index, None)
+
+    def set_names(self, updates, code):
+        """Set many rows at once from a dict of index -> new name."""
+        news, codes, messages = self.news, self.codes, self.messages
+        for index, new in updates.items():
+            news[index] = new
+            codes[index] = code
+        if messages:
+            for index in updates:
+                messages.pop(index, None)
+        self.version += 1
+        self.names_version += 1
+
+    def state(self, index):
+        """(new, code, message) of a row, for set(index, *state) to restore."""
+        return self.news[index], self.codes[index], self.messages.get(index)
+
+    def status(self, index):
+        code = self.codes[index]
+        if code == PENDING:
+            size = self.sizes[index]
+            return "Pending" if size < 0 else f"Pending ({human_readable_size(size)})"
+        if code == FAILED:
+            return f"✗ {self.messages.get(index, '')[:15]}..."
+        return STATUS_TEXT[code]
+
+    def display(self, index):
+        """Column values and tag of a row as the table shows them."""
+        values = (self.originals[index], self.news[index], self.status(index))
+        return values, STATUS_TAGS[self.codes[index]]
+
+
+class RowFilter:
+    """Rows of a FileModel that match a text query and a status tag.
+
+    Names are matched lowercased, original and new name together; the
+    lowercased text is built once per change of the names.  A plain query
+    that extends the previous one only rechecks the rows that matched
+    before, so typing narrows the result instead of rescanning every row.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._folded = None
+        self._names_version = None
+        self._last = None
+
+    def _text(self):
+        model = self.model
+        if self._folded is None or self._names_version != model.names_version:
+            self._folded = [
+                f"{orig}\n{new}".lower() for orig, new in zip(model.originals, model.news)
+            ]
+            self._names_version = model.names_version
+        return self._folded
+
+    def match(self, query, tag="all", regex=False):
+        """Ascending list of matching row indices, None if nothing filters.
+
+        Raises re.error for a bad regex.
+        """
+        if not query and tag == "all":
+            self._last = None
+            return None
+
+        rows = None
+        last = self._last
+        if (last is not None and not regex and not last[2] and last[1] == tag
+                and last[3] == self.model.version and last[0] in query.lower()):
+            rows = last[4]
+
+        if tag != "all":
+            codes = self.model.codes
+            wanted = {code for code, name in enumerate(STATUS_TAGS) if name == tag}
+            if rows is None:
+                rows = [index for index, code in enumerate(codes) if code in wanted]
+
+        if query:
+            text = self._text()
+            if regex:
+                # one line per name, so ^ and $ anchor to either of them
+                search = re.compile(query, re.IGNORECASE | re.MULTILINE).search
+                test = lambda index: search(text[index])
+            else:
+                needle = query.lower()
+                test = lambda index: needle in text[index]
+            if rows is None:
+                if regex:
+                    rows = [index for index, line in enumerate(text) if search(line)]
+                else:
+                    rows = [index for index, line in enumerate(text) if needle in line]
+            else:
+                rows = [index for index in rows if test(index)]
+
+        self._last = (query.lower() if not regex else query, tag, regex, self.model.version, rows)
+        return rows
+
+
+class VirtualTable:
+    """Treeview that only holds the rows currently on screen.
+
+    Rows live in ``model``, a FileModel.  The Treeview keeps one item
+    ("slot") per visible line and the slots are rewritten on scroll, so the
+    widget cost does not grow with the number of files.  Rows are addressed
+    by their index in the model; ``view``, when set, is the ascending list
+    of indices a filter lets through and only those are shown.
+    """
+
+    def __init__(self, parent, columns, row_height, **tree_opts):
+        self.model = FileModel()
+        self.view = None
+        self.top = 0
+        self.slots = []
+        self.attached = 0
+        self.selected = set()
+        self.anchor = None
+        self.row_height = row_height
+
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree = ttk.Treeview(
+            parent,
+            columns=columns,
+            show="headings",
+            selectmode="none",
+            **tree_opts
+        )
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1) or "break")
+        self.tree.bind("<Down>", lambda e: self.move_selection(1) or "break")
+
+    def __len__(self):
+        return len(self.model) if self.view is None else len(self.view)
+
+    def set_model(self, model):
+        self.model = model
+        self.view = None
+        self.top = 0
+        self.selected.clear()
+        self.anchor = None
+        self.refresh()
+
+    def set_view(self, view):
+        """Show only the rows in view (ascending indices), or all for None."""
+        self.view = view
+        self.top = 0
+        self.selected.clear()
+        self.anchor = None
+        self.refresh()
+
+    def index_at(self, position):
+        return position if self.view is None else self.view[position]
+
+    def position(self, index):
+        """Where row index is in the view, None if filtered out."""
+        if self.view is None:
+            return index
+        position = bisect_left(self.view, index)
+        if position < len(self.view) and self.view[position] == index:
+            return position
+        return None
+
+    def indices(self, start=None):
+        """Shown row indices in order, from row start on if given."""
+        view = range(len(self.model)) if self.view is None else self.view
+        if start is None:
+            return view
+        position = self.position(start)
+        return view[position:] if position is not None else view[:0]
+
+    def _on_resize(self, event):
+        # one line is taken by the headings
+        count = max(1, event.height // self.row_height - 1)
+        if count == len(self.slots):
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.slots = [self.tree.insert("", "end", iid=f"slot{k}") for k in range(count)]
+        self.attached = count
+        self.refresh()
+
+    def refresh(self):
+        total = len(self)
+        self.top = max(0, min(self.top, total - len(self.slots)))
+
+        visible = min(len(self.slots), total - self.top)
+        for slot_no in range(visible, self.attached):
+            self.tree.detach(self.slots[slot_no])
+        for slot_no in range(self.attached, visible):
+            self.tree.move(self.slots[slot_no], "", slot_no)
+        self.attached = visible
+
+        shown = [self.index_at(self.top + slot_no) for slot_no in range(visible)]
+        for slot_no, index in enumerate(shown):
+            values, tag = self.model.display(index)
+            self.tree.item(self.slots[slot_no], values=values, tags=(tag,))
+
+        self.tree.selection_set([
+            self.slots[slot_no] for slot_no, index in enumerate(shown)
+            if index in self.selected
+        ])
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def refresh_rows(self, indices):
+        if self.view is None:
+            end = self.top + self.attached
+            changed = any(self.top <= index < end for index in indices)
+        else:
+            shown = set(self.view[self.top:self.top + self.attached])
+            changed = any(index in shown for index in indices)
+        if changed:
+            self.refresh()
+
+    def yview(self, *args):
+        total = len(self)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= max(1, len(self.slots) - 1)
+            self.top += step
+        self.refresh()
+
+    def see(self, index):
+        position = self.position(index)
+        if position is None:
+            return
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + len(self.slots):
+            self.top = position - len(self.slots) + 1
+        self.refresh()
+
+    def row_at(self, y):
+        iid = self.tree.identify_row(y)
+        if not iid:
+            return None
+        position = self.top + self.slots.index(iid)
+        return self.index_at(position) if position < len(self) else None
+
+    def bbox(self, index, column):
+        position = self.position(index)
+        slot_no = -1 if position is None else position - self.top
+        if 0 <= slot_no < self.attached:
+            return self.tree.bbox(self.slots[slot_no], column)
+        return ""
+
+    def selection(self):
+        return sorted(self.selected)
+
+    def selection_set(self, indices):
+        self.selected = set(indices)
+        self.refresh()
+
+    def select_all(self):
+        self.selection_set(self.indices())
+
+    def click(self, index, extend=False, toggle=False):
+        anchor = None if self.anchor is None else self.position(self.anchor)
+        if extend and anchor is not None:
+            low, high = sorted((anchor, self.position(index)))
+            self.selected = set(self.indices()[low:high + 1])
+        elif toggle:
+            self.selected ^= {index}
+            self.anchor = index
+        else:
+            self.selected = {index}
+            self.anchor = index
+        self.refresh()
+
+    def move_selection(self, step):
+        total = len(self)
+        if not total:
+            return
+        current = None if self.anchor is None else self.position(self.anchor)
+        if current is None:
+            current = self.top - step
+        index = self.index_at(max(0, min(total - 1, current + step)))
+        self.click(index)
+        self.see(index)
+
 
 class SimpleFileRenamer:
     def __init__(self, root):
         self.root = root
         self.root.title("File Renamer")
-        self.root.geometry("1000x620")
-        self.root.minsize(1000, 620)
+        self.root.geometry("1000x680")
+        self.root.minsize(1000, 680)
         self.root.resizable(False, False)
 
         self.input_dir = None
         self.output_dir = None
         self.undo_stack = []
         self.redo_stack = []
+        self.files = FileModel()
+        self.row_filter = RowFilter(self.files)
+        self.filter_job = None
+        # (folder, recursive) the rows were listed from, None if they weren't
+        self.files_source = None
+        self.refreshing = False
+        # listings are kept in the per-user scan cache, so reopening a big
+        # folder shows its rows at once and only reconciles in the background
+        self.scan_cache = True
+        self.cache_thread = None
         self.is_renaming = False
         self.stop_rename = False
-        self.overwrite_all = False
+        self.is_scanning = False
+        self.scan_id = 0
+        self.scan_cancel = threading.Event()
+        self.engine = None
+        self.last_job_id = None
+        self.metrics_path = None
+        self.last_progress = None
+        self.bytes_total = 0
+        self.transfer_mode = tk.StringVar(value="auto")
+        self.workers = tk.IntVar(value=DEFAULT_WORKERS)
+        self.chunk_mb = tk.IntVar(value=COPY_CHUNK // 2**20)
+        self.sync_mode = tk.StringVar(value="off")
+        # transfer order; inode/extent follow the disk layout, for hard disks
+        self.schedule = tk.StringVar(value="plan")
+        # checksums taken while copying; readback off trusts them without a second read
+        self.verify_mode = tk.StringVar(value="off")
+        self.readback = tk.BooleanVar(value=True)
+        self.subfolders = tk.StringVar(value="off")
+        # 0 = unlimited; the limiter is shared by every job and follows the
+        # spinboxes even while a job runs
+        self.limit_mb = tk.IntVar(value=0)
+        self.limit_files = tk.IntVar(value=0)
+        self.limiter = RateLimiter()
+        self.limit_mb.trace_add("write", lambda *args: self._apply_limits())
+        self.limit_files.trace_add("write", lambda *args: self._apply_limits())
+        self.auto_refresh = tk.BooleanVar(value=False)
+        self.ui_events = queue.Queue()
 
         self.setup_style()
         self.create_ui()
+        self._drain_ui_events()
+        self.root.after(WATCH_INTERVAL, self._watch_tick)
         
         self.load_settings()
+        self.reopen_files()
         
         self.root.bind("<Control-o>", lambda e: self.browse_input())
         self.root.bind("<Control-s>", lambda e: self.rename())
-        self.root.bind("<F5>", lambda e: self.load_files())
+        self.root.bind("<F5>", lambda e: self.refresh_files())
         self.root.bind("<Delete>", lambda e: self.clear_selected())
         self.root.bind("<Control-z>", lambda e: self.undo_action())
         self.root.bind("<Control-y>", lambda e: self.redo_action())
+        self.root.bind("<Control-r>", lambda e: self.open_rules())
+        self.root.bind("<Control-i>", lambda e: self.import_mapping())
+        self.root.bind("<Control-f>", lambda e: self.filter_entry.focus_set())
+        self.tree.bind("<Control-a>", lambda e: self.table.select_all() or "break")
         
         self.tree.bind("<Control-v>", self.paste_names)
         self.tree.bind("<Control-V>", self.paste_names)
@@ -45,7 +606,7 @@ class SimpleFileRenamer:
 
         style.configure(
             "Custom.Treeview",
-            rowheight=28,
+            rowheight=ROW_HEIGHT,
             borderwidth=1,
             relief="solid",
             background="white",
@@ -65,7 +626,25 @@ class SimpleFileRenamer:
             borderwidth=1
         )
 
+    def create_menu(self):
+        menubar = tk.Menu(self.root)
+
+        job_menu = tk.Menu(menubar, tearoff=0)
+        job_menu.add_command(label="Resume Interrupted Job", command=self.resume_job)
+        job_menu.add_separator()
+        job_menu.add_command(label="Undo Last Batch", command=lambda: self.replay_batch("undo"))
+        job_menu.add_command(label="Redo Batch", command=lambda: self.replay_batch("redo"))
+        menubar.add_cascade(label="Job", menu=job_menu)
+
+        names_menu = tk.Menu(menubar, tearoff=0)
+        names_menu.add_command(label="Import Mapping... (Ctrl+I)", command=self.import_mapping)
+        menubar.add_cascade(label="Names", menu=names_menu)
+
+        self.root.config(menu=menubar)
+
     def create_ui(self):
+        self.create_menu()
+
         top = tk.Frame(self.root, padx=20, pady=10)
         top.pack(fill="x")
 
@@ -81,6 +660,123 @@ class SimpleFileRenamer:
         tk.Button(top, text="Browse", width=12, height=1,
                   command=self.browse_output).grid(row=1, column=2)
 
+        options = tk.Frame(self.root, padx=20)
+        options.pack(fill="x")
+        self.options_frame = options
+
+        tk.Label(options, text="Transfer Mode", width=15, anchor="w").pack(side="left")
+        self.mode_combo = ttk.Combobox(
+            options,
+            textvariable=self.transfer_mode,
+            values=TRANSFER_MODES,
+            state="readonly",
+            width=12
+        )
+        self.mode_combo.pack(side="left", padx=10)
+        self.mode_combo.bind("<<ComboboxSelected>>", lambda e: self.save_settings())
+
+        tk.Label(options, text="Workers", anchor="w").pack(side="left", padx=(20, 0))
+        self.workers_spin = tk.Spinbox(
+            options,
+            from_=1,
+            to=128,
+            textvariable=self.workers,
+            width=5
+        )
+        self.workers_spin.pack(side="left", padx=10)
+
+        tk.Label(options, text="Buffer (MB)", anchor="w").pack(side="left", padx=(20, 0))
+        self.chunk_spin = tk.Spinbox(
+            options,
+            from_=1,
+            to=256,
+            textvariable=self.chunk_mb,
+            width=5
+        )
+        self.chunk_spin.pack(side="left", padx=10)
+
+        tk.Label(options, text="Order", anchor="w").pack(side="left", padx=(20, 0))
+        self.schedule_combo = ttk.Combobox(
+            options,
+            textvariable=self.schedule,
+            values=SCHEDULE_MODES,
+            state="readonly",
+            width=7
+        )
+        self.schedule_combo.pack(side="left", padx=10)
+        self.schedule_combo.bind("<<ComboboxSelected>>", lambda e: self.save_settings())
+
+        tk.Label(options, text="Sync", anchor="w").pack(side="left", padx=(20, 0))
+        self.sync_combo = ttk.Combobox(
+            options,
+            textvariable=self.sync_mode,
+            values=SYNC_MODES,
+            state="readonly",
+            width=8
+        )
+        self.sync_combo.pack(side="left", padx=10)
+        self.sync_combo.bind("<<ComboboxSelected>>", lambda e: self.save_settings())
+
+        tk.Label(options, text="Subfolders", anchor="w").pack(side="left", padx=(20, 0))
+        self.subfolder_combo = ttk.Combobox(
+            options,
+            textvariable=self.subfolders,
+            values=SUBFOLDER_MODES,
+            state="readonly",
+            width=8
+        )
+        self.subfolder_combo.pack(side="left", padx=10)
+        self.subfolder_combo.bind("<<ComboboxSelected>>", lambda e: self.save_settings())
+
+        limits = tk.Frame(self.root, padx=20)
+        limits.pack(fill="x", pady=(5, 0))
+
+        tk.Label(limits, text="Limit MB/s", width=15, anchor="w").pack(side="left")
+        self.limit_mb_spin = tk.Spinbox(
+            limits,
+            from_=0,
+            to=100000,
+            textvariable=self.limit_mb,
+            width=7
+        )
+        self.limit_mb_spin.pack(side="left", padx=10)
+
+        tk.Label(limits, text="Files/s", anchor="w").pack(side="left", padx=(20, 0))
+        self.limit_files_spin = tk.Spinbox(
+            limits,
+            from_=0,
+            to=100000,
+            textvariable=self.limit_files,
+            width=7
+        )
+        self.limit_files_spin.pack(side="left", padx=10)
+
+        tk.Label(limits, text="0 = unlimited, changes apply to a running job", fg="gray").pack(side="left", padx=(20, 0))
+
+        tk.Checkbutton(
+            limits,
+            text="Auto refresh (F5)",
+            variable=self.auto_refresh,
+            command=self.save_settings
+        ).pack(side="right")
+
+        tk.Checkbutton(
+            limits,
+            text="Read back",
+            variable=self.readback,
+            command=self.save_settings
+        ).pack(side="right", padx=(0, 20))
+        self.verify_combo = ttk.Combobox(
+            limits,
+            textvariable=self.verify_mode,
+            values=VERIFY_MODES,
+            state="readonly",
+            width=8
+        )
+        self.verify_combo.pack(side="right", padx=10)
+        self.verify_combo.bind("<<ComboboxSelected>>", lambda e: self.save_settings())
+        tk.Label(limits, text="Verify", anchor="w").pack(side="right")
+
         count_frame = tk.Frame(self.root)
         count_frame.pack(fill="x", padx=20, pady=(5, 5))
         
@@ -109,15 +805,29 @@ class SimpleFileRenamer:
         self.progress_bar.pack(fill="both", expand=True)
         self.progress_indicator = self.progress_bar.create_rectangle(0, 0, 0, 8, fill="#4CAF50", width=0)
 
+        details_frame = tk.Frame(self.root)
+        details_frame.pack(fill="x")
+
         self.progress_details = tk.Label(
-            self.root,
+            details_frame,
             text="Ready",
             font=("Segoe UI", 9),
             anchor="w",
             padx=20,
             fg="gray"
         )
-        self.progress_details.pack(fill="x")
+        self.progress_details.pack(side="left", fill="x", expand=True)
+
+        # live throughput of the running job
+        self.metrics_label = tk.Label(
+            details_frame,
+            text="",
+            font=("Segoe UI", 9),
+            anchor="e",
+            padx=20,
+            fg="gray"
+        )
+        self.metrics_label.pack(side="right")
 
         mid = tk.LabelFrame(
             self.root,
@@ -131,20 +841,43 @@ class SimpleFileRenamer:
         mid.pack(fill="x", padx=20, pady=(5, 5))
         mid.pack_propagate(False)
 
+        filter_frame = tk.Frame(mid)
+        filter_frame.pack(fill="x", pady=(0, 5))
+
+        self.filter_text = tk.StringVar()
+        self.filter_tag = tk.StringVar(value="all")
+        self.filter_regex = tk.BooleanVar(value=False)
+
+        tk.Label(filter_frame, text="Filter (Ctrl+F)", anchor="w").pack(side="left")
+        self.filter_entry = tk.Entry(filter_frame, textvariable=self.filter_text, width=30)
+        self.filter_entry.pack(side="left", padx=10)
+        tk.Checkbutton(filter_frame, text="Regex", variable=self.filter_regex).pack(side="left")
+        tk.Label(filter_frame, text="Status", anchor="w").pack(side="left", padx=(20, 0))
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.filter_tag,
+            values=FILTER_TAGS,
+            state="readonly",
+            width=10
+        ).pack(side="left", padx=10)
+        self.filter_count = tk.Label(filter_frame, text="", anchor="e", fg="gray")
+        self.filter_count.pack(side="right")
+
+        for var in (self.filter_text, self.filter_tag, self.filter_regex):
+            var.trace_add("write", lambda *args: self.schedule_filter())
+
         table_frame = tk.Frame(mid)
         table_frame.pack(fill="both", expand=True)
 
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical")
-        scrollbar.pack(side="right", fill="y")
-
         columns = ("original", "new", "status")
-        self.tree = ttk.Treeview(
+        self.table = VirtualTable(
             table_frame,
             columns=columns,
-            show="headings",
-            style="Custom.Treeview",
-            yscrollcommand=scrollbar.set
+            row_height=ROW_HEIGHT,
+            style="Custom.Treeview"
         )
+        self.table.set_model(self.files)
+        self.tree = self.table.tree
 
         self.tree.heading("original", text="Original File")
         self.tree.heading("new", text="New Name (Paste / Click to Edit)")
@@ -159,9 +892,8 @@ class SimpleFileRenamer:
         self.tree.tag_configure('done', foreground='green')
         self.tree.tag_configure('error', foreground='red')
         self.tree.tag_configure('skipped', foreground='orange')
-
-        self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.config(command=self.tree.yview)
+        self.tree.tag_configure('uptodate', foreground='teal')
+        self.tree.tag_configure('deferred', foreground='purple')
 
         self.tree.bind("<Button-1>", self.select_row_only)
         self.tree.bind("<Double-1>", self.edit_cell)
@@ -174,6 +906,9 @@ class SimpleFileRenamer:
         tk.Button(bottom, text="Load Files",
                   command=self.load_files, **btn_opts).pack(side="left", padx=5)
 
+        tk.Button(bottom, text="Rules (Ctrl+R)",
+                  command=self.open_rules, **btn_opts).pack(side="left", padx=5)
+
         self.rename_btn = tk.Button(bottom, text="Start Rename",
                   command=self.rename, **btn_opts)
         self.rename_btn.pack(side="left", padx=5)
@@ -189,18 +924,23 @@ class SimpleFileRenamer:
         tk.Button(bottom, text="Redo (Ctrl+Y)", width=12,
                   command=self.redo_action).pack(side="right", padx=5)
 
-    def update_progress(self, current=0, total=0, done=0, errors=0, skipped=0, current_file=""):
+    def update_progress(self, current=0, total=0, done=0, errors=0, skipped=0, current_file="",
+                        bytes_done=0, bytes_total=0):
         if total > 0:
             percentage = (current / total) * 100
+            # with known sizes the bar follows bytes, big files move it smoothly
+            fraction = min(1.0, bytes_done / bytes_total) if bytes_total else current / total
             
             width = self.progress_frame.winfo_width()
             if width > 0:
-                progress_width = (current / total) * width
+                progress_width = fraction * width
                 self.progress_bar.coords(self.progress_indicator, 0, 0, progress_width, 8)
             
             progress_text = f"Progress: {current}/{total} ({percentage:.1f}%)"
             if done > 0 or errors > 0 or skipped > 0:
                 progress_text += f" | ✓ {done} | ✗ {errors} | ⏭️ {skipped}"
+            if bytes_total:
+                progress_text += f" | {human_readable_size(bytes_done)} / {human_readable_size(bytes_total)}"
             
             self.progress_label.config(text=progress_text)
             
@@ -212,9 +952,9 @@ class SimpleFileRenamer:
             else:
                 self.progress_details.config(text="Ready", fg="gray")
             
-            if percentage < 30:
+            if fraction < 0.3:
                 color = "#FF5252"
-            elif percentage < 70:
+            elif fraction < 0.7:
                 color = "#FFC107"
             else:
                 color = "#4CAF50"
@@ -225,6 +965,110 @@ class SimpleFileRenamer:
             self.progress_bar.coords(self.progress_indicator, 0, 0, 0, 8)
             self.progress_details.config(text="Ready", fg="gray")
 
+    def post_ui(self, *event):
+        """Queue a UI update from any thread.
+
+        Events: ("status", index, text, tag), ("progress", *update_progress args),
+        ("complete", success, errors, skipped, total, waiting), ("scan", scan_id, rows),
+        ("scan_done", scan_id, error, cancelled) and ("call", fn, *args).
+        """
+        self.ui_events.put(event)
+
+    def _drain_ui_events(self):
+        self.root.after(1000 // UI_REFRESH_HZ, self._drain_ui_events)
+        started = time.perf_counter()
+
+        statuses = {}
+        progress = None
+        finished = None
+        calls = []
+        scanned = False
+        scan_result = None
+        try:
+            while True:
+                event = self.ui_events.get_nowait()
+                kind = event[0]
+                if kind == "scan":
+                    if event[1] == self.scan_id:
+                        self.files.extend(event[2])
+                        scanned = True
+                elif kind == "scan_done":
+                    if event[1] == self.scan_id:
+                        scan_result = event[2:]
+                elif kind == "status":
+                    statuses[event[1]] = event[2:]
+                elif kind == "progress":
+                    progress = event[1:]
+                elif kind == "complete":
+                    finished = event[1:]
+                elif kind == "call":
+                    calls.append(event[1:])
+        except queue.Empty:
+            pass
+
+        for index, (code, message) in statuses.items():
+            self.files.set(index, code=code, message=message)
+        if statuses:
+            self.table.refresh_rows(statuses)
+
+        if scanned:
+            self.table.refresh()
+            self.count_label.config(text=f"Total Files : {len(self.files)}")
+            self.progress_details.config(text=f"Scanning... {len(self.files)} files found", fg="blue")
+
+        if scan_result:
+            self._scan_complete(*scan_result)
+
+        if progress:
+            self.last_progress = progress
+
+        engine = self.engine
+        if self.is_renaming and engine is not None and self.bytes_total and self.last_progress:
+            # bytes move between per-file events too, so redraw every tick
+            self.update_progress(*self.last_progress, engine.bytes_done, self.bytes_total)
+        elif progress:
+            self.update_progress(*progress)
+        if self.is_renaming and engine is not None:
+            self.metrics_label.config(text=self._metrics_text(engine.stats()))
+
+        if finished:
+            self._rename_complete(*finished)
+
+        for fn, *args in calls:
+            fn(*args)
+
+        if self.is_renaming and engine is not None:
+            engine.metrics.record("ui", time.perf_counter() - started)
+
+    def _apply_limits(self):
+        try:
+            mb_per_s = max(0, int(self.limit_mb.get()))
+            files_per_s = max(0, int(self.limit_files.get()))
+        except (tk.TclError, ValueError):
+            # half-typed number, keep the current limits
+            return
+        self.limiter.set_limits(mb_per_s, files_per_s)
+
+    def _metrics_text(self, stats):
+        text = (
+            f"{stats['files_per_s']:.0f} files/s | {stats['mb_per_s']:.1f} MB/s | "
+            f"workers {stats['utilisation']:.0%} busy | p95 {stats['p95_ms']:.1f} ms"
+        )
+        peak = peak_memory()
+        if peak:
+            text += f" | mem {human_readable_size(peak)}"
+        return text
+
+    def _save_metrics(self, engine, job_id):
+        """Write the job's metrics as JSON and CSV next to the journals; returns the JSON path."""
+        base = os.path.join(metrics_dir(), job_id)
+        try:
+            engine.write_metrics(base + ".json")
+            engine.write_metrics(base + ".csv")
+        except OSError:
+            return None
+        return base + ".json"
+
     def reset_progress(self):
         self.update_progress(0, 0, 0, 0, 0, "")
 
@@ -249,41 +1093,257 @@ class SimpleFileRenamer:
             messagebox.showerror("Error", "Input folder select karo")
             return
 
-        self.tree.delete(*self.tree.get_children())
+        if self.is_renaming:
+            return
+
+        self.scan_cancel.set()
         self.reset_progress()
+        self.set_files(FileModel())
+        self.count_label.config(text="Total Files : 0")
+        self.progress_details.config(text="Scanning...", fg="blue")
 
+        self.scan_id += 1
+        self.scan_cancel = threading.Event()
+        self.is_scanning = True
+        self.stop_btn.pack(side="left", padx=5)
+        self.files_source = (self.input_dir, self.subfolders.get() != "off")
+
+        scan_thread = threading.Thread(
+            target=self._scan_thread,
+            args=(self.scan_id, self.input_dir, self.scan_cancel, self.files_source[1], self.scan_cache)
+        )
+        scan_thread.daemon = True
+        scan_thread.start()
+
+    def _scan_thread(self, scan_id, path, cancel, recursive=False, use_cache=False):
         try:
-            files = [
-                f for f in sorted(os.listdir(self.input_dir))
-                if os.path.isfile(os.path.join(self.input_dir, f))
-            ]
-        except Exception as e:
-            messagebox.showerror("Error", f"Cannot read folder: {str(e)}")
+            cached = load_scan(path, recursive) if use_cache else None
+            if cached:
+                self.post_ui("scan_done", scan_id, None, False, cached)
+                return
+            # recursive rows keep their relative path, FileModel.extend()
+            # makes the file name the new name
+            for chunk in (walk_files if recursive else scan_files)(path, cancel, details=True):
+                self.post_ui("scan", scan_id, chunk)
+        except OSError as e:
+            self.post_ui("scan_done", scan_id, str(e), cancel.is_set())
             return
+        self.post_ui("scan_done", scan_id, None, cancel.is_set())
 
-        for f in files:
-            try:
-                file_path = os.path.join(self.input_dir, f)
-                size = os.path.getsize(file_path)
-                size_str = self.human_readable_size(size)
-                self.tree.insert("", "end", values=(f, f, f"Pending ({size_str})"), tags=('pending',))
-            except:
-                self.tree.insert("", "end", values=(f, f, "Pending"), tags=('pending',))
+    def _scan_complete(self, error, cancelled, cached=None):
+        self.is_scanning = False
+        self.stop_btn.pack_forget()
+        self.stop_btn.config(state="normal", text="⏹️ Stop")
+
+        if error:
+            self.set_files(FileModel())
+            self.files_source = None
+            self.count_label.config(text="Total Files : 0")
+            self.reset_progress()
+            messagebox.showerror("Error", f"Cannot read folder: {error}")
+            return
+
+        if cached is not None:
+            self._show_cached(cached)
+            return
+
+        self.files.sort()
+        self.set_files(self.files)
+
+        total = len(self.files)
+        self.count_label.config(text=f"Total Files : {total}")
+        if cancelled:
+            self.update_progress(0, total, 0, 0, 0, f"Scan stopped, {total} files loaded")
+        else:
+            self.update_progress(0, total, 0, 0, 0, f"Loaded {total} files")
+            self._save_scan_cache()
+
+    def reopen_files(self):
+        """Show the input folder's last listing from the scan cache, as at
+        startup; without a cached listing nothing is scanned."""
+        if not self.input_dir or not self.scan_cache:
+            return
+        source = (self.input_dir, self.subfolders.get() != "off")
+        reopen_thread = threading.Thread(target=self._reopen_thread, args=(source,))
+        reopen_thread.daemon = True
+        reopen_thread.start()
+
+    def _reopen_thread(self, source):
+        try:
+            cached = load_scan(*source)
+        except OSError:
+            return
+        if cached:
+            self.post_ui("call", self._reopen_complete, source, cached)
+
+    def _reopen_complete(self, source, cached):
+        # something was loaded or started meanwhile, or the folder changed
+        if (self.files or self.is_scanning or self.is_renaming
+                or source != (self.input_dir, self.subfolders.get() != "off")):
+            return
+        self.files_source = source
+        self._show_cached(cached)
+
+    def _show_cached(self, cached):
+        """Show rows from the scan cache and reconcile them with the folder."""
+        self.set_files(FileModel.from_columns(cached.originals, cached.sizes, cached.mtimes, cached.inodes))
+        total = len(self.files)
+        self.count_label.config(text=f"Total Files : {total}")
+        self.update_progress(0, total)
+        changed = "" if cached.fresh else ", folder changed since"
+        self.progress_details.config(text=f"{total} files from cache{changed}, checking...", fg="blue")
+        self._start_refresh(self.files_source, False, cached.fresh)
+
+    def _save_scan_cache(self):
+        """Write the rows to the scan cache in the background."""
+        if not self.scan_cache or self.files_source is None or not self.files:
+            return
+        # one write at a time; a listing that changes meanwhile is
+        # reconciled on the next load anyway
+        if self.cache_thread is not None and self.cache_thread.is_alive():
+            return
+        self.cache_thread = threading.Thread(
+            target=self._cache_thread, args=(self.files_source, self.files.snapshot())
+        )
+        self.cache_thread.daemon = True
+        self.cache_thread.start()
+
+    def _cache_thread(self, source, snapshot):
+        try:
+            save_scan(*source, *snapshot)
+        except OSError:
+            # without a cache the next load just scans the folder
+            pass
+
+    def refresh_files(self, auto=False):
+        """Bring the list up to date with the folder, keeping typed names.
+
+        The folder is listed again in the background and compared with the
+        sizes, mtimes and inodes the rows already hold; only rows that
+        changed are touched.  Without such a listing (nothing loaded, other
+        folder or subfolder setting) this is a full load_files().
+        """
+        if self.is_renaming or self.is_scanning or self.refreshing:
+            return
+        source = (self.input_dir, self.subfolders.get() != "off")
+        if self.files_source != source or not self.files:
+            if not auto:
+                self.load_files()
+            return
+        self._start_refresh(source, auto)
+
+    def _start_refresh(self, source, auto, cached=None):
+        """List the folder again in the background; ``cached`` is None for
+        a refresh, else whether the scan cache the rows came from was fresh."""
+        self.refreshing = True
+        model = self.files
+        refresh_thread = threading.Thread(
+            target=self._refresh_thread,
+            args=(model, model.rows_version, model.snapshot(), source, auto, cached)
+        )
+        refresh_thread.daemon = True
+        refresh_thread.start()
+
+    def _refresh_thread(self, model, rows_version, snapshot, source, auto, cached=None):
+        path, recursive = source
+        try:
+            fresh = []
+            for chunk in (walk_files if recursive else scan_files)(path, details=True):
+                fresh.extend(chunk)
+            diff = diff_snapshot(*snapshot, fresh)
+        except OSError as e:
+            self.post_ui("call", self._refresh_complete, model, rows_version, None, str(e), auto, cached)
+            return
+        self.post_ui("call", self._refresh_complete, model, rows_version, diff, None, auto, cached)
+
+    def _refresh_complete(self, model, rows_version, diff, error, auto, cached=None):
+        self.refreshing = False
+        if error:
+            if not auto:
+                messagebox.showerror("Error", f"Cannot read folder: {error}")
+            return
+        # the rows were replaced or reordered meanwhile, or a job now relies
+        # on their indices; the next refresh will catch up
+        if model is not self.files or model.rows_version != rows_version or self.is_renaming:
+            return
+        if not diff:
+            if cached is not None:
+                self.progress_details.config(text=f"Loaded {len(self.files)} files", fg="blue")
+                if not cached:
+                    # same rows, but the cache should carry the folder's new mtime
+                    self._save_scan_cache()
+            elif not auto:
+                self.progress_details.config(text="Refresh: no changes", fg="gray")
+            return
+
+        if self.files.apply_diff(diff):
+            # row indices moved, so history and selection would hit the wrong rows
+            self.undo_stack.clear()
+            self.redo_stack.clear()
+            self.table.selected.clear()
+            self.table.anchor = None
+        if self.table.view is not None:
+            self.apply_filter()
+        else:
+            self.table.refresh()
+        self.count_label.config(text=f"Total Files : {len(self.files)}")
+        if cached is not None:
+            text = f"Loaded {len(self.files)} files, changed since last time: {diff.summary()}"
+        else:
+            text = f"Refreshed: {diff.summary()}"
+        self.progress_details.config(text=text, fg="blue")
+        self._save_scan_cache()
+
+    def _watch_tick(self):
+        self.root.after(WATCH_INTERVAL, self._watch_tick)
+        if self.auto_refresh.get():
+            self.refresh_files(auto=True)
+
+    def set_files(self, files):
+        self.files = files
+        self.row_filter = RowFilter(files)
+        self.table.set_model(files)
+        self.apply_filter()
+        # row indices in the history would point at the wrong files now
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def schedule_filter(self):
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(FILTER_DELAY, self.apply_filter)
+
+    def apply_filter(self):
+        """Show only the rows matching the filter box and status choice."""
+        self.filter_job = None
+        try:
+            view = self.row_filter.match(self.filter_text.get(), self.filter_tag.get(), self.filter_regex.get())
+        except re.error as e:
+            self.filter_count.config(text=f"Regex galat hai: {e}", fg="red")
+            return
+        self.table.set_view(view)
+        if view is None:
+            self.filter_count.config(text="", fg="gray")
+        else:
+            self.filter_count.config(text=f"{len(view)} of {len(self.files)} shown", fg="gray")
 
-        self.count_label.config(text=f"Total Files : {len(files)}")
-        self.update_progress(0, len(files), 0, 0, 0, f"Loaded {len(files)} files")
+    def set_row(self, index, new=None, code=None, message=None):
+        self.files.set(index, new, code, message)
 
     def rename(self):
         if self.is_renaming:
             return
+
+        if self.is_scanning:
+            messagebox.showwarning("Warning", "Files abhi load ho rahi hain, wait karo")
+            return
             
         if not self.output_dir:
             messagebox.showerror("Error", "Output folder select karo")
             return
 
-        items = self.tree.get_children()
-        total = len(items)
-        named = sum(1 for i in items if self.tree.item(i)["values"][1].strip())
+        total = len(self.files)
+        named = sum(1 for new in self.files.news if new.strip())
 
         if total == 0:
             messagebox.showwarning("Warning", "Koi file nahi hai!")
@@ -296,104 +1356,218 @@ class SimpleFileRenamer:
             ):
                 return
 
-        self.overwrite_all = False
-        
+        # The worker only sees this snapshot, never the Tk widgets
+        layout = "flatten" if self.subfolders.get() == "flatten" else "mirror"
+        plan = [
+            (index, orig, output_name(orig, new, layout) if new.strip() else "")
+            for index, (orig, new) in enumerate(zip(self.files.originals, self.files.news))
+        ]
+        self._start_job(plan)
+
+    def resume_job(self):
+        if self.is_renaming or self.is_scanning:
+            return
+        self._find_journal(find_unfinished, self._resume_found)
+
+    def _find_journal(self, find, then, *args):
+        """Look for a journal with find() off the UI thread, then call
+        then(journal, *args) on it.  No job starts in between."""
+        self.is_renaming = True
+        self.rename_btn.config(state="disabled")
+
+        def found(journal):
+            self.is_renaming = False
+            self.rename_btn.config(state="normal")
+            then(journal, *args)
+
+        def lookup():
+            journal = None
+            try:
+                journal = find()
+            except OSError:
+                pass
+            finally:
+                # the UI is released whatever happened
+                self.post_ui("call", found, journal)
+
+        threading.Thread(target=lookup, daemon=True).start()
+
+    def _resume_found(self, journal):
+        if journal is None:
+            messagebox.showinfo("Resume Job", "Koi adhoora job nahi mila")
+            return
+
+        header = journal.header
+        completed = journal.completed
+        total = len(journal.plan)
+        if not messagebox.askyesno(
+            "Resume Job",
+            f"Input : {header['input']}\nOutput : {header['output']}\n"
+            f"Mode : {header['mode']}\n\nDone : {len(completed)}/{total}\n\nResume?"
+        ):
+            return
+
+        self.input_dir = header["input"]
+        self.in_entry.delete(0, tk.END)
+        self.in_entry.insert(0, self.input_dir)
+        self.output_dir = header["output"]
+        self.out_entry.delete(0, tk.END)
+        self.out_entry.insert(0, self.output_dir)
+        self.transfer_mode.set(header["mode"])
+
+        # journal keys are the row indices of the original job
+        files = FileModel()
+        files.extend(
+            ((orig, None, math.nan, 0) for _, orig, _ in journal.plan),
+            [new for _, _, new in journal.plan]
+        )
+        for position, (key, _, _) in enumerate(journal.plan):
+            files.codes[position] = FINISHED if key in completed else READY
+        self.set_files(files)
+        self.files_source = None
+        self.count_label.config(text=f"Total Files : {total}")
+
+        self._start_job(journal.plan, journal)
+
+    def _start_job(self, plan, journal=None):
         self.is_renaming = True
         self.stop_rename = False
+        self.engine = None
+        self.metrics_path = None
+        self.metrics_label.config(text="")
+        self.last_progress = None
+        sizes = [self.files.size(key) for key, _, new in plan if new.strip()]
+        self.bytes_total = 0 if None in sizes else sum(sizes)
         self.rename_btn.config(state="disabled")
         self.stop_btn.pack(side="left", padx=5)
         
-        rename_thread = threading.Thread(target=self._rename_thread, args=(items, total))
+        try:
+            workers = max(1, int(self.workers.get()))
+        except (tk.TclError, ValueError):
+            workers = DEFAULT_WORKERS
+            self.workers.set(workers)
+        try:
+            chunk_size = max(1, int(self.chunk_mb.get())) * 2**20
+        except (tk.TclError, ValueError):
+            chunk_size = COPY_CHUNK
+            self.chunk_mb.set(COPY_CHUNK // 2**20)
+        self.save_settings()
+
+        rename_thread = threading.Thread(
+            target=self._rename_thread,
+            args=(plan, len(plan), self.transfer_mode.get(), workers, chunk_size, journal,
+                  self.sync_mode.get(), self.verify_mode.get(), self.readback.get(),
+                  self.schedule.get())
+        )
         rename_thread.daemon = True
         rename_thread.start()
 
-    def _rename_thread(self, items, total):
-        success_count = 0
-        error_count = 0
-        skipped_count = 0
-        
-        self.root.after(0, lambda: self.update_progress(0, total, 0, 0, 0, "Starting..."))
-        
-        for idx, item in enumerate(items):
-            if self.stop_rename:
-                break
-                
-            current_file = self.tree.item(item)["values"][0]
-            self.root.after(0, lambda idx=idx, file=current_file: 
-                self.update_progress(idx+1, total, success_count, error_count, skipped_count, file))
-            
-            orig, new, _ = self.tree.item(item)["values"]
-
-            if not new.strip():
-                self.root.after(0, lambda item=item: (
-                    self.tree.set(item, "status", "⏭️ Skipped"),
-                    self.tree.item(item, tags=('skipped',))
-                ))
-                skipped_count += 1
-                continue
-
-            is_valid, error_msg = self.validate_filename(new)
-            if not is_valid:
-                self.root.after(0, lambda item=item, msg=error_msg: (
-                    self.tree.set(item, "status", f"✗ {msg[:15]}..."),
-                    self.tree.item(item, tags=('error',))
-                ))
-                error_count += 1
-                continue
-
-            src = os.path.join(self.input_dir, orig)
-            dst = os.path.join(self.output_dir, new)
-
-            if os.path.exists(dst):
-                if not self.overwrite_all:
-                    response = self._ask_overwrite_in_main_thread(new, src, dst)
-                    
-                    if response == "cancel":
-                        self.stop_rename = True
-                        break
-                    elif response == "skip":
-                        self.root.after(0, lambda item=item: (
-                            self.tree.set(item, "status", "⏭️ Skipped"),
-                            self.tree.item(item, tags=('skipped',))
-                        ))
-                        skipped_count += 1
-                        continue
-                    elif response == "overwrite_all":
-                        self.overwrite_all = True
-                    elif response == "skip_all":
-                        self.root.after(0, lambda item=item: (
-                            self.tree.set(item, "status", "⏭️ Skipped"),
-                            self.tree.item(item, tags=('skipped',))
-                        ))
-                        skipped_count += 1
-                        continue
+    def _rename_thread(self, plan, total, mode="copy", workers=DEFAULT_WORKERS,
+                       chunk_size=COPY_CHUNK, journal=None, sync="off", verify="off", readback=True,
+                       schedule="plan"):
+        self.post_ui("progress", 0, total, 0, 0, 0, "Checking for conflicts...")
 
+        if journal is not None:
+            engine = RenameEngine.from_journal(journal, workers, chunk_size, self.limiter, readback,
+                                               schedule)
+        else:
+            engine = RenameEngine(
+                self.input_dir,
+                self.output_dir,
+                mode=mode,
+                workers=workers,
+                chunk_size=chunk_size,
+                sync=sync,
+                limiter=self.limiter,
+                verify=verify,
+                readback=readback,
+                schedule=schedule
+            )
+        self.engine = engine
+
+        preflight = engine.check(plan)
+        if journal is None:
+            # bad names show now, not when the transfer reaches their rows
+            for key, message in preflight.errors.items():
+                self.post_ui("status", key, FAILED, message)
+            for key, first in preflight.duplicates.items():
+                self.post_ui("status", key, FAILED, f"Same name as row {first + 1}")
+            if ((preflight.errors or preflight.duplicates)
+                    and not self._confirm_preflight_in_main_thread(preflight, plan)):
+                self.stop_rename = True
+                self.post_ui("complete", 0, 0, 0, total)
+                return
+            # Existing files are set aside and reviewed together at the end,
+            # so one conflict never holds up the rest of the job
+            engine.conflict = "defer"
             try:
-                shutil.copy2(src, dst)
-                self.root.after(0, lambda item=item: (
-                    self.tree.set(item, "status", "✓ Done"),
-                    self.tree.item(item, tags=('done',))
-                ))
-                success_count += 1
-            except Exception as e:
-                self.root.after(0, lambda item=item, e=str(e): (
-                    self.tree.set(item, "status", f"✗ {str(e)[:15]}..."),
-                    self.tree.item(item, tags=('error',))
-                ))
-                error_count += 1
-            
-            time.sleep(0.01)
+                journal = Journal.create(self.input_dir, self.output_dir, mode, engine.conflict,
+                                         verify=engine.verify, sync=engine.sync)
+            except OSError:
+                journal = None
+
+        if journal is not None:
+            self.last_job_id = journal.job_id
+
+        # same folder: files are renamed where they are, nothing is copied
+        self.post_ui("progress", 0, total, 0, 0, 0,
+                     "Renaming in place..." if engine.in_place else "Starting...")
+        processed = 0
+
+        def on_result(index, orig, tag, message):
+            nonlocal processed
+            if tag != DEFERRED:
+                # a deferred row counts once it is resolved
+                processed += 1
+            counts = engine.counts
+            skipped = counts[SKIPPED] + counts[UP_TO_DATE]
+            self.post_ui("status", index, RESULT_STATUS[tag], message)
+            self.post_ui("progress", processed, total, counts[DONE], counts[ERROR], skipped, orig)
+
+        waiting = 0
+        try:
+            counts = engine.run(plan, on_result, preflight, journal)
+            if engine.deferred and not self.stop_rename:
+                overwrite = self._review_conflicts_in_main_thread(engine.deferred)
+                if overwrite is None:
+                    # left in the journal, Resume Interrupted Job asks again
+                    waiting = len(engine.deferred)
+                else:
+                    self.post_ui("progress", processed, total, counts[DONE], counts[ERROR],
+                                 counts[SKIPPED] + counts[UP_TO_DATE], "Resolving conflicts...")
+                    counts = engine.resolve(overwrite, on_result, journal)
+        except Exception as e:
+            # the job itself failed, not one of its rows: end it all the same
+            engine.error = str(e)
+            counts = engine.counts
+            if journal is not None:
+                journal.close(finished=False)
+        self.metrics_path = None
+        if journal is not None:
+            self.metrics_path = self._save_metrics(engine, journal.job_id)
+        self.post_ui("call", self.metrics_label.config, {"text": self._metrics_text(engine.stats())})
+        self.post_ui("complete", counts[DONE], counts[ERROR], counts[SKIPPED] + counts[UP_TO_DATE], total,
+                     waiting)
+
+    def _confirm_preflight_in_main_thread(self, preflight, plan):
+        """Show the invalid and duplicate names before anything is
+        transferred; True to go on without them, False to cancel."""
+        result_queue = queue.Queue()
 
-        self.root.after(0, lambda: self._rename_complete(success_count, error_count, skipped_count, total))
+        problems = []
+        for index, orig, new in plan:
+            if index in preflight.errors:
+                problems.append(f"✗ {new}  ({preflight.errors[index]})")
+            elif index in preflight.duplicates:
+                problems.append(f"✗ {new}  (same name as row {preflight.duplicates[index] + 1})")
+            if len(problems) >= 200:
+                problems.append("...")
+                break
 
-    def _ask_overwrite_in_main_thread(self, filename, src, dst):
-        import queue
-        result_queue = queue.Queue()
-        
         def show_dialog():
             dialog = tk.Toplevel(self.root)
-            dialog.title("File Already Exists")
-            dialog.geometry("500x250")
+            dialog.title("Pre-flight Check")
+            dialog.geometry("560x380")
             dialog.transient(self.root)
             dialog.grab_set()
             
@@ -402,25 +1576,27 @@ class SimpleFileRenamer:
             y = self.root.winfo_y() + (self.root.winfo_height() - dialog.winfo_height()) // 2
             dialog.geometry(f"+{x}+{y}")
             
-            tk.Label(dialog, text=f"File already exists:", 
+            tk.Label(dialog, text=preflight.summary(), 
                     font=("Segoe UI", 10, "bold")).pack(pady=(10, 5))
+
+            if preflight.case_insensitive:
+                tk.Label(dialog, text="Output folder ignores case (A.jpg = a.jpg)", 
+                        font=("Segoe UI", 9), fg="gray").pack()
             
-            tk.Label(dialog, text=filename, 
-                    font=("Segoe UI", 9), fg="blue").pack(pady=(0, 10))
-            
-            info_frame = tk.Frame(dialog)
-            info_frame.pack(pady=(0, 15), padx=20, fill="x")
-            
-            src_size = os.path.getsize(src)
-            dst_size = os.path.getsize(dst) if os.path.exists(dst) else 0
-            
-            tk.Label(info_frame, text=f"Source: {self.human_readable_size(src_size)}", 
-                    anchor="w").pack(fill="x")
-            tk.Label(info_frame, text=f"Destination: {self.human_readable_size(dst_size)}", 
-                    anchor="w").pack(fill="x")
-            
-            tk.Label(dialog, text="What do you want to do?", 
-                    font=("Segoe UI", 9)).pack(pady=(0, 10))
+            list_frame = tk.Frame(dialog)
+            list_frame.pack(pady=(5, 10), padx=20, fill="both", expand=True)
+
+            scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
+            scrollbar.pack(side="right", fill="y")
+            listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, font=("Segoe UI", 9))
+            listbox.pack(side="left", fill="both", expand=True)
+            scrollbar.config(command=listbox.yview)
+            listbox.insert(tk.END, *problems)
+
+            text = "These rows will be marked as errors."
+            if preflight.conflicts:
+                text += "\nExisting files are reviewed at the end, the rest runs first."
+            tk.Label(dialog, text=text, font=("Segoe UI", 9)).pack(pady=(0, 10))
             
             btn_frame = tk.Frame(dialog)
             btn_frame.pack(pady=(0, 10))
@@ -428,44 +1604,94 @@ class SimpleFileRenamer:
             def set_result(result):
                 result_queue.put(result)
                 dialog.destroy()
+
+            tk.Button(btn_frame, text="Continue", width=15,
+                     command=lambda: set_result(True), fg="green").pack(side="left", padx=5)
+            tk.Button(btn_frame, text="Cancel", width=15,
+                     command=lambda: set_result(False), fg="red").pack(side="left", padx=5)
             
-            row1 = tk.Frame(btn_frame)
-            row1.pack(pady=5)
+            dialog.protocol("WM_DELETE_WINDOW", lambda: set_result(False))
+        
+        self.root.after(0, show_dialog)
+        
+        return result_queue.get()
+
+    def _review_conflicts_in_main_thread(self, rows):
+        """Review the rows the engine deferred because their new name exists.
+
+        Returns the keys to overwrite (the rest are skipped), or None to
+        decide later through Resume Interrupted Job.
+        """
+        result_queue = queue.Queue()
+
+        def show_dialog():
+            dialog = tk.Toplevel(self.root)
+            dialog.title("Existing Files")
+            dialog.geometry("560x400")
+            dialog.transient(self.root)
+            dialog.grab_set()
             
-            tk.Button(row1, text="Overwrite", width=15,
-                     command=lambda: set_result("overwrite")).pack(side="left", padx=5)
-            tk.Button(row1, text="Skip", width=15,
-                     command=lambda: set_result("skip")).pack(side="left", padx=5)
+            dialog.update_idletasks()
+            x = self.root.winfo_x() + (self.root.winfo_width() - dialog.winfo_width()) // 2
+            y = self.root.winfo_y() + (self.root.winfo_height() - dialog.winfo_height()) // 2
+            dialog.geometry(f"+{x}+{y}")
             
-            row2 = tk.Frame(btn_frame)
-            row2.pack(pady=5)
+            tk.Label(dialog, text=f"{len(rows)} files already exist, everything else is done",
+                    font=("Segoe UI", 10, "bold")).pack(pady=(10, 5))
             
-            tk.Button(row2, text="Overwrite All", width=15,
-                     command=lambda: set_result("overwrite_all"), fg="green").pack(side="left", padx=5)
-            tk.Button(row2, text="Skip All", width=15,
-                     command=lambda: set_result("skip_all"), fg="orange").pack(side="left", padx=5)
+            list_frame = tk.Frame(dialog)
+            list_frame.pack(pady=(5, 10), padx=20, fill="both", expand=True)
+
+            scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
+            scrollbar.pack(side="right", fill="y")
+            listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, font=("Segoe UI", 9),
+                                 selectmode="extended")
+            listbox.pack(side="left", fill="both", expand=True)
+            scrollbar.config(command=listbox.yview)
+            listbox.insert(tk.END, *(f"⚠ {new}  ←  {orig}" for _, orig, new in rows))
+
+            tk.Label(dialog, text="Select the rows to overwrite, the others are skipped.\n"
+                                  "Replaced files are kept so the batch can be undone.",
+                    font=("Segoe UI", 9)).pack(pady=(0, 10))
             
-            row3 = tk.Frame(btn_frame)
-            row3.pack(pady=5)
+            btn_frame = tk.Frame(dialog)
+            btn_frame.pack(pady=(0, 10))
             
-            tk.Button(row3, text="Cancel All", width=32,
-                     command=lambda: set_result("cancel"), fg="red").pack()
+            def set_result(result):
+                result_queue.put(result)
+                dialog.destroy()
+
+            def overwrite_selected():
+                set_result({rows[i][0] for i in listbox.curselection()})
             
-            def on_closing():
-                set_result("skip")
+            tk.Button(btn_frame, text="Overwrite Selected", width=16,
+                     command=overwrite_selected).pack(side="left", padx=4)
+            tk.Button(btn_frame, text="Overwrite All", width=12,
+                     command=lambda: set_result({key for key, _, _ in rows}), fg="green").pack(side="left", padx=4)
+            tk.Button(btn_frame, text="Skip All", width=10,
+                     command=lambda: set_result(set()), fg="orange").pack(side="left", padx=4)
+            tk.Button(btn_frame, text="Later", width=10,
+                     command=lambda: set_result(None)).pack(side="left", padx=4)
             
-            dialog.protocol("WM_DELETE_WINDOW", on_closing)
+            dialog.protocol("WM_DELETE_WINDOW", lambda: set_result(None))
         
         self.root.after(0, show_dialog)
         
         return result_queue.get()
 
-    def _rename_complete(self, success, errors, skipped, total):
+    def _rename_complete(self, success, errors, skipped, total, waiting=0):
         self.is_renaming = False
+        # statuses changed, a status filter has to be worked out again
+        if self.table.view is not None:
+            self.apply_filter()
         self.rename_btn.config(state="normal")
         self.stop_btn.pack_forget()
+        self.stop_btn.config(state="normal", text="⏹️ Stop")
         
-        if self.stop_rename:
+        if self.engine is not None and self.engine.error:
+            self.update_progress(total, total, success, errors, skipped, "Failed")
+            messagebox.showerror("Error", f"Job ruk gaya: {self.engine.error}\n✓ {success} | ✗ {errors} | ⏭️ {skipped}")
+        elif self.stop_rename:
             self.update_progress(total, total, success, errors, skipped, "Stopped by user")
             messagebox.showinfo("Stopped", f"Renaming stopped!\n✓ {success} | ✗ {errors} | ⏭️ {skipped}")
         else:
@@ -476,25 +1702,123 @@ class SimpleFileRenamer:
                 result_text += f"\nErrors: {errors}"
             if skipped > 0:
                 result_text += f"\nSkipped: {skipped}"
+            if waiting:
+                result_text += f"\nWaiting: {waiting} (Job > Resume Interrupted Job se baad mein decide karo)"
+            if self.engine is not None and self.engine.manifest_path:
+                result_text += f"\nChecksums: {self.engine.manifest_path}"
+            if self.metrics_path:
+                result_text += f"\nMetrics: {self.metrics_path}"
             
-            if errors == 0 and skipped == 0:
+            if errors == 0 and skipped == 0 and not waiting:
                 self.progress_bar.itemconfig(self.progress_indicator, fill="#4CAF50")
                 self.progress_details.config(text="✓ All files processed successfully", fg="green")
             else:
                 self.progress_bar.itemconfig(self.progress_indicator, fill="#FF9800")
-                self.progress_details.config(text=f"✓ {success} done, ✗ {errors} errors, ⏭️ {skipped} skipped", fg="#FF9800")
+                self.progress_details.config(text=f"✓ {success} done, ✗ {errors} errors, ⏭️ {skipped} skipped"
+                                             + (f", ⏸ {waiting} waiting" if waiting else ""), fg="#FF9800")
             
             messagebox.showinfo("Done", result_text)
 
+    def replay_batch(self, op):
+        """Undo or redo a whole executed batch on disk, from its journal."""
+        if self.is_renaming or self.is_scanning:
+            return
+
+        self._find_journal(undo_candidate if op == "undo" else redo_candidate, self._replay_found, op)
+
+    def _replay_found(self, journal, op):
+        title = "Undo Batch" if op == "undo" else "Redo Batch"
+        if journal is None:
+            messagebox.showinfo(title, f"{op.capitalize()} karne ke liye koi batch nahi hai")
+            return
+
+        header = journal.header
+        if not messagebox.askyesno(
+            title,
+            f"Input : {header['input']}\nOutput : {header['output']}\n"
+            f"Mode : {header['mode']}\nFiles : {len(journal.completed)}\n\n{op.capitalize()} this batch?"
+        ):
+            return
+
+        self.is_renaming = True
+        self.stop_rename = False
+        # undo/redo runs without an engine; drop the last job's stats
+        self.engine = None
+        self.metrics_path = None
+        self.metrics_label.config(text="")
+        self.rename_btn.config(state="disabled")
+        self.stop_btn.pack(side="left", padx=5)
+
+        try:
+            workers = max(1, int(self.workers.get()))
+        except (tk.TclError, ValueError):
+            workers = DEFAULT_WORKERS
+
+        replay_thread = threading.Thread(
+            target=self._replay_thread,
+            args=(journal, op, workers)
+        )
+        replay_thread.daemon = True
+        replay_thread.start()
+
+    def _replay_thread(self, journal, op, workers):
+        total = len(journal.completed)
+        # rows on screen belong to this batch only if it ran in this session
+        same_job = journal.job_id == self.last_job_id
+        counts = {DONE: 0, ERROR: 0}
+
+        self.post_ui("progress", 0, total, 0, 0, 0, "Undoing..." if op == "undo" else "Redoing...")
+
+        def on_result(key, orig, tag, message):
+            counts[tag] += 1
+            if same_job and key < len(self.files):
+                if tag == ERROR:
+                    self.post_ui("status", key, FAILED, message)
+                elif op == "undo":
+                    self.post_ui("status", key, UNDONE, None)
+                else:
+                    self.post_ui("status", key, FINISHED, None)
+            self.post_ui("progress", counts[DONE] + counts[ERROR], total, counts[DONE], counts[ERROR], 0, orig)
+
+        replay = undo_job if op == "undo" else redo_job
+        try:
+            replay(journal, workers, on_result, stop=lambda: self.stop_rename)
+        except OSError as e:
+            counts[ERROR] += 1
+            self.post_ui("progress", total, total, counts[DONE], counts[ERROR], 0, str(e))
+        self.post_ui("call", self._replay_complete, op, counts[DONE], counts[ERROR], total)
+
+    def _replay_complete(self, op, success, errors, total):
+        self.is_renaming = False
+        self.rename_btn.config(state="normal")
+        self.stop_btn.pack_forget()
+        self.stop_btn.config(state="normal", text="⏹️ Stop")
+
+        verb = "Undone" if op == "undo" else "Redone"
+        self.update_progress(total, total, success, errors, 0, f"{verb}!")
+        result_text = f"{verb}: {success}/{total} files"
+        if errors > 0:
+            result_text += f"\nErrors: {errors}"
+        messagebox.showinfo("Done", result_text)
+
     def stop_renaming(self):
-        """Stop the renaming process"""
-        self.stop_rename = True
+        """Stop the renaming process or the folder scan"""
+        if self.is_scanning:
+            self.scan_cancel.set()
+        else:
+            self.stop_rename = True
+            if self.engine is not None:
+                self.engine.stop()
         self.stop_btn.config(state="disabled", text="Stopping...")
 
     def clear(self):
         """Clear everything - files list, folder paths, progress, etc."""
-        # Clear file list from treeview
-        self.tree.delete(*self.tree.get_children())
+        # Stop a running scan and clear file list
+        self.scan_cancel.set()
+        self.scan_id += 1
+        self.is_scanning = False
+        self.set_files(FileModel())
+        self.files_source = None
         
         # Clear input folder path
         self.input_dir = None
@@ -514,9 +1838,6 @@ class SimpleFileRenamer:
         self.undo_stack.clear()
         self.redo_stack.clear()
         
-        # Reset overwrite_all flag
-        self.overwrite_all = False
-        
         # Reset renaming flags
         self.is_renaming = False
         self.stop_rename = False
@@ -535,31 +1856,32 @@ class SimpleFileRenamer:
         self.save_settings()
 
     def select_row_only(self, event):
-        item = self.tree.identify_row(event.y)
-        if item:
-            self.tree.selection_set(item)
+        self.tree.focus_set()
+        index = self.table.row_at(event.y)
+        if index is not None:
+            self.table.click(index, extend=bool(event.state & 0x1), toggle=bool(event.state & 0x4))
 
     def edit_cell(self, event):
         region = self.tree.identify("region", event.x, event.y)
         if region != "cell":
             return
 
-        item = self.tree.identify_row(event.y)
+        index = self.table.row_at(event.y)
         col = self.tree.identify_column(event.x)
 
-        if col != "#2" or not item:
+        if col != "#2" or index is None:
             return
 
-        old_value = self.tree.set(item, col)
-        self.undo_stack.append(("edit", item, col, old_value))
+        old_value = self.files.news[index]
+        self.undo_stack.append(("edit", index, "new", old_value))
         self.redo_stack.clear()
 
-        orig_name = self.tree.set(item, "original")
-        current_new = self.tree.set(item, col)
+        orig_name = self.files.originals[index]
+        current_new = old_value
         
         _, orig_ext = os.path.splitext(orig_name)
         
-        x, y, w, h = self.tree.bbox(item, col)
+        x, y, w, h = self.table.bbox(index, col)
         
         entry = tk.Entry(self.tree)
         entry.place(x=x, y=y, width=w, height=h)
@@ -573,9 +1895,8 @@ class SimpleFileRenamer:
             if orig_ext and not os.path.splitext(new_name)[1]:
                 new_name += orig_ext
                 
-            self.tree.set(item, col, new_name)
-            self.tree.set(item, "status", "Ready")
-            self.tree.item(item, tags=('ready',))
+            self.set_row(index, new_name, READY)
+            self.table.refresh_rows([index])
             entry.destroy()
         
         def cancel_edit(e=None):
@@ -595,84 +1916,300 @@ class SimpleFileRenamer:
         if not lines:
             return
 
-        selected = self.tree.selection()
+        # two columns copied from a spreadsheet are original -> new pairs,
+        # matched by name instead of by position
+        pairs = [line.split("\t") for line in lines]
+        if all(len(pair) == 2 for pair in pairs):
+            self._apply_mapping([(orig.strip(), new.strip()) for orig, new in pairs], "Paste Mapping")
+            return "break"
+
+        selected = self.table.selection()
         if not selected:
             return "break"
 
-        items = list(self.tree.get_children())
-        start = items.index(selected[0])
+        # lines go to the rows on screen from the selected one down, so a
+        # filtered view is filled without touching the hidden rows
+        rows = self.table.indices(selected[0])[:len(lines)]
+        for index, line in zip(rows, lines):
+            self.set_row(index, line, READY)
 
-        for i, name in enumerate(lines):
-            if start + i >= len(items):
-                break
-            self.tree.set(items[start + i], "new", name)
-            self.tree.set(items[start + i], "status", "Ready")
-            self.tree.item(items[start + i], tags=('ready',))
+        self.table.refresh_rows(rows)
 
         return "break"
 
-    def validate_filename(self, name):
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            if char in name:
-                return False, f"Invalid character: '{char}'"
-        
-        reserved_names = [
-            'CON', 'PRN', 'AUX', 'NUL',
-            'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9',
-            'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9'
-        ]
-        if name.upper().split('.')[0] in reserved_names:
-            return False, "Reserved Windows filename"
-        
-        if len(name) > 255:
-            return False, "Filename too long (max 255 chars)"
-        
-        return True, ""
+    def import_mapping(self):
+        if self.is_renaming or self.is_scanning:
+            return
+        if not self.files:
+            messagebox.showwarning("Warning", "Pehle files load karo")
+            return
 
-    def human_readable_size(self, size):
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} TB"
+        patterns = " ".join(f"*{ext}" for ext in MAPPING_TYPES)
+        path = filedialog.askopenfilename(
+            title="Import Mapping",
+            filetypes=[("Mapping files", patterns), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            pairs = read_mapping(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Mapping file nahi padh paye: {e}")
+            return
+        self._apply_mapping(pairs, "Import Mapping")
+
+    def _apply_mapping(self, pairs, title):
+        """Set the new names of the rows a mapping matches, as one undo step."""
+        result = join_mapping(self.files.originals, pairs)
+        if result.updates:
+            indices = list(result.updates)
+            saved = [self.files.state(index) for index in indices]
+            self.files.set_names(result.updates, READY)
+            self.undo_stack.append(("batch", indices, "new", saved))
+            self.redo_stack.clear()
+            self.table.refresh()
+
+        text = result.summary()
+        if result.unknown:
+            shown = result.unknown[:10]
+            text += "\n\nNot found:\n" + "\n".join(shown)
+            if len(result.unknown) > len(shown):
+                text += "\n..."
+        if result.missing or result.unknown:
+            messagebox.showwarning(title, text)
+        else:
+            messagebox.showinfo(title, text)
 
     def clear_selected(self):
-        selected = self.tree.selection()
-        for item in selected:
-            self.tree.set(item, "new", "")
-            self.tree.set(item, "status", "Pending")
-            self.tree.item(item, tags=('pending',))
+        selected = self.table.selection()
+        for index in selected:
+            self.set_row(index, "", PENDING)
+        self.table.refresh_rows(selected)
+
+    def open_rules(self):
+        """Rule pipeline dialog; the table previews the result while typing."""
+        if self.is_renaming or self.is_scanning:
+            return
+        if not self.files:
+            messagebox.showwarning("Warning", "Pehle files load karo")
+            return
+
+        files = self.files
+        paths = files.originals
+        names = [os.path.basename(path) for path in paths]
+        sizes = [files.size(index) for index in range(len(files))]
+        pipeline = RulePipeline(names, FileInfo(self.input_dir, paths, sizes, files.mtimes))
+        specs = []
+        # (new, status, tag) of every row before the preview touched it
+        saved = {}
+        pending = [None]
+        loading = [False]
+
+        win = tk.Toplevel(self.root)
+        win.title("Rename Rules")
+        win.geometry("620x320")
+        win.transient(self.root)
+        win.grab_set()
+
+        left = tk.Frame(win, padx=10, pady=10)
+        left.pack(side="left", fill="y")
+        rule_list = tk.Listbox(left, width=34, height=12, exportselection=False)
+        rule_list.pack(fill="y", expand=True)
+        list_buttons = tk.Frame(left)
+        list_buttons.pack(fill="x", pady=(5, 0))
+
+        right = tk.Frame(win, padx=10, pady=10)
+        right.pack(side="left", fill="both", expand=True)
+
+        kind = tk.StringVar(value=RULE_TYPES[0])
+        text = tk.StringVar()
+        arg = tk.StringVar()
+        ignore_case = tk.BooleanVar(value=False)
+
+        tk.Label(right, text="Rule", anchor="w").pack(fill="x")
+        ttk.Combobox(right, textvariable=kind, values=RULE_TYPES, state="readonly").pack(fill="x")
+        text_label = tk.Label(right, anchor="w")
+        text_label.pack(fill="x", pady=(8, 0))
+        tk.Entry(right, textvariable=text).pack(fill="x")
+        arg_label = tk.Label(right, anchor="w")
+        arg_label.pack(fill="x", pady=(8, 0))
+        tk.Entry(right, textvariable=arg).pack(fill="x")
+        tk.Checkbutton(right, text="Ignore case", variable=ignore_case, anchor="w").pack(fill="x", pady=(5, 0))
+        message = tk.Label(right, anchor="w", fg="gray", wraplength=280, justify="left")
+        message.pack(fill="x", pady=(8, 0))
+
+        def show(changed):
+            result = pipeline.result
+            for index in changed:
+                if index not in saved:
+                    saved[index] = files.state(index)
+                if result[index] != names[index]:
+                    self.set_row(index, result[index], READY)
+                else:
+                    self.set_row(index, *saved[index])
+            self.table.refresh_rows(changed)
+            message.config(text=f"{len(changed)} rows updated", fg="gray")
+
+        def current_rule():
+            try:
+                return make_rule(kind.get(), text.get(), arg.get(), ignore_case.get())
+            except ValueError as e:
+                message.config(text=str(e), fg="red")
+                return None
+
+        def preview():
+            pending[0] = None
+            selected = rule_list.curselection()
+            rule = current_rule()
+            if rule is None:
+                return
+            if not selected:
+                message.config(text="Add dabao, phir preview dikhega", fg="gray")
+                return
+            position = selected[0]
+            specs[position] = (kind.get(), text.get(), arg.get(), ignore_case.get())
+            show(pipeline.replace(position, rule))
+            rule_list.delete(position)
+            rule_list.insert(position, rule.describe())
+            rule_list.selection_set(position)
+
+        def on_change(*_):
+            labels = RULE_FIELDS[kind.get()]
+            text_label.config(text=labels[0])
+            arg_label.config(text=labels[1])
+            if loading[0]:
+                return
+            if pending[0] is not None:
+                win.after_cancel(pending[0])
+            pending[0] = win.after(RULE_PREVIEW_DELAY, preview)
+
+        def on_select(event=None):
+            selected = rule_list.curselection()
+            if not selected:
+                return
+            loading[0] = True
+            kind_value, text_value, arg_value, ignore_value = specs[selected[0]]
+            kind.set(kind_value)
+            text.set(text_value)
+            arg.set(arg_value)
+            ignore_case.set(ignore_value)
+            loading[0] = False
+
+        def add_rule():
+            rule = current_rule()
+            if rule is None:
+                return
+            specs.append((kind.get(), text.get(), arg.get(), ignore_case.get()))
+            show(pipeline.append(rule))
+            rule_list.insert(tk.END, rule.describe())
+            rule_list.selection_clear(0, tk.END)
+            rule_list.selection_set(tk.END)
+
+        def remove_rule():
+            selected = rule_list.curselection()
+            if not selected:
+                return
+            position = selected[0]
+            del specs[position]
+            rule_list.delete(position)
+            show(pipeline.remove(position))
+
+        def move_rule(step):
+            selected = rule_list.curselection()
+            if not selected:
+                return
+            position = selected[0]
+            other = position + step
+            if not 0 <= other < len(specs):
+                return
+            specs[position], specs[other] = specs[other], specs[position]
+            label = rule_list.get(position)
+            rule_list.delete(position)
+            rule_list.insert(other, label)
+            rule_list.selection_set(other)
+            show(pipeline.move(position, step))
+
+        def close(apply):
+            if pending[0] is not None:
+                win.after_cancel(pending[0])
+            indices = sorted(saved)
+            if apply:
+                if indices:
+                    self.undo_stack.append(("batch", indices, "new", [saved[i] for i in indices]))
+                    self.redo_stack.clear()
+            else:
+                for index in indices:
+                    self.set_row(index, *saved[index])
+                self.table.refresh_rows(indices)
+            win.destroy()
+
+        for var in (kind, text, arg, ignore_case):
+            var.trace_add("write", on_change)
+        rule_list.bind("<<ListboxSelect>>", on_select)
+        on_change()
+
+        tk.Button(list_buttons, text="Add", width=7, command=add_rule).pack(side="left")
+        tk.Button(list_buttons, text="Remove", width=7, command=remove_rule).pack(side="left", padx=2)
+        tk.Button(list_buttons, text="▲", width=3, command=lambda: move_rule(-1)).pack(side="left")
+        tk.Button(list_buttons, text="▼", width=3, command=lambda: move_rule(1)).pack(side="left", padx=2)
+
+        actions = tk.Frame(right)
+        actions.pack(side="bottom", fill="x")
+        tk.Button(actions, text="Cancel", width=10, command=lambda: close(False)).pack(side="right")
+        tk.Button(actions, text="Apply", width=10, command=lambda: close(True)).pack(side="right", padx=5)
+        win.protocol("WM_DELETE_WINDOW", lambda: close(False))
+
+    def _swap_rows(self, indices, values):
+        """Put values back into rows and return what they held before."""
+        current = []
+        for index, value in zip(indices, values):
+            current.append(self.files.state(index))
+            self.set_row(index, *value)
+        self.table.refresh_rows(indices)
+        return current
 
     def undo_action(self):
         if self.undo_stack:
             action = self.undo_stack.pop()
-            action_type, item, col, old_value = action
+            action_type, index, col, old_value = action
             
-            if action_type == "edit":
-                current_value = self.tree.set(item, col)
-                self.redo_stack.append(("edit", item, col, current_value))
-                self.tree.set(item, col, old_value)
-                self.tree.set(item, "status", "Pending")
-                self.tree.item(item, tags=('pending',))
+            if action_type == "batch":
+                self.redo_stack.append(("batch", index, col, self._swap_rows(index, old_value)))
+            elif action_type == "edit":
+                current_value = self.files.news[index]
+                self.redo_stack.append(("edit", index, col, current_value))
+                self.set_row(index, old_value, PENDING)
+                self.table.refresh_rows([index])
 
     def redo_action(self):
         if self.redo_stack:
             action = self.redo_stack.pop()
-            action_type, item, col, new_value = action
+            action_type, index, col, new_value = action
             
-            if action_type == "edit":
-                current_value = self.tree.set(item, col)
-                self.undo_stack.append(("edit", item, col, current_value))
-                self.tree.set(item, col, new_value)
-                self.tree.set(item, "status", "Ready")
-                self.tree.item(item, tags=('ready',))
+            if action_type == "batch":
+                self.undo_stack.append(("batch", index, col, self._swap_rows(index, new_value)))
+            elif action_type == "edit":
+                current_value = self.files.news[index]
+                self.undo_stack.append(("edit", index, col, current_value))
+                self.set_row(index, new_value, READY)
+                self.table.refresh_rows([index])
 
     def save_settings(self):
         try:
             settings = {
                 'input_dir': self.input_dir,
-                'output_dir': self.output_dir
+                'output_dir': self.output_dir,
+                'transfer_mode': self.transfer_mode.get(),
+                'workers': self.workers.get(),
+                'chunk_mb': self.chunk_mb.get(),
+                'sync_mode': self.sync_mode.get(),
+                'schedule': self.schedule.get(),
+                'verify_mode': self.verify_mode.get(),
+                'readback': self.readback.get(),
+                'subfolders': self.subfolders.get(),
+                'limit_mb': self.limit_mb.get(),
+                'limit_files': self.limit_files.get(),
+                'auto_refresh': self.auto_refresh.get()
             }
             with open('renamer_settings.json', 'w') as f:
                 json.dump(settings, f)
@@ -691,6 +2228,27 @@ class SimpleFileRenamer:
                     self.output_dir = settings['output_dir']
                     self.out_entry.delete(0, tk.END)
                     self.out_entry.insert(0, settings['output_dir'])
+                if settings.get('transfer_mode') in TRANSFER_MODES:
+                    self.transfer_mode.set(settings['transfer_mode'])
+                if isinstance(settings.get('workers'), int) and settings['workers'] > 0:
+                    self.workers.set(settings['workers'])
+                if isinstance(settings.get('chunk_mb'), int) and settings['chunk_mb'] > 0:
+                    self.chunk_mb.set(settings['chunk_mb'])
+                if settings.get('sync_mode') in SYNC_MODES:
+                    self.sync_mode.set(settings['sync_mode'])
+                if settings.get('schedule') in SCHEDULE_MODES:
+                    self.schedule.set(settings['schedule'])
+                if settings.get('verify_mode') in VERIFY_MODES:
+                    self.verify_mode.set(settings['verify_mode'])
+                if isinstance(settings.get('readback'), bool):
+                    self.readback.set(settings['readback'])
+                if settings.get('subfolders') in SUBFOLDER_MODES:
+                    self.subfolders.set(settings['subfolders'])
+                for key, var in (('limit_mb', self.limit_mb), ('limit_files', self.limit_files)):
+                    if isinstance(settings.get(key), int) and settings[key] >= 0:
+                        var.set(settings[key])
+                if isinstance(settings.get('auto_refresh'), bool):
+                    self.auto_refresh.set(settings['auto_refresh'])
         except:
             pass
 
@@ -701,7 +2259,7 @@ class SimpleFileRenamer:
         self.root.unbind_all("<MouseWheel>")
 
     def _on_mousewheel(self, event):
-        self.tree.yview_scroll(int(-1 * (event.delta / 120)), "units")
+        self.table.yview("scroll", int(-1 * (event.delta / 120)), "units")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,31 @@
+"""Headless core of the bulk file renamer, shared by the GUI and the CLI."""
+
+from .engine import (
+    CONFLICT_POLICIES, DEFERRED, DONE, ERROR, SKIPPED, UP_TO_DATE, RenameEngine,
+)
+from .history import redo_candidate, redo_job, undo_candidate, undo_job
+from .inplace import is_in_place, order_renames, rename_file
+from .journal import (
+    Journal, JournalSummary, find_unfinished, list_journals, prune_journals, read_summary,
+)
+from .mapping import MAPPING_TYPES, MappingJoin, join_mapping, read_mapping
+from .metrics import Histogram, Metrics, peak_memory
+from .paths import journal_dir, metrics_dir, scan_cache_dir, user_cache_dir, user_state_dir
+from .preflight import Preflight, check_plan
+from .rules import (
+    CASE_MODES, RULE_TYPES, FileInfo, RulePipeline, apply_rules, make_rule, split_ext,
+)
+from .scan import (
+    LAYOUTS, SCAN_CHUNK, WALK_WORKERS, SnapshotDiff, diff_snapshot, list_files, output_name,
+    scan_files, walk_files,
+)
+from .schedule import SCHEDULE_MODES, ResultQueue, disk_layout, disk_order, physical_offset
+from .scancache import CachedScan, load_scan, save_scan
+from .sync import SYNC_MODES, SyncIndex, find_up_to_date
+from .throttle import RateLimiter, TokenBucket
+from .transfer import (
+    COPY_CHUNK, DEFAULT_WORKERS, TRANSFER_MODES, copy_file, make_dirs, same_device,
+    transfer_file,
+)
+from .utils import human_readable_size, validate_filename, validate_path
+from .verify import VERIFY_MODES, Manifest, StreamHash, check_copy, hash_file
@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import sys
+
+from .engine import CONFLICT_POLICIES, DEFERRED, ERROR, RenameEngine
+from .history import redo_candidate, redo_job, undo_candidate, undo_job
+from .journal import Journal, find_unfinished
+from .mapping import read_mapping
+from .paths import metrics_dir
+from .rules import RULE_TYPES, FileInfo, apply_rules, make_rule
+from .scan import LAYOUTS, list_files, output_name
+from .sync import SYNC_MODES
+from .throttle import RateLimiter
+from .transfer import COPY_CHUNK, DEFAULT_WORKERS, TRANSFER_MODES
+from .schedule import SCHEDULE_MODES
+from .verify import VERIFY_MODES
+
+
+def build_rules(args):
+    """--replace/--prefix/--suffix first, then every --rule in order."""
+    rules = []
+    if args.replace:
+        rules.append(make_rule("replace", *args.replace))
+    if args.prefix:
+        rules.append(make_rule("insert", args.prefix, 0))
+    if args.suffix:
+        rules.append(make_rule("insert", args.suffix, -1))
+    for spec in args.rule or ():
+        kind, *fields = spec
+        if len(fields) > 2:
+            raise ValueError(f"--rule {kind} takes at most TEXT and ARG")
+        rules.append(make_rule(kind, *fields))
+    return rules
+
+
+def build_plan(args):
+    if args.mapping:
+        pairs = read_mapping(args.mapping)
+    else:
+        files = list_files(args.input, recursive=bool(args.recursive))
+        paths = [path for path, _ in files]
+        info = FileInfo(args.input, paths, [size for _, size in files])
+        # rules see the file name only, the folder part is kept by the layout
+        names = [os.path.basename(path) for path in paths]
+        pairs = zip(paths, apply_rules(build_rules(args), names, info))
+    layout = args.recursive or "mirror"
+    return [
+        (index, orig, output_name(orig, new, layout))
+        for index, (orig, new) in enumerate(pairs)
+    ]
+
+
+def chunk_size(args):
+    return max(4096, int(args.chunk_size * 2**20))
+
+
+def limiter(args):
+    return RateLimiter(max(0.0, args.limit_mb), max(0.0, args.limit_files))
+
+
+def emit(event, **fields):
+    record = {"event": event}
+    record.update(fields)
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="renamer",
+        description="Bulk rename files from INPUT into OUTPUT without the GUI. "
+                    "Progress is printed as one JSON object per line."
+    )
+    parser.add_argument("input", nargs="?", help="input folder")
+    parser.add_argument("output", nargs="?", help="output folder")
+
+    names = parser.add_argument_group("new names (mapping file or rules)")
+    names.add_argument("--mapping", metavar="FILE",
+                       help="CSV/TSV file with 'original,new' rows, or JSON")
+    names.add_argument("--replace", nargs=2, metavar=("OLD", "NEW"),
+                       help="replace OLD with NEW in every name")
+    names.add_argument("--prefix", help="text to put before every name")
+    names.add_argument("--suffix", help="text to put before the extension")
+    names.add_argument("--rule", nargs="+", action="append", metavar="KIND",
+                       help=f"rule applied after the options above, repeatable: "
+                            f"KIND TEXT [ARG] with KIND one of {', '.join(RULE_TYPES)}, e.g. "
+                            f"--rule regex 'IMG_(\\d+)' 'photo-\\1' --rule template "
+                            f"'{{name}}_{{counter:03}}{{ext}}'")
+
+    parser.add_argument("--recursive", nargs="?", const="mirror", choices=LAYOUTS,
+                        help="include subfolders; mirror keeps their structure in the "
+                             "output, flatten puts every file directly in it (default: mirror)")
+    parser.add_argument("--mode", choices=TRANSFER_MODES, default="auto",
+                        help="how files are transferred (default: auto)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"parallel transfers (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--chunk-size", type=float, default=COPY_CHUNK / 2**20, metavar="MB",
+                        help=f"copy buffer per call in MB (default: {COPY_CHUNK // 2**20})")
+    parser.add_argument("--limit-mb", type=float, default=0, metavar="MB",
+                        help="at most this many MB copied per second (default: 0, unlimited)")
+    parser.add_argument("--limit-files", type=float, default=0, metavar="N",
+                        help="at most this many files transferred per second "
+                             "(default: 0, unlimited)")
+    parser.add_argument("--on-conflict", choices=CONFLICT_POLICIES,
+                        help="what to do when the destination exists; abort stops "
+                             "before anything is transferred, defer does everything else "
+                             "and leaves those rows for a --resume with overwrite or skip "
+                             "(default: skip; a --resume without it leaves deferred rows "
+                             "deferred)")
+    parser.add_argument("--sync", choices=SYNC_MODES, default="off",
+                        help="skip destinations already identical to their source: quick "
+                             "compares size and modification time, hash also the contents "
+                             "(default: off)")
+    parser.add_argument("--verify", choices=VERIFY_MODES, default="off",
+                        help="hash every file while it is copied (fast: xxh3 if the xxhash "
+                             "package is installed, else CRC-32; or sha256), check the copy "
+                             "and write a checksum manifest into OUTPUT (default: off)")
+    parser.add_argument("--no-readback", action="store_true",
+                        help="with --verify, trust the hash taken while copying instead of "
+                             "reading every copy back")
+    parser.add_argument("--schedule", choices=SCHEDULE_MODES, default="plan",
+                        help="transfer order: plan keeps the given order, inode and extent "
+                             "follow the sources' layout on disk (extent: physical offset "
+                             "where the filesystem reports it) and batch small files, "
+                             "which saves seeks on hard disks (default: plan)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only run the pre-flight check, change nothing")
+    parser.add_argument("--quiet", action="store_true",
+                        help="only print the summary")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write timings and throughput here, CSV if FILE ends in .csv, "
+                             "else JSON (default: JSON and CSV in the state folder)")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="don't write a job journal (the job can't be resumed)")
+    parser.add_argument("--resume", metavar="JOURNAL", nargs="?", const="latest",
+                        help="resume an interrupted job, by default the newest one")
+    parser.add_argument("--undo", metavar="JOURNAL", nargs="?", const="latest",
+                        help="undo a finished job on disk, by default the last one")
+    parser.add_argument("--redo", metavar="JOURNAL", nargs="?", const="latest",
+                        help="redo an undone job, by default the one undone last")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.undo or args.redo:
+        return replay(args)
+
+    if args.resume:
+        try:
+            journal = find_unfinished() if args.resume == "latest" else Journal.load(args.resume)
+        except OSError as e:
+            emit("error", message=str(e))
+            return 2
+        if journal is None or not journal.planned:
+            emit("error", message="no unfinished job to resume")
+            return 2
+        plan = journal.plan
+        engine = RenameEngine.from_journal(journal, args.workers, chunk_size(args), limiter(args),
+                                           readback=not args.no_readback, schedule=args.schedule)
+        emit("resume", journal=journal.path, total=len(plan),
+             completed=len(journal.completed))
+        return execute(engine, plan, engine.check(plan), journal, args)
+
+    if not args.input or not args.output:
+        parser.error("input and output folders are required unless --resume is given")
+    if args.on_conflict is None:
+        args.on_conflict = "skip"
+
+    try:
+        plan = build_plan(args)
+    except (OSError, ValueError) as e:
+        emit("error", message=str(e))
+        return 2
+
+    engine = RenameEngine(args.input, args.output, mode=args.mode, workers=args.workers,
+                          conflict=args.on_conflict, chunk_size=chunk_size(args),
+                          sync=args.sync, limiter=limiter(args), verify=args.verify,
+                          readback=not args.no_readback, schedule=args.schedule)
+    preflight = engine.check(plan)
+    if not args.quiet:
+        for index, orig, new in plan:
+            if index in preflight.errors:
+                emit("problem", index=index, original=orig, new=new,
+                     kind="invalid", message=preflight.errors[index])
+            elif index in preflight.duplicates:
+                emit("problem", index=index, original=orig, new=new,
+                     kind="duplicate", first=preflight.duplicates[index])
+            elif index in preflight.conflicts:
+                emit("problem", index=index, original=orig, new=new, kind="exists")
+    emit("preflight", total=len(plan), up_to_date=len(preflight.up_to_date),
+         exists=len(preflight.conflicts), changed=len(preflight.stale),
+         duplicates=len(preflight.duplicates), invalid=len(preflight.errors),
+         case_insensitive=preflight.case_insensitive)
+
+    if args.dry_run:
+        return 1 if preflight.errors or preflight.duplicates else 0
+
+    journal = None
+    if not args.no_journal:
+        journal = Journal.create(args.input, args.output, args.mode, args.on_conflict,
+                                 verify=args.verify, sync=args.sync)
+        emit("journal", path=journal.path)
+    return execute(engine, plan, preflight, journal, args)
+
+
+def replay(args):
+    op = "undo" if args.undo else "redo"
+    target = args.undo or args.redo
+    try:
+        if target != "latest":
+            journal = Journal.load(target)
+        elif op == "undo":
+            journal = undo_candidate()
+        else:
+            journal = redo_candidate()
+    except OSError as e:
+        emit("error", message=str(e))
+        return 2
+    if journal is None:
+        emit("error", message=f"nothing to {op}")
+        return 2
+
+    total = len(journal.completed)
+    processed = 0
+    emit(op, journal=journal.path, total=total)
+
+    def on_result(key, orig, tag, message):
+        nonlocal processed
+        processed += 1
+        if not args.quiet:
+            emit("result", index=key, original=orig, status=tag, message=message,
+                 processed=processed, total=total)
+
+    counts = (undo_job if op == "undo" else redo_job)(journal, args.workers, on_result)
+    emit("summary", total=total, **counts)
+    return 1 if counts[ERROR] else 0
+
+
+def execute(engine, plan, preflight, journal, args):
+    total = len(plan)
+    processed = 0
+
+    def on_result(index, orig, tag, message):
+        nonlocal processed
+        if tag != DEFERRED:
+            processed += 1
+        if not args.quiet:
+            emit("result", index=index, original=orig, new=plan[index][2],
+                 status=tag, message=message, processed=processed, total=total,
+                 bytes=engine.bytes_done)
+
+    try:
+        counts = engine.run(plan, on_result, preflight, journal)
+        if engine.deferred and args.on_conflict in ("overwrite", "skip") and not engine.stopped:
+            # deferred by an earlier run and decided now by an explicit
+            # --on-conflict; without one they stay deferred in the journal
+            overwrite = {key for key, _, _ in engine.deferred} if args.on_conflict == "overwrite" else ()
+            counts = engine.resolve(overwrite, on_result, journal)
+    except KeyboardInterrupt:
+        emit("summary", total=total, stopped=True, bytes=engine.bytes_done, **engine.counts)
+        save_metrics(engine, journal, args)
+        return 130
+    except Exception as e:
+        # the rows are reported one by one, this is the job itself failing
+        engine.error = str(e)
+        counts = engine.counts
+        if journal is not None:
+            journal.close(finished=False)
+
+    if engine.error:
+        emit("error", message=engine.error)
+    emit("summary", total=total, stopped=engine.stopped or bool(engine.error),
+         bytes=engine.bytes_done, manifest=engine.manifest_path, **counts)
+    save_metrics(engine, journal, args)
+    if engine.error:
+        return 2
+    return 1 if counts[ERROR] or engine.stopped or engine.deferred else 0
+
+
+def save_metrics(engine, journal, args):
+    """Write the job's metrics to --metrics, or as JSON and CSV next to the
+    journals, and print the headline numbers."""
+    if args.metrics:
+        paths = [args.metrics]
+    elif journal is not None:
+        base = os.path.join(metrics_dir(), journal.job_id)
+        paths = [base + ".json", base + ".csv"]
+    else:
+        paths = []
+    try:
+        for path in paths:
+            engine.write_metrics(path)
+    except OSError as e:
+        emit("error", message=f"metrics not written: {e}")
+        paths = []
+    emit("metrics", written=paths, phases=dict(engine.metrics.phases), **engine.stats())
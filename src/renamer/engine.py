@@ -0,0 +1,614 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .inplace import is_in_place, order_renames, rename_file, temp_name
+from .metrics import Metrics
+from .preflight import check_plan
+from .schedule import (
+    BATCH_BYTES, BATCH_FILES, LARGE_FILE, SMALL_FILE, STREAM_WORKERS, ResultQueue, disk_layout,
+    disk_order,
+)
+from .sync import SyncIndex, find_up_to_date, signature
+from .throttle import RateLimiter
+from .transfer import COPY_CHUNK, DEFAULT_WORKERS, make_dirs, same_device, transfer_file
+from .verify import Manifest, StreamHash, check_copy
+
+# Result tags, also used as the Treeview tags in the GUI
+DONE = "done"
+ERROR = "error"
+SKIPPED = "skipped"
+UP_TO_DATE = "uptodate"
+# Set aside by the "defer" policy until resolve() decides on it
+DEFERRED = "deferred"
+
+# How rows whose destination already exists are handled
+CONFLICT_POLICIES = ("overwrite", "skip", "abort", "defer")
+
+
+def replace_with_backup(src, dst, backup, *transfer_args, **kwargs):
+    """Move the existing dst to backup, then transfer src to dst.
+
+    dst that turns out to be src itself (another spelling of the same
+    path) is put back and refused with shutil.SameFileError.
+    """
+    if os.path.lexists(dst) and not os.path.lexists(backup):
+        os.makedirs(os.path.dirname(backup), exist_ok=True)
+        os.replace(dst, backup)
+        if not os.path.lexists(src):
+            os.replace(backup, dst)
+            raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    return transfer_file(src, dst, *transfer_args, **kwargs)
+
+
+class RenameEngine:
+    """Validate and execute a rename plan.
+
+    A plan is a list of ``(key, original, new)`` tuples; ``key`` is whatever
+    the caller uses to find the row again (the GUI passes the row index).
+    Before anything is transferred the whole plan is checked once with
+    check_plan(); rows whose destination exists are then handled by the
+    ``conflict`` policy, so the transfer never stops to ask: "defer" sets
+    them aside as DEFERRED while everything else runs, and resolve() then
+    overwrites or skips each of them as decided.  Transfers run
+    on a pool of ``workers`` threads and results are reported through
+    ``on_result(key, original, tag, message)`` in plan order.
+
+    ``schedule`` "inode" or "extent" runs the transfers in the order the
+    sources lie on disk instead (see schedule.disk_layout()), which saves
+    seeks on spinning disks: small files are copied in batches, one pool
+    task each, and files of LARGE_FILE and up stream on STREAM_WORKERS
+    threads of their own.  Results are then reported as they finish.
+
+    With a ``journal`` every step is logged so an interrupted job can be
+    resumed with from_journal(): rows the journal has as done are reported
+    without touching the disk.  Files replaced by the "overwrite" policy are
+    first moved into the journal's backup folder so the job can be undone.
+
+    With ``sync`` set to "quick" or "hash", existing destinations that are
+    identical to their source are reported as UP_TO_DATE and not copied;
+    the ones that differ are replaced whatever the conflict policy.
+
+    ``metrics`` collects phase timings and per-operation latencies of the
+    job; stats() gives the live rates and write_metrics() saves them.
+
+    ``limiter`` caps the bytes and files per second; its limits can be
+    changed from another thread while the job runs.  Without one, or with
+    both limits at 0, transfers never wait.
+
+    When input and output are the same folder and the mode is "auto" or
+    "move" the job runs in place: files are renamed where they are with
+    os.rename, in the order order_renames() works out, so swaps and chains
+    like 1 -> 2 -> 3 need no copies and never collide.
+
+    With ``verify`` set to "fast" or "sha256" every transferred file is
+    hashed as it is copied, read back once to check it (unless
+    ``readback`` is off) and listed in a checksum manifest in the output
+    folder, see verify.Manifest.  In-place renames copy nothing and are
+    not verified.  Neither are they scheduled, they read no data.
+    """
+
+    def __init__(self, input_dir, output_dir, mode="copy", workers=DEFAULT_WORKERS,
+                 conflict="skip", chunk_size=COPY_CHUNK, sync="off", limiter=None,
+                 verify="off", readback=True, schedule="plan"):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.conflict = conflict
+        self.chunk_size = chunk_size
+        self.sync = sync
+        self.sync_index = None
+        self.stopped = False
+        self.counts = {DONE: 0, ERROR: 0, SKIPPED: 0, UP_TO_DATE: 0, DEFERRED: 0}
+        # (key, original, new) of the rows the "defer" policy set aside
+        self.deferred = []
+        # bytes written so far, including files still in flight
+        self.bytes_done = 0
+        self._bytes_lock = threading.Lock()
+        self.metrics = Metrics(self.workers)
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.in_place = is_in_place(input_dir, output_dir, mode)
+        self.verify = "off" if self.in_place else verify
+        self.readback = readback
+        self.schedule = "plan" if self.in_place else schedule
+        self.manifest_path = None
+        # why the whole job stopped before transferring anything, else None
+        self.error = None
+        # new name -> checksum of the file just written, until report() lists it
+        self._digests = {}
+
+    @classmethod
+    def from_journal(cls, journal, workers=DEFAULT_WORKERS, chunk_size=COPY_CHUNK, limiter=None,
+                     readback=True, schedule="plan"):
+        header = journal.header
+        return cls(header["input"], header["output"], mode=header["mode"],
+                   workers=workers, conflict=header["conflict"], chunk_size=chunk_size,
+                   sync=header.get("sync", "off"), limiter=limiter, verify=header.get("verify", "off"),
+                   readback=readback, schedule=schedule)
+
+    def _add_bytes(self, n):
+        with self._bytes_lock:
+            self.bytes_done += n
+
+    def stop(self):
+        self.stopped = True
+
+    def stats(self):
+        """Live files/s, MB/s, worker utilisation and p95 transfer latency."""
+        return self.metrics.snapshot(self.counts[DONE], self.bytes_done)
+
+    def write_metrics(self, path):
+        return self.metrics.write(path, self.counts[DONE], self.bytes_done)
+
+    def check(self, plan):
+        with self.metrics.phase("preflight"):
+            preflight = check_plan(plan, self.output_dir)
+        if self.in_place:
+            # a name that another row renames away is free by the time it is needed
+            fold = str.casefold if preflight.case_insensitive else (lambda name: name)
+            sources = {
+                fold(orig) for key, orig, new in plan
+                if new.strip() and key not in preflight.errors and key not in preflight.duplicates
+            }
+            for key, new in list(preflight.conflicts.items()):
+                if fold(new) in sources:
+                    del preflight.conflicts[key]
+            return preflight
+
+        if self._same_folder():
+            # a copy onto its own source has nothing to do, and replacing
+            # the "existing" file would move the source away first
+            for key, orig, new in plan:
+                if new == orig and key in preflight.conflicts:
+                    del preflight.conflicts[key]
+                    preflight.up_to_date.add(key)
+        if self.sync != "off":
+            with self.metrics.phase("sync"):
+                self.sync_index = SyncIndex(self.output_dir).load()
+                existing = [row for row in plan if row[0] in preflight.conflicts]
+                current = find_up_to_date(
+                    existing, self.input_dir, self.output_dir,
+                    self.sync_index, self.sync, self.workers
+                )
+            for key in current:
+                del preflight.conflicts[key]
+            preflight.up_to_date |= current
+            # whatever else is there changed since: syncing means replacing it
+            preflight.stale = set(preflight.conflicts)
+            preflight.conflicts = {}
+        return preflight
+
+    def _same_folder(self):
+        try:
+            return os.path.samefile(self.input_dir, self.output_dir)
+        except OSError:
+            return False
+
+    def _throttle(self, n):
+        waited = self.limiter.wait_bytes(n, self._is_stopped)
+        if waited:
+            self.metrics.record("throttle", waited)
+
+    def _is_stopped(self):
+        return self.stopped
+
+    def _transfer(self, new, fn, src, dst, *args):
+        """Run fn(src, dst, *args), time it under the method used, have it
+        verify the copy and remember the result in the sync index."""
+        waited = self.limiter.wait_file(self._is_stopped)
+        if waited:
+            self.metrics.record("throttle", waited)
+        kwargs = {}
+        checked = []
+        if self.verify != "off":
+            digest = kwargs["digest"] = StreamHash(self.verify)
+
+            def verify(path):
+                # called by fn before a move deletes the source
+                start = time.perf_counter()
+                try:
+                    self._digests[new] = check_copy(path, digest, self.verify, self.readback,
+                                                    self.chunk_size)
+                finally:
+                    checked.append(time.perf_counter() - start)
+                    self.metrics.record("verify", checked[-1], worker=True)
+
+            kwargs["verify"] = verify
+        start = time.perf_counter()
+        try:
+            how = fn(src, dst, *args, **kwargs)
+        except BaseException:
+            self.metrics.record("failed", time.perf_counter() - start - sum(checked), worker=True)
+            raise
+        self.metrics.record(how, time.perf_counter() - start - sum(checked), worker=True)
+        if self.sync_index is not None:
+            with self.metrics.timed("stat", worker=True):
+                dst_sig = signature(os.stat(dst))
+                src_sig = dst_sig if how == "move" else signature(os.stat(src))
+            self.sync_index.put(new, src_sig, dst_sig)
+        return how
+
+    def _order_in_place(self, plan, preflight, conflicts, completed, journal):
+        """Work out the renames of an in-place job.
+
+        Returns (chains, blocked, finished): the chains from order_renames(),
+        rows whose new name stays taken and rows an interrupted run already
+        renamed.  Under "skip" or "defer" a row whose new name belongs to a
+        file that is not renamed conflicts too, and so does the row behind
+        it in its chain.
+        """
+        fold = str.casefold if preflight.case_insensitive else (lambda name: name)
+        skip = self.conflict in ("skip", "defer")
+        movers = []
+        staying = []
+        finished = set()
+        for key, orig, new in plan:
+            if key in completed or new == orig:
+                continue
+            if (not new.strip() or key in preflight.errors or key in preflight.duplicates
+                    or (skip and key in conflicts)):
+                staying.append(fold(orig))
+                continue
+            src = orig
+            if journal is not None and key in journal.started:
+                where = self._locate(key, orig, new, journal.inodes.get(key))
+                if where == new:
+                    finished.add(key)
+                    continue
+                src = where
+            movers.append((key, src, new))
+
+        blocked = set()
+        if skip:
+            by_dst = {fold(new): (key, src) for key, src, new in movers}
+            while staying:
+                row = by_dst.pop(staying.pop(), None)
+                if row is not None:
+                    blocked.add(row[0])
+                    staying.append(fold(row[1]))
+            movers = [row for row in movers if row[0] not in blocked]
+
+        return order_renames(movers, fold), blocked, finished
+
+    def _locate(self, key, orig, new, inode):
+        """Where the file of a row an interrupted job had started is now:
+        orig, its parking name or new."""
+        if inode is None:
+            # not part of a cycle, so a missing original means it was renamed
+            if not os.path.lexists(os.path.join(self.input_dir, orig)):
+                return new if os.path.lexists(os.path.join(self.input_dir, new)) else orig
+            return orig
+        for rel in (orig, temp_name(orig, key), new):
+            try:
+                if os.lstat(os.path.join(self.input_dir, rel)).st_ino == inode:
+                    return rel
+            except OSError:
+                pass
+        return orig
+
+    def _rename_chain(self, chain, tasks, backups, overwrite):
+        """Run one chain of order_renames() and settle the Future of each row.
+
+        Once a step fails, every later step would land on the name it could
+        not free, so those rows fail as well instead of being renamed.
+        """
+        if self.stopped:
+            for key, _, _ in chain:
+                tasks[key].cancel()
+            return
+        parked = len(chain) > 1 and chain[0][0] == chain[-1][0]
+        blocker = None
+        stranded = False
+        for index, (key, src, dst) in enumerate(chain):
+            task = tasks[key]
+            if blocker is not None:
+                if stranded and index == len(chain) - 1:
+                    message = f"Left as {os.path.basename(src)}, {blocker} is still in the way"
+                else:
+                    message = f"Not renamed, {blocker} is still in the way"
+                if not task.done():
+                    task.set_exception(FileExistsError(message))
+                continue
+            try:
+                if parked and index == 0:
+                    rename_file(os.path.join(self.input_dir, src), os.path.join(self.input_dir, dst))
+                    stranded = True
+                    continue
+                how = self._transfer(dst, rename_file, os.path.join(self.input_dir, src),
+                                     os.path.join(self.output_dir, dst), backups.get(key),
+                                     key in overwrite)
+                task.set_result(how)
+            except Exception as e:
+                blocker = os.path.basename(src)
+                if not task.done():
+                    task.set_exception(e)
+
+    def _submit_chain(self, executor, chain, tasks, backups, overwrite, journal):
+        """Give every row of chain a Future and run the chain on the pool."""
+        for key, _, _ in chain:
+            tasks[key] = Future()
+        if journal is not None:
+            parked = len(chain) > 1 and chain[0][0] == chain[-1][0]
+            for key, src, _ in chain:
+                if key in journal.started:
+                    continue
+                inode = None
+                if parked:
+                    # which way round a cycle got can't be told from the names alone
+                    try:
+                        inode = os.lstat(os.path.join(self.input_dir, src)).st_ino
+                    except OSError:
+                        pass
+                journal.record_start(key, inode)
+            if parked:
+                journal.flush()
+        task = executor.submit(self._rename_chain, chain, tasks, backups, overwrite)
+
+        def settle(task):
+            # a chain cancelled by a stop never ran, so neither did its rows
+            for key, _, _ in chain:
+                tasks[key].cancel()
+
+        task.add_done_callback(settle)
+
+    def _run_batch(self, batch):
+        """Run a batch of small transfers in turn, settling the Future of
+        each row as soon as it is done."""
+        for task, new, fn, args in batch:
+            if self.stopped:
+                task.cancel()
+            elif task.set_running_or_notify_cancel():
+                try:
+                    task.set_result(self._transfer(new, fn, *args))
+                except Exception as e:
+                    task.set_exception(e)
+
+    def _submit_batch(self, executor, batch):
+        task = executor.submit(self._run_batch, batch)
+
+        def settle(task):
+            # a batch cancelled by a stop never ran, so neither did its rows
+            for row_task, _, _, _ in batch:
+                row_task.cancel()
+
+        task.add_done_callback(settle)
+
+    def resolve(self, overwrite=(), on_result=None, journal=None):
+        """Finish the rows run() deferred: keys in ``overwrite`` replace the
+        file in the way, the rest are skipped.  Returns the result counts."""
+        plan = [(key, orig, new if key in overwrite else "") for key, orig, new in self.deferred]
+        self.deferred = []
+        self.counts[DEFERRED] -= len(plan)
+        self.conflict = "overwrite"
+        # the rest of the job may have changed the folder, so check again
+        return self.run(plan, on_result, None, journal)
+
+    def run(self, plan, on_result=None, preflight=None, journal=None):
+        """Execute plan and return the result counts.
+
+        ``preflight`` is the result of check() if the caller already has it.
+        With the "abort" policy nothing is transferred if any row conflicts.
+        Passing a journal that already holds a plan resumes that job.
+        """
+        if preflight is None:
+            preflight = self.check(plan)
+
+        resuming = journal is not None and journal.planned
+        if resuming:
+            # Only destinations that existed before the job are real
+            # conflicts, anything else in the way is our own earlier work.
+            conflicts = journal.preexisting
+            completed = journal.completed
+            up_to_date = {key for key, (tag, _) in journal.results.items() if tag == UP_TO_DATE}
+            up_to_date |= preflight.up_to_date
+        else:
+            # a changed destination isn't a conflict, but it existed before
+            # the job all the same and is backed up when replaced
+            conflicts = set(preflight.conflicts) | preflight.stale
+            completed = set()
+            up_to_date = preflight.up_to_date
+        stale = preflight.stale
+
+        if self.conflict == "abort" and any(key not in stale for key in conflicts):
+            self.stopped = True
+            if journal is not None:
+                journal.close()
+            return dict(self.counts)
+
+        if self.in_place:
+            with self.metrics.phase("order"):
+                chains, blocked, finished = self._order_in_place(
+                    plan, preflight, conflicts, completed, journal
+                )
+            if blocked:
+                # they are conflicts now, also for the journal
+                conflicts = set(conflicts) | blocked
+
+        manifest = None
+        if self.verify != "off":
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                # a resumed or resolved job adds to the manifest it started
+                manifest = Manifest.for_job(self.output_dir, self.verify,
+                                            journal.job_id if journal is not None else None,
+                                            append=resuming or self.manifest_path is not None)
+            except OSError as e:
+                self.error = f"Checksum manifest not written: {e}"
+                self.stopped = True
+                if journal is not None:
+                    journal.close(finished=False)
+                return dict(self.counts)
+            self.manifest_path = manifest.path
+
+        if journal is not None and not resuming:
+            journal.record_plan(plan, conflicts)
+
+        same_dev = same_device(self.input_dir, self.output_dir)
+
+        if self.in_place:
+            chain_of = {key: chain for chain in chains for key, _, _ in chain}
+            # one Future per row, settled by the task that runs its chain
+            tasks = {}
+            backups = {}
+            if journal is not None:
+                # keep the files we replace so the job can be undone
+                backups = {key: journal.backup_path(new) for key, _, new in plan if key in conflicts}
+
+        # Results are reported strictly in plan order unless scheduled: each
+        # entry is either a final (tag, message) pair or a Future still owned
+        # by the pool.
+        scheduled = self.schedule != "plan"
+        pending = ResultQueue(ordered=not scheduled)
+        # enough scheduled rows in flight to keep every worker on a batch
+        max_pending = self.workers * (BATCH_FILES * 2 if scheduled else 4)
+
+        def report(block_until):
+            for key, orig, new, result in pending.take(block_until):
+                if isinstance(result, Future):
+                    if result.cancelled():
+                        continue
+                    try:
+                        how = result.result()
+                        tag, message = DONE, ""
+                    except Exception as e:
+                        how = ""
+                        tag, message = ERROR, str(e)
+                else:
+                    tag, message, how = result
+
+                if journal is not None and key not in completed and tag != DEFERRED:
+                    backup = tag == DONE and key in conflicts
+                    with self.metrics.timed("journal"):
+                        journal.record_end(key, tag, how or message, backup)
+                if tag == DEFERRED:
+                    self.deferred.append((key, orig, new))
+                elif manifest is not None:
+                    digest = self._digests.pop(new, None)
+                    if digest is not None:
+                        manifest.add(new, digest)
+                self.counts[tag] += 1
+                if on_result is not None:
+                    with self.metrics.timed("callback"):
+                        on_result(key, orig, tag, message)
+
+        # big files get threads of their own, taken from the worker count
+        streams = min(STREAM_WORKERS, self.workers - 1) if scheduled else 0
+        executor = ThreadPoolExecutor(max_workers=self.workers - streams, thread_name_prefix="rename")
+        stream_executor = executor
+        if streams:
+            stream_executor = ThreadPoolExecutor(max_workers=streams, thread_name_prefix="stream")
+        batch = []
+        batch_bytes = 0
+        with self.metrics.phase("transfer"):
+            try:
+                # output subfolders all exist before the first transfer starts
+                with self.metrics.phase("mkdir"):
+                    make_dirs(self.output_dir, {
+                        os.path.dirname(new) for key, _, new in plan
+                        if new.strip() and key not in completed and key not in preflight.errors
+                    }, executor)
+
+                order = plan
+                layout = {}
+                if scheduled:
+                    with self.metrics.phase("schedule"):
+                        layout = disk_layout([
+                            (key, os.path.join(self.input_dir, orig)) for key, orig, new in plan
+                            if new.strip() and key not in completed and key not in preflight.errors
+                        ], self.schedule, executor)
+                        order = disk_order(plan, layout)
+
+                for key, orig, new in order:
+                    if self.stopped:
+                        break
+
+                    if key in completed:
+                        pending.add((key, orig, new, (DONE, "", "")))
+                    elif not new.strip():
+                        pending.add((key, orig, new, (SKIPPED, "", "")))
+                    elif key in preflight.errors:
+                        pending.add((key, orig, new, (ERROR, preflight.errors[key], "")))
+                    elif key in preflight.duplicates:
+                        pending.add((key, orig, new, (ERROR, "Duplicate new name", "")))
+                    elif key in up_to_date:
+                        pending.add((key, orig, new, (UP_TO_DATE, "", "")))
+                    elif key in conflicts and key not in stale and self.conflict == "skip":
+                        pending.add((key, orig, new, (SKIPPED, "", "")))
+                    elif key in conflicts and key not in stale and self.conflict == "defer":
+                        pending.add((key, orig, new, (DEFERRED, "", "")))
+                    elif self.in_place:
+                        if new == orig or key in finished:
+                            pending.add((key, orig, new, (DONE, "", "rename")))
+                        else:
+                            if key not in tasks:
+                                self._submit_chain(executor, chain_of[key], tasks, backups, conflicts,
+                                                   journal)
+                            pending.add((key, orig, new, tasks[key]))
+                    else:
+                        src = os.path.join(self.input_dir, orig)
+                        dst = os.path.join(self.output_dir, new)
+                        if (resuming and self.mode == "move"
+                                and not os.path.lexists(src) and os.path.lexists(dst)
+                                and (key not in conflicts
+                                     or os.path.lexists(journal.backup_path(new)))):
+                            # moved before the crash, but its records were lost with the
+                            # last unflushed batch; a destination that was there before
+                            # only counts once it was backed up
+                            pending.add((key, orig, new, (DONE, "", "move")))
+                        else:
+                            if journal is not None:
+                                journal.record_start(key)
+                            # the limiter is asked per file, so new limits apply to the next one
+                            transfer_args = (self.mode, same_dev, self.limiter.chunk_size(self.chunk_size),
+                                             self._add_bytes, self._throttle)
+                            if journal is not None and key in conflicts:
+                                # keep the file we replace so the job can be undone
+                                fn = replace_with_backup
+                                args = (src, dst, journal.backup_path(new)) + transfer_args
+                            else:
+                                fn = transfer_file
+                                args = (src, dst) + transfer_args
+                            size = layout[key][0] if key in layout else None
+                            if size is not None and size <= SMALL_FILE:
+                                task = Future()
+                                batch.append((task, new, fn, args))
+                                batch_bytes += size
+                                if len(batch) >= BATCH_FILES or batch_bytes >= BATCH_BYTES:
+                                    self._submit_batch(executor, batch)
+                                    batch, batch_bytes = [], 0
+                            elif size is not None and size >= LARGE_FILE:
+                                task = stream_executor.submit(self._transfer, new, fn, *args)
+                            else:
+                                task = executor.submit(self._transfer, new, fn, *args)
+                            pending.add((key, orig, new, task))
+                    if batch and len(pending) > max_pending:
+                        # report() is about to wait, maybe on a row of this batch
+                        self._submit_batch(executor, batch)
+                        batch, batch_bytes = [], 0
+                    report(max_pending)
+                if batch:
+                    self._submit_batch(executor, batch)
+            except BaseException:
+                self.stopped = True
+                stream_executor.shutdown(wait=True, cancel_futures=True)
+                executor.shutdown(wait=True, cancel_futures=True)
+                if journal is not None:
+                    journal.close(finished=False)
+                if manifest is not None:
+                    manifest.close()
+                raise
+
+            stream_executor.shutdown(wait=True, cancel_futures=self.stopped)
+            executor.shutdown(wait=True, cancel_futures=self.stopped)
+            report(0)
+        if manifest is not None:
+            manifest.close()
+        if journal is not None:
+            # with rows still deferred the job isn't over, resume offers them again
+            journal.close(finished=not self.stopped and not self.deferred)
+        if self.sync_index is not None:
+            self.sync_index.save()
+        return dict(self.counts)
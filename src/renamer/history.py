@@ -0,0 +1,234 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .engine import DONE, ERROR
+from .inplace import order_renames, rename_file
+from .journal import Journal, list_journals, read_summary
+from .preflight import is_case_insensitive
+from .transfer import DEFAULT_WORKERS, transfer_file
+
+
+# Both steps are idempotent, so a stopped undo or redo can simply be run again
+def _undo_row(src, dst, how, backup):
+    if how == "move":
+        if os.path.lexists(dst):
+            if os.path.lexists(src):
+                raise FileExistsError(f"{os.path.basename(src)} is back in the input folder")
+            try:
+                os.replace(dst, src)
+            except OSError:
+                shutil.move(dst, src)
+    elif os.path.lexists(dst):
+        os.unlink(dst)
+
+    if backup and os.path.lexists(backup):
+        os.replace(backup, dst)
+
+
+def _redo_row(src, dst, how, backup):
+    if backup and os.path.lexists(dst) and not os.path.lexists(backup):
+        os.makedirs(os.path.dirname(backup), exist_ok=True)
+        os.replace(dst, backup)
+    if how == "move" and not os.path.lexists(src) and os.path.lexists(dst):
+        return
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    transfer_file(src, dst, how or "copy")
+
+
+def _replay_chain(folder, chain, op, backups):
+    """Undo or redo one chain of in-place renames in order; returns
+    (key, tag, message) per row.  Rows already back where they belong are
+    passed over, so this is idempotent like _undo_row/_redo_row."""
+    results = []
+    parked = len(chain) > 1 and chain[0][0] == chain[-1][0]
+    blocker = None
+    stranded = False
+    for index, (key, src, dst) in enumerate(chain):
+        if blocker is not None:
+            if stranded and index == len(chain) - 1:
+                results.append((key, ERROR, f"Left as {src}, {blocker} is still in the way"))
+            else:
+                results.append((key, ERROR, f"Not renamed, {blocker} is still in the way"))
+            continue
+        src_path = os.path.join(folder, src)
+        dst_path = os.path.join(folder, dst)
+        try:
+            if parked and index == 0:
+                rename_file(src_path, dst_path)
+                stranded = True
+                continue
+            if os.path.lexists(src_path) or not os.path.lexists(dst_path):
+                if op == "undo":
+                    rename_file(src_path, dst_path)
+                else:
+                    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+                    rename_file(src_path, dst_path, backups.get(key))
+            backup = backups.get(key)
+            if op == "undo" and backup and os.path.lexists(backup):
+                os.replace(backup, src_path)
+            results.append((key, DONE, ""))
+        except OSError as e:
+            blocker = os.path.basename(src)
+            results.append((key, ERROR, str(e)))
+    return results
+
+
+def _remove_empty(root, folder):
+    """Remove root/folder and its parents below root while they are empty."""
+    while folder:
+        try:
+            os.rmdir(os.path.join(root, folder))
+        except OSError:
+            return
+        folder = os.path.dirname(folder)
+
+
+def _replay(journal, op, workers, on_result, stop):
+    """Run _undo_row/_redo_row for every completed row of journal."""
+    step = _undo_row if op == "undo" else _redo_row
+    input_dir = journal.header["input"]
+    output_dir = journal.header["output"]
+    completed = journal.completed
+    counts = {DONE: 0, ERROR: 0}
+
+    rows = [(key, orig, new) for key, orig, new in journal.plan if key in completed]
+    if op == "undo":
+        rows.reverse()
+
+    # Files an in-place job renamed may have swapped names, so they are
+    # renamed back in the order order_renames() gives, one chain per task.
+    origs = {key: orig for key, orig, _ in rows}
+    renamed = {key for key, _, _ in rows if journal.results[key][1] == "rename"}
+    renames = [
+        (key, new, orig) if op == "undo" else (key, orig, new)
+        for key, orig, new in rows if key in renamed and new != orig
+    ]
+    chains = []
+    backups = {}
+    if renames:
+        fold = str.casefold if is_case_insensitive(output_dir) else None
+        chains = order_renames(renames, fold)
+        backups = {key: journal.backup_path(dst if op == "redo" else src)
+                   for key, src, dst in renames if key in journal.backups}
+    # renamed to the name they already had
+    unchanged = renamed.difference(key for key, _, _ in renames)
+
+    stopped = False
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=op) as executor:
+        futures = {}
+        for key in unchanged:
+            counts[DONE] += 1
+            if on_result is not None:
+                on_result(key, origs[key], DONE, "")
+        for chain in chains:
+            if stop is not None and stop():
+                stopped = True
+                break
+            futures[executor.submit(_replay_chain, output_dir, chain, op, backups)] = None
+
+        for key, orig, new in rows:
+            if stopped or (stop is not None and stop()):
+                stopped = True
+                break
+            if key in renamed:
+                continue
+            how = journal.results[key][1]
+            backup = journal.backup_path(new) if key in journal.backups else None
+            future = executor.submit(step, os.path.join(input_dir, orig),
+                                     os.path.join(output_dir, new), how, backup)
+            futures[future] = key
+
+        for future in as_completed(futures):
+            if futures[future] is None:
+                results = future.result()
+            else:
+                key = futures[future]
+                try:
+                    future.result()
+                    results = [(key, DONE, "")]
+                except Exception as e:
+                    results = [(key, ERROR, str(e))]
+            for key, tag, message in results:
+                counts[tag] += 1
+                if on_result is not None:
+                    on_result(key, origs[key], tag, message)
+
+    if stopped:
+        return counts
+
+    if op == "undo":
+        # subfolders the job created, deepest first, then the backup folder
+        folders = {os.path.dirname(new) for _, _, new in rows}
+        folders.discard("")
+        for folder in sorted(folders, key=len, reverse=True):
+            _remove_empty(output_dir, folder)
+            _remove_empty(os.path.dirname(journal.backup_path("x")), folder)
+        try:
+            os.rmdir(os.path.dirname(journal.backup_path("x")))
+        except OSError:
+            pass
+
+    journal.record_history(op)
+    return counts
+
+
+def undo_job(journal, workers=DEFAULT_WORKERS, on_result=None, stop=None):
+    """Reverse a finished job: delete copies and links, move moved files
+    back and restore the files it overwrote.  Returns the result counts."""
+    return _replay(journal, "undo", workers, on_result, stop)
+
+
+def redo_job(journal, workers=DEFAULT_WORKERS, on_result=None, stop=None):
+    """Apply an undone job again, the same way it was first done."""
+    return _replay(journal, "redo", workers, on_result, stop)
+
+
+def _changed_something(summary):
+    """Whether the job of a journal completed any row, loading it only when
+    its summary doesn't tell; returns (answer, loaded journal or None)."""
+    if summary.done is not None:
+        return summary.done > 0, None
+    journal = Journal.load(summary.path)
+    return bool(journal.completed), journal
+
+
+def undo_candidate(folder=None):
+    """Newest job that is applied and changed something, or None."""
+    for path in list_journals(folder):
+        try:
+            summary = read_summary(path)
+            if summary.undone:
+                continue
+            changed, journal = _changed_something(summary)
+            if changed:
+                return journal or Journal.load(path)
+        except OSError:
+            continue
+    return None
+
+
+def redo_candidate(folder=None):
+    """The job undone last, i.e. the oldest of the undone jobs that are
+    newer than every applied one, or None."""
+    candidate = None
+    for path in list_journals(folder):
+        try:
+            summary = read_summary(path)
+            changed, journal = _changed_something(summary)
+        except OSError:
+            continue
+        if not changed:
+            continue
+        if not summary.undone:
+            break
+        candidate = (path, journal)
+    if candidate is None:
+        return None
+    path, journal = candidate
+    if journal is not None:
+        return journal
+    try:
+        return Journal.load(path)
+    except OSError:
+        return None
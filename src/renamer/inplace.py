@@ -0,0 +1,106 @@
+import errno
+import os
+
+# Cycles are broken by parking one file under this name in its folder
+TEMP_PREFIX = ".renamer-swap-"
+
+
+def temp_name(path, key):
+    """Parking name for row key, beside path; the same on every run so an
+    interrupted job can find it again."""
+    return os.path.join(os.path.dirname(path), f"{TEMP_PREFIX}{key}")
+
+
+def is_in_place(input_dir, output_dir, mode):
+    """True when a job renames files where they are instead of transferring
+    them: same folder and a mode that doesn't ask for a second copy."""
+    if mode not in ("auto", "move"):
+        return False
+    try:
+        return os.path.samefile(input_dir, output_dir)
+    except OSError:
+        return False
+
+
+def rename_file(src, dst, backup=None, replace=False):
+    """Atomically rename src to dst without clobbering another file.
+
+    An existing dst is moved to ``backup`` first, replaced if ``replace``
+    is set and refused with FileExistsError otherwise.  dst may be src
+    itself in another case.
+    """
+    if os.path.lexists(dst) and not _same_file(src, dst):
+        if backup is not None:
+            if not os.path.lexists(backup):
+                os.makedirs(os.path.dirname(backup), exist_ok=True)
+                os.replace(dst, backup)
+        elif not replace:
+            raise FileExistsError(errno.EEXIST, "Destination exists", dst)
+    os.replace(src, dst)
+    return "rename"
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def order_renames(rows, fold=None):
+    """Order (key, src, dst) renames inside one folder tree so that no file
+    is renamed onto a name another row still has to move away from.
+
+    Every name is the source of at most one row and the target of at most
+    one, so the renames form simple chains and cycles.  A chain runs from
+    its far end back to its start; a cycle parks one of its files under a
+    temp_name() first, which is the only extra rename needed per cycle.
+    ``fold`` maps a name to the form the filesystem compares (str.casefold
+    on case-insensitive ones).
+
+    Returns a list of chains, each a list of (key, src, dst) steps that
+    must run in order.  Different chains never touch the same name, so
+    they can run in parallel.  In a cycle the parked row appears twice,
+    first as (key, src, temp) and last as (key, temp, dst).
+    """
+    fold = fold or (lambda name: name)
+    by_src = {}
+    for row in rows:
+        by_src[fold(row[1])] = row
+
+    # next_row[key]: the row that currently holds key's destination name
+    next_row = {}
+    targeted = set()
+    for key, src, dst in rows:
+        folded = fold(dst)
+        holder = by_src.get(folded)
+        if holder is not None and holder[0] != key:
+            next_row[key] = holder
+            targeted.add(holder[0])
+
+    chains = []
+    visited = set()
+    for row in rows:
+        if row[0] in targeted:
+            continue
+        path = []
+        while row is not None and row[0] not in visited:
+            visited.add(row[0])
+            path.append(row)
+            row = next_row.get(row[0])
+        path.reverse()
+        chains.append(path)
+
+    # whatever is left is a closed loop
+    for row in rows:
+        if row[0] in visited:
+            continue
+        path = []
+        while row[0] not in visited:
+            visited.add(row[0])
+            path.append(row)
+            row = next_row[row[0]]
+        key, src, dst = path[0]
+        temp = temp_name(src, key)
+        chains.append([(key, src, temp)] + path[:0:-1] + [(key, temp, dst)])
+    return chains
@@ -0,0 +1,289 @@
+import json
+import os
+import time
+
+from .paths import journal_dir
+
+# A batch of records is flushed and fsync'ed once it is this big or this old
+JOURNAL_FLUSH_RECORDS = 512
+JOURNAL_FLUSH_SECONDS = 1.0
+
+JOURNAL_SUFFIX = ".jsonl"
+
+# Bytes read from the end of a journal for its close and undo/redo records
+JOURNAL_TAIL = 16 * 1024
+
+# Finished jobs kept for undo; older ones are pruned unless they hold backups
+JOURNAL_KEEP = 100
+
+
+class Journal:
+    """Append-only write-ahead log of one rename job, one JSON object per line.
+
+    Records, in order of appearance::
+
+        {"op": "job", "input": ..., "output": ..., "mode": ..., "conflict": ..., "verify": ...}
+        {"op": "plan", "k": key, "src": original, "dst": new, "x": 1}
+        {"op": "start", "k": key}  /  {"op": "start", "k": key, "i": inode}
+        {"op": "end", "k": key, "tag": "done", "how": "copy", "b": 1}
+        {"op": "close", "done": 12, "b": 1}
+        {"op": "undo"} / {"op": "redo"}
+
+    ``"x": 1`` marks rows whose destination existed before the job, so on
+    resume any other existing destination is known to be our own partial
+    work and is overwritten.  ``"b": 1`` means the file that was replaced
+    is kept under backup_path() for undo; ``"i"`` is the inode of a file an
+    in-place job renames round a cycle, so resume can tell how far the
+    cycle got.  The close record counts the rows done and the backups kept,
+    so read_summary() needn't read the rows.  Undo/redo records track
+    whether the job is currently applied.  Writes are buffered and fsync'ed
+    in batches; a crash loses at most the last batch, which resume simply
+    redoes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = {}
+        self.plan = []
+        self.preexisting = set()
+        self.started = set()
+        self.inodes = {}
+        self.results = {}
+        self.backups = set()
+        self.closed = False
+        self.undone = False
+        self._file = None
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    @property
+    def job_id(self):
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+    @property
+    def planned(self):
+        return bool(self.plan)
+
+    @property
+    def completed(self):
+        """Keys that finished successfully."""
+        return {key for key, (tag, _) in self.results.items() if tag == "done"}
+
+    @classmethod
+    def create(cls, input_dir, output_dir, mode, conflict, folder=None, verify="off", sync="off"):
+        folder = folder or journal_dir()
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        job_id = f"{stamp}-{int(now * 1000) % 1000:03d}-{os.getpid()}"
+        journal = cls(os.path.join(folder, job_id + JOURNAL_SUFFIX))
+        journal.header = {
+            "op": "job",
+            "input": input_dir,
+            "output": output_dir,
+            "mode": mode,
+            "conflict": conflict,
+            "verify": verify,
+            "sync": sync,
+            "created": now,
+        }
+        journal._write(journal.header)
+        journal.flush()
+        prune_journals(folder)
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """Rebuild the state of a journal; a torn last line is ignored."""
+        journal = cls(path)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                op = record.get("op")
+                if op == "job":
+                    journal.header = record
+                elif op == "plan":
+                    journal.plan.append((record["k"], record["src"], record["dst"]))
+                    if record.get("x"):
+                        journal.preexisting.add(record["k"])
+                elif op == "start":
+                    journal.started.add(record["k"])
+                    if "i" in record:
+                        journal.inodes[record["k"]] = record["i"]
+                elif op == "end":
+                    journal.results[record["k"]] = (record["tag"], record.get("how", ""))
+                    if record.get("b"):
+                        journal.backups.add(record["k"])
+                elif op == "close":
+                    journal.closed = True
+                elif op in ("undo", "redo"):
+                    journal.undone = op == "undo"
+        return journal
+
+    def _write(self, record):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._buffer.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        if (len(self._buffer) >= JOURNAL_FLUSH_RECORDS
+                or time.monotonic() - self._last_flush >= JOURNAL_FLUSH_SECONDS):
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            return
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def record_plan(self, plan, preexisting=()):
+        for key, orig, new in plan:
+            record = {"op": "plan", "k": key, "src": orig, "dst": new}
+            if key in preexisting:
+                record["x"] = 1
+                self.preexisting.add(key)
+            self._write(record)
+            self.plan.append((key, orig, new))
+        self.flush()
+
+    def record_start(self, key, inode=None):
+        self.started.add(key)
+        record = {"op": "start", "k": key}
+        if inode is not None:
+            record["i"] = inode
+            self.inodes[key] = inode
+        self._write(record)
+
+    def record_end(self, key, tag, how="", backup=False):
+        self.results[key] = (tag, how)
+        record = {"op": "end", "k": key, "tag": tag}
+        if how:
+            record["how"] = how
+        if backup:
+            record["b"] = 1
+            self.backups.add(key)
+        self._write(record)
+
+    def record_history(self, op):
+        """Append an "undo" or "redo" record and flush it."""
+        self.undone = op == "undo"
+        self._write({"op": op, "t": time.time()})
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def backup_path(self, new):
+        return os.path.join(self.header["output"], f".renamer-undo-{self.job_id}", new)
+
+    def close(self, finished=True):
+        """Flush everything; mark the job closed unless it was interrupted."""
+        if finished:
+            self._write({"op": "close", "done": len(self.completed), "b": len(self.backups)})
+            self.closed = True
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def list_journals(folder=None):
+    """Journal paths, newest first."""
+    folder = folder or journal_dir()
+    paths = [
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.endswith(JOURNAL_SUFFIX)
+    ]
+    paths.sort(reverse=True)
+    return paths
+
+
+class JournalSummary:
+    """What the header and the last records of a journal tell.
+
+    ``done`` and ``backups`` are the counts in the close record, or None
+    when the tail has none (a job not closed, or written before the counts
+    were); ``closed`` is None when the tail holds nothing but undo/redo
+    records.  Only Journal.load() knows for sure then.
+    """
+
+    __slots__ = ("path", "header", "closed", "undone", "done", "backups")
+
+    def __init__(self, path):
+        self.path = path
+        self.header = {}
+        self.closed = False
+        self.undone = False
+        self.done = None
+        self.backups = None
+
+
+def read_summary(path):
+    """Summary of a journal from its first line and last JOURNAL_TAIL
+    bytes, so picking a job costs the same however many rows it had.
+    Raises OSError."""
+    summary = JournalSummary(path)
+    with open(path, "rb") as f:
+        first = f.readline()
+        start = max(f.seek(0, os.SEEK_END) - JOURNAL_TAIL, len(first))
+        if start > len(first):
+            # from the byte before, so a record cut off at the start ends
+            # in the first piece, which is dropped
+            f.seek(start - 1)
+            tail = f.read().split(b"\n")[1:]
+        else:
+            f.seek(start)
+            tail = f.read().split(b"\n")
+    try:
+        summary.header = json.loads(first)
+    except ValueError:
+        return summary
+    history_only = True
+    for line in tail:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        op = record.get("op")
+        if op == "close":
+            summary.closed = True
+            summary.done = record.get("done")
+            summary.backups = record.get("b")
+        elif op in ("undo", "redo"):
+            summary.undone = op == "undo"
+            continue
+        history_only = False
+    if history_only and start > len(first):
+        # nothing but undo/redo records in the tail: the close is further up
+        summary.closed = None
+    return summary
+
+
+def find_unfinished(folder=None):
+    """Newest journal that was never closed, or None."""
+    for path in list_journals(folder):
+        try:
+            summary = read_summary(path)
+            if summary.closed or summary.undone:
+                continue
+            journal = Journal.load(path)
+        except OSError:
+            continue
+        if not journal.closed and journal.planned and not journal.undone:
+            return journal
+    return None
+
+
+def prune_journals(folder=None, keep=JOURNAL_KEEP):
+    """Delete the closed journals beyond the newest ``keep``, except those
+    whose job kept backups: without the journal they can't be restored."""
+    for path in list_journals(folder)[keep:]:
+        try:
+            summary = read_summary(path)
+            if summary.closed and summary.backups == 0:
+                os.remove(path)
+        except OSError:
+            continue
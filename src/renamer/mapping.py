@@ -0,0 +1,118 @@
+import csv
+import json
+import os
+
+# File types read_mapping() understands, by extension; anything else is CSV
+MAPPING_TYPES = {".csv": ",", ".tsv": "\t", ".txt": "\t", ".json": None}
+
+
+def _read_json(f):
+    data = json.load(f)
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = []
+        for entry in data:
+            if isinstance(entry, dict):
+                items.append((entry.get("original"), entry.get("new")))
+            elif isinstance(entry, (list, tuple)) and len(entry) >= 2:
+                items.append((entry[0], entry[1]))
+            else:
+                raise ValueError("JSON mapping entries must be [original, new] "
+                                 "or {\"original\": ..., \"new\": ...}")
+    else:
+        raise ValueError("JSON mapping must be an object or a list")
+    return [
+        (str(orig).strip(), "" if new is None else str(new).strip())
+        for orig, new in items
+        if orig is not None and str(orig).strip()
+    ]
+
+
+def read_mapping(path):
+    """Read (original, new) pairs from a CSV file, TSV for .tsv/.txt, or JSON.
+
+    JSON is either ``{"original": "new", ...}`` or a list of ``[original,
+    new]`` pairs or ``{"original": ..., "new": ...}`` objects.  Rows without
+    an original name are left out.  Raises OSError or ValueError.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    delimiter = MAPPING_TYPES.get(ext, ",")
+    # utf-8-sig: spreadsheet exports often start with a BOM
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if ext == ".json":
+            return _read_json(f)
+        pairs = []
+        for row in csv.reader(f, delimiter=delimiter):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            pairs.append((row[0].strip(), row[1].strip()))
+    return pairs
+
+
+class MappingJoin:
+    """A mapping matched against the loaded files by original name.
+
+    ``updates`` maps row index -> new name, ``missing`` lists the rows the
+    mapping has no entry for and ``unknown`` the mapping's originals that
+    match no row.  ``repeated`` counts originals listed more than once; the
+    last entry wins.
+    """
+
+    def __init__(self):
+        self.updates = {}
+        self.missing = []
+        self.unknown = []
+        self.repeated = 0
+
+    def summary(self):
+        parts = [f"{len(self.updates)} matched"]
+        if self.missing:
+            parts.append(f"{len(self.missing)} files without a new name")
+        if self.unknown:
+            parts.append(f"{len(self.unknown)} names not found")
+        if self.repeated:
+            parts.append(f"{self.repeated} listed twice")
+        return ", ".join(parts)
+
+
+def _file_names(originals):
+    """file name -> row, None for a name that several rows share."""
+    by_name = {}
+    for row, path in enumerate(originals):
+        name = path.rpartition(os.sep)[2]
+        by_name[name] = None if name in by_name else row
+    return by_name
+
+
+def join_mapping(originals, pairs):
+    """Match (original, new) pairs to rows through a dict of originals.
+
+    An original is looked up as given first.  A bare file name that is not
+    found falls back to the row with that file name in any subfolder, as
+    long as only one row has it.  Each side is read once, so the cost is
+    linear in the number of rows plus pairs.
+    """
+    result = MappingJoin()
+    lookup = {orig: row for row, orig in enumerate(originals)}.get
+    by_name = None
+    updates = result.updates
+    matched = 0
+    for orig, new in pairs:
+        row = lookup(orig)
+        if row is None:
+            if os.sep != "/":
+                row = lookup(orig.replace("/", os.sep))
+            if row is None and os.sep not in orig and "/" not in orig:
+                if by_name is None:
+                    by_name = _file_names(originals)
+                row = by_name.get(orig)
+            if row is None:
+                result.unknown.append(orig)
+                continue
+        updates[row] = new
+        matched += 1
+
+    result.repeated = matched - len(updates)
+    result.missing = [row for row in range(len(originals)) if row not in updates]
+    return result
@@ -0,0 +1,203 @@
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets are powers of two in microseconds: bucket k counts
+# operations that took less than 2**k us, the last one everything longer.
+LATENCY_BUCKETS = 32
+
+# Operations that move a file, whose p95 latency the live view shows
+TRANSFER_OPS = ("copy", "move", "hardlink", "reflink", "rename")
+
+
+def peak_memory():
+    """Peak resident memory of this process in bytes, or None."""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class Counters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                        "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                        "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+                    )
+                ]
+
+            counters = Counters()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            psapi = ctypes.windll.psapi
+            if psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.PeakWorkingSetSize
+        except (OSError, AttributeError):
+            pass
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Histogram:
+    """Log2 latency histogram; constant memory however many samples."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * LATENCY_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        bucket = int(seconds * 1_000_000).bit_length()
+        self.counts[min(bucket, LATENCY_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper bound in seconds of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(2 ** bucket / 1_000_000, self.max)
+        return self.max
+
+    def to_dict(self):
+        ms = 1000
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": self.total / self.count * ms if self.count else 0.0,
+            "p50_ms": self.percentile(50) * ms,
+            "p95_ms": self.percentile(95) * ms,
+            "p99_ms": self.percentile(99) * ms,
+            "max_ms": self.max * ms,
+            # "le_<us>" -> count, empty buckets left out
+            "buckets": {
+                f"le_{2 ** bucket}us": n for bucket, n in enumerate(self.counts) if n
+            },
+        }
+
+
+class Metrics:
+    """Timings of one job: wall time per phase and a latency histogram per
+    operation, plus the busy time of the transfer workers.
+
+    Safe to record from any thread.  ``phases`` are things like "preflight"
+    or "transfer"; operations are per-file steps such as "copy", "stat" or
+    "callback" (time spent in on_result).
+    """
+
+    def __init__(self, workers=1):
+        self.workers = max(1, workers)
+        self.phases = {}
+        self.ops = {}
+        self.busy = 0.0
+        self._running = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        with self._lock:
+            self._running[name] = start
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                del self._running[name]
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def phase_time(self, name):
+        """Seconds spent in phase so far, including a run still going."""
+        with self._lock:
+            elapsed = self.phases.get(name, 0.0)
+            start = self._running.get(name)
+        if start is not None:
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    def record(self, op, seconds, worker=False):
+        """Add one sample of op; ``worker`` counts it as transfer-pool busy time."""
+        with self._lock:
+            histogram = self.ops.get(op)
+            if histogram is None:
+                histogram = self.ops[op] = Histogram()
+            histogram.record(seconds)
+            if worker:
+                self.busy += seconds
+
+    @contextmanager
+    def timed(self, op, worker=False):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(op, time.perf_counter() - start, worker)
+
+    def snapshot(self, files=0, bytes_done=0):
+        """Rates and utilisation right now, cheap enough to call per UI tick."""
+        elapsed = self.phase_time("transfer")
+        with self._lock:
+            busy = self.busy
+            transfers = [histogram for op, histogram in self.ops.items() if op in TRANSFER_OPS]
+            p95 = max((h.percentile(95) for h in transfers), default=0.0)
+        return {
+            "elapsed_s": elapsed,
+            "files": files,
+            "bytes": bytes_done,
+            "files_per_s": files / elapsed if elapsed else 0.0,
+            "mb_per_s": bytes_done / 2**20 / elapsed if elapsed else 0.0,
+            "utilisation": min(1.0, busy / (elapsed * self.workers)) if elapsed else 0.0,
+            "p95_ms": p95 * 1000,
+        }
+
+    def to_dict(self, files=0, bytes_done=0):
+        result = self.snapshot(files, bytes_done)
+        result["workers"] = self.workers
+        result["peak_memory_bytes"] = peak_memory()
+        with self._lock:
+            result["phases_s"] = dict(self.phases)
+            result["ops"] = {op: histogram.to_dict() for op, histogram in self.ops.items()}
+        return result
+
+    def write(self, path, files=0, bytes_done=0):
+        """Write to path as CSV if it ends in .csv, otherwise as JSON."""
+        data = self.to_dict(files, bytes_done)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["metric", "value"])
+                writer.writerows(_flatten(data))
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        return path
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, name + ".")
+        else:
+            yield name, value
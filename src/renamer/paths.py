@@ -0,0 +1,50 @@
+import os
+import sys
+
+APP_NAME = "bulk-file-renamer"
+
+
+def user_state_dir():
+    """Per-user folder for job journals, history and metrics."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        path = os.path.join(base, "BulkFileRenamer")
+    elif sys.platform == "darwin":
+        path = os.path.expanduser("~/Library/Application Support/BulkFileRenamer")
+    else:
+        base = os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state")
+        path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def user_cache_dir():
+    """Per-user folder for data that can be rebuilt, such as scan caches."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        path = os.path.join(base, "BulkFileRenamer", "Cache")
+    elif sys.platform == "darwin":
+        path = os.path.expanduser("~/Library/Caches/BulkFileRenamer")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def journal_dir():
+    path = os.path.join(user_state_dir(), "journals")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def metrics_dir():
+    path = os.path.join(user_state_dir(), "metrics")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def scan_cache_dir():
+    path = os.path.join(user_cache_dir(), "scans")
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+
+from .utils import validate_path
+
+
+def is_case_insensitive(path):
+    """True if file names in path are matched without regard to case."""
+    try:
+        fd, probe = tempfile.mkstemp(prefix=".renamer-case-", dir=path)
+    except OSError:
+        return sys.platform in ("win32", "darwin")
+    os.close(fd)
+    try:
+        return os.path.exists(os.path.join(path, os.path.basename(probe).upper()))
+    finally:
+        os.unlink(probe)
+
+
+def list_names(path):
+    """Set of every entry name in path (empty if it can't be read)."""
+    try:
+        with os.scandir(path) as it:
+            return {entry.name for entry in it}
+    except OSError:
+        return set()
+
+
+class Preflight:
+    """Every problem of a plan, found before anything is transferred.
+
+    ``errors`` maps key -> validation message, ``conflicts`` maps key -> new
+    name for rows whose destination already exists, and ``duplicates`` maps
+    key -> key of the earlier row that claimed the same new name.
+    ``up_to_date`` holds the keys a sync run found already current and
+    ``stale`` the ones whose destination it found changed; neither are
+    conflicts.  When the output folder is case-insensitive, names that
+    differ only in case count as the same name.
+    """
+
+    def __init__(self, case_insensitive=False):
+        self.case_insensitive = case_insensitive
+        self.errors = {}
+        self.conflicts = {}
+        self.duplicates = {}
+        self.up_to_date = set()
+        self.stale = set()
+
+    def __bool__(self):
+        return bool(self.errors or self.conflicts or self.duplicates)
+
+    def summary(self):
+        parts = []
+        if self.up_to_date:
+            parts.append(f"{len(self.up_to_date)} up to date")
+        if self.stale:
+            parts.append(f"{len(self.stale)} changed")
+        if self.conflicts:
+            parts.append(f"{len(self.conflicts)} already exist")
+        if self.duplicates:
+            parts.append(f"{len(self.duplicates)} duplicate names")
+        if self.errors:
+            parts.append(f"{len(self.errors)} invalid names")
+        return ", ".join(parts) or "No problems found"
+
+
+def check_plan(plan, output_dir, case_insensitive=None):
+    """Validate a (key, original, new) plan against output_dir in one pass.
+
+    ``new`` may be a path relative to output_dir.  Every output folder the
+    plan touches is listed once into a set and the planned names go into a
+    dict, so the cost is one directory read per folder plus O(1) per row.
+    """
+    if case_insensitive is None:
+        case_insensitive = os.path.isdir(output_dir) and is_case_insensitive(output_dir)
+    fold = str.casefold if case_insensitive else (lambda name: name)
+
+    # folded folder -> folded names in it, each folder listed once
+    existing = {}
+    claimed = {}
+    result = Preflight(case_insensitive)
+
+    for key, orig, new in plan:
+        if not new.strip():
+            continue
+
+        is_valid, error_msg = validate_path(new)
+        if not is_valid:
+            result.errors[key] = error_msg
+            continue
+
+        folded = fold(new)
+        if folded in claimed:
+            result.duplicates[key] = claimed[folded]
+            continue
+        claimed[folded] = key
+
+        folder, name = os.path.split(folded)
+        names = existing.get(folder)
+        if names is None:
+            listing = list_names(os.path.join(output_dir, os.path.dirname(new)))
+            names = existing[folder] = {fold(entry) for entry in listing}
+        if name in names:
+            result.conflicts[key] = new
+
+    return result
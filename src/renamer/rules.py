@@ -0,0 +1,428 @@
+"""Rename rules, compiled once and applied to whole lists of names.
+
+Replace and regex rules work on the full name; case, insert and strip work
+on the stem and keep the extension; a template builds the whole name from
+``{name}`` (stem), ``{ext}`` (extension with its dot), ``{counter}``,
+``{size}`` and ``{mtime}``.  Fields take the usual format specs, e.g.
+``{counter:03}`` or ``{mtime:%Y%m%d}``.
+"""
+import datetime
+import math
+import os
+import re
+from string import Formatter
+
+RULE_TYPES = ("replace", "regex", "template", "case", "insert", "strip")
+CASE_MODES = ("lower", "upper", "title", "capitalize", "swapcase")
+TEMPLATE_FIELDS = ("name", "ext", "counter", "size", "mtime")
+
+# {mtime} without a spec; str(datetime) would contain ':'
+MTIME_FORMAT = "%Y-%m-%d"
+
+
+def split_ext(name):
+    """(stem, ext) like os.path.splitext, without its per-call overhead."""
+    dot = name.rfind(".")
+    if dot <= 0 or name[0] == "." and not name[:dot].strip("."):
+        return name, ""
+    return name[:dot], name[dot:]
+
+
+_GROUP_REF = re.compile(r"\\(?:g<([^>]*)>|(\d\d?))")
+
+
+def compile_replacement(pattern, replacement):
+    """Replacement for pattern.sub(), as a function when it refers to groups.
+
+    re expands a template string in Python code on every call; a format
+    string filled from the match is about twice as fast.  Falls back to the
+    template string for escapes other than group references.
+    """
+    if "\\" not in replacement:
+        return replacement
+    parts = []
+    last = 0
+    for ref in _GROUP_REF.finditer(replacement):
+        literal = replacement[last:ref.start()]
+        if "\\" in literal:
+            return replacement
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if ref.group(2) is not None and (
+                ref.group(2)[0] == "0" or replacement[ref.end():ref.end() + 1].isdigit()):
+            # \0, \0N and \NNN are octal escapes to re, not group references
+            return replacement
+        group = ref.group(1) or ref.group(2)
+        index = pattern.groupindex.get(group)
+        if index is None:
+            if not group.isdigit():
+                return replacement
+            index = int(group)
+        if index > pattern.groups:
+            return replacement
+        parts.append("{%d}" % index)
+        last = ref.end()
+    tail = replacement[last:]
+    if "\\" in tail:
+        return replacement
+    parts.append(tail.replace("{", "{{").replace("}", "}}"))
+    fmt = "".join(parts).format
+    return lambda match: fmt(match.group(), *match.groups(""))
+
+
+class FileInfo:
+    """Per-row size and mtime for templates, looked up by row index.
+
+    Sizes come from the scan; mtimes are stat'ed on first use only, so rules
+    that don't need them never touch the disk.  ``mtimes`` may be a caller's
+    sequence of timestamps with NaN for "not read yet"; it is filled in as
+    files are stat'ed, so the caller keeps them for the next pipeline.
+    """
+
+    def __init__(self, folder=None, names=(), sizes=None, mtimes=None):
+        self.folder = folder
+        self.names = names
+        self.sizes = sizes
+        self.stamps = mtimes
+        self._mtimes = {}
+
+    def size(self, index):
+        if self.sizes is not None and self.sizes[index] is not None:
+            return self.sizes[index]
+        try:
+            return os.stat(os.path.join(self.folder, self.names[index])).st_size
+        except (OSError, TypeError):
+            return 0
+
+    def mtime(self, index):
+        mtime = self._mtimes.get(index)
+        if mtime is None:
+            stamp = self.stamps[index] if self.stamps is not None else math.nan
+            if math.isnan(stamp):
+                try:
+                    stamp = os.stat(os.path.join(self.folder, self.names[index])).st_mtime
+                except (OSError, TypeError):
+                    stamp = 0.0
+                if self.stamps is not None:
+                    self.stamps[index] = stamp
+            try:
+                mtime = datetime.datetime.fromtimestamp(stamp)
+            except (OverflowError, OSError, ValueError):
+                mtime = datetime.datetime.fromtimestamp(0)
+            self._mtimes[index] = mtime
+        return mtime
+
+
+class Rule:
+    """One rename step.  apply() maps a list of names to a list of new names;
+    ``indices`` are the row numbers of those names in the whole file list."""
+
+    def apply(self, names, indices, info):
+        raise NotImplementedError
+
+    def describe(self):
+        raise NotImplementedError
+
+
+class ReplaceRule(Rule):
+    def __init__(self, find, replacement="", regex=False, ignore_case=False):
+        if not find:
+            raise ValueError("Nothing to find")
+        self.find = find
+        self.replacement = replacement
+        self.regex = regex
+        self.ignore_case = ignore_case
+        self._literal = not regex and not ignore_case
+        if not self._literal:
+            pattern = find if regex else re.escape(find)
+            try:
+                self._pattern = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern: {e}") from None
+            if not regex:
+                # a literal replacement must not expand backslashes
+                replacement = replacement.replace("\\", "\\\\")
+            # an unknown \g<name> is an IndexError rather than a re.error
+            try:
+                self._pattern.sub(replacement, "")
+            except (re.error, IndexError) as e:
+                raise ValueError(f"Invalid replacement: {e}") from None
+            self._replacement = compile_replacement(self._pattern, replacement)
+
+    def apply(self, names, indices, info):
+        if self._literal:
+            find, replacement = self.find, self.replacement
+            return [name.replace(find, replacement) for name in names]
+        sub, replacement = self._pattern.sub, self._replacement
+        return [sub(replacement, name) for name in names]
+
+    def describe(self):
+        kind = "Regex" if self.regex else "Replace"
+        flags = " (ignore case)" if self.ignore_case else ""
+        return f"{kind} '{self.find}' -> '{self.replacement}'{flags}"
+
+
+class TemplateRule(Rule):
+    def __init__(self, template, start=1, step=1):
+        if not template:
+            raise ValueError("Empty template")
+        self.template = template
+        self.start = start
+        self.step = step
+
+        # Rewritten to positional fields so each row is one str.format call
+        parts = []
+        self._fields = []
+        try:
+            parsed = list(Formatter().parse(template))
+        except ValueError as e:
+            raise ValueError(f"Invalid template: {e}") from None
+        for literal, field, spec, conversion in parsed:
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if field not in TEMPLATE_FIELDS:
+                raise ValueError(f"Unknown field {{{field}}}")
+            if field == "mtime" and not spec:
+                spec = MTIME_FORMAT
+            parts.append("{%d%s%s}" % (
+                len(self._fields),
+                "!" + conversion if conversion else "",
+                ":" + spec if spec else "",
+            ))
+            self._fields.append(field)
+        self._format = "".join(parts).format
+
+        sample = {
+            "name": "x", "ext": ".x", "counter": 1, "size": 1,
+            "mtime": datetime.datetime.fromtimestamp(0),
+        }
+        try:
+            self._format(*[sample[field] for field in self._fields])
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid template: {e}") from None
+
+    def apply(self, names, indices, info):
+        # one column per field, then a single str.format per row
+        fmt = self._format
+        split = [split_ext(name) for name in names]
+        columns = []
+        for field in self._fields:
+            if field == "name":
+                columns.append([stem for stem, _ in split])
+            elif field == "ext":
+                columns.append([ext for _, ext in split])
+            elif field == "counter":
+                start, step = self.start, self.step
+                columns.append([start + index * step for index in indices])
+            elif field == "size":
+                columns.append([info.size(index) for index in indices])
+            else:
+                columns.append([info.mtime(index) for index in indices])
+        if not columns:
+            return [fmt()] * len(names)
+        return [fmt(*values) for values in zip(*columns)]
+
+    def describe(self):
+        return f"Template '{self.template}'"
+
+
+class CaseRule(Rule):
+    def __init__(self, mode):
+        if mode not in CASE_MODES:
+            raise ValueError(f"Case must be one of {', '.join(CASE_MODES)}")
+        self.mode = mode
+        self._convert = getattr(str, mode)
+
+    def apply(self, names, indices, info):
+        convert = self._convert
+        result = []
+        for name in names:
+            stem, ext = split_ext(name)
+            result.append(convert(stem) + ext)
+        return result
+
+    def describe(self):
+        return f"Case: {self.mode}"
+
+
+class InsertRule(Rule):
+    """Insert text into the stem; negative positions count from its end,
+    -1 being right before the extension."""
+
+    def __init__(self, text, position=0):
+        if not text:
+            raise ValueError("Nothing to insert")
+        self.text = text
+        self.position = position
+
+    def apply(self, names, indices, info):
+        text, position = self.text, self.position
+        result = []
+        for name in names:
+            stem, ext = split_ext(name)
+            at = position if position >= 0 else max(0, len(stem) + position + 1)
+            result.append(stem[:at] + text + stem[at:] + ext)
+        return result
+
+    def describe(self):
+        where = "start" if self.position == 0 else "end" if self.position == -1 else self.position
+        return f"Insert '{self.text}' at {where}"
+
+
+class StripRule(Rule):
+    """Remove ``count`` characters from the start of the stem (from the end
+    if negative), then any of ``chars`` from both ends."""
+
+    def __init__(self, chars="", count=0):
+        if not chars and not count:
+            raise ValueError("Nothing to strip")
+        self.chars = chars
+        self.count = count
+
+    def apply(self, names, indices, info):
+        chars, count = self.chars or None, self.count
+        result = []
+        for name in names:
+            stem, ext = split_ext(name)
+            if count > 0:
+                stem = stem[count:]
+            elif count < 0:
+                stem = stem[:count]
+            if chars:
+                stem = stem.strip(chars)
+            result.append(stem + ext)
+        return result
+
+    def describe(self):
+        parts = []
+        if self.count > 0:
+            parts.append(f"first {self.count} chars")
+        elif self.count < 0:
+            parts.append(f"last {-self.count} chars")
+        if self.chars:
+            parts.append(f"'{self.chars}' at both ends")
+        return "Strip " + " and ".join(parts)
+
+
+def _int(value, what, default=0):
+    value = str(value).strip()
+    if not value:
+        return default
+    if value == "end":
+        return -1
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{what} must be a whole number") from None
+
+
+def make_rule(kind, text="", arg="", ignore_case=False):
+    """Build a rule from the two free-text fields the GUI and CLI offer.
+
+    replace/regex: text=find, arg=replacement; template: text=template,
+    arg=first counter value; case: text=mode; insert: text, arg=position
+    ("end" or -1 for the end of the stem); strip: text=characters,
+    arg=count.  Raises ValueError with a readable message.
+    """
+    if kind == "replace":
+        return ReplaceRule(text, arg, ignore_case=ignore_case)
+    if kind == "regex":
+        return ReplaceRule(text, arg, regex=True, ignore_case=ignore_case)
+    if kind == "template":
+        return TemplateRule(text, _int(arg, "Counter start", 1))
+    if kind == "case":
+        return CaseRule(text.strip().lower())
+    if kind == "insert":
+        return InsertRule(text, _int(arg, "Position"))
+    if kind == "strip":
+        return StripRule(text, _int(arg, "Count"))
+    raise ValueError(f"Unknown rule type {kind!r}")
+
+
+def _diff(old, new, indices):
+    return [index for index, a, b in zip(indices, old, new) if a is not b and a != b]
+
+
+class RulePipeline:
+    """Rules applied in order to a fixed list of original names.
+
+    The output of every rule is kept, so changing rule i recomputes rule i
+    for all rows but the rules after it only for the rows whose input
+    changed.  The edit methods return those rows, i.e. the indices whose
+    final name is different now.
+    """
+
+    def __init__(self, names, info=None):
+        self.names = names
+        self.info = info or FileInfo(names=names)
+        self.rules = []
+        self.stages = []
+        self._all = range(len(names))
+
+    @property
+    def result(self):
+        return self.stages[-1] if self.stages else self.names
+
+    def _input(self, position):
+        return self.stages[position - 1] if position else self.names
+
+    def _propagate(self, position, changed):
+        """Push the changed rows of stage position-1 through the rest."""
+        for i in range(position, len(self.rules)):
+            if not changed:
+                break
+            if len(changed) == len(self.names):
+                # everything moved, skip the per-row gathering
+                old = self.stages[i]
+                self.stages[i] = self.rules[i].apply(self._input(i), self._all, self.info)
+                changed = _diff(old, self.stages[i], self._all)
+                continue
+            stage = self.stages[i]
+            previous = self._input(i)
+            new = self.rules[i].apply([previous[index] for index in changed], changed, self.info)
+            moved = []
+            for index, name in zip(changed, new):
+                if stage[index] != name:
+                    stage[index] = name
+                    moved.append(index)
+            changed = moved
+        return changed
+
+    def insert(self, position, rule):
+        source = self._input(position)
+        stage = rule.apply(source, self._all, self.info)
+        self.rules.insert(position, rule)
+        self.stages.insert(position, stage)
+        return self._propagate(position + 1, _diff(source, stage, self._all))
+
+    def append(self, rule):
+        return self.insert(len(self.rules), rule)
+
+    def replace(self, position, rule):
+        old = self.stages[position]
+        stage = rule.apply(self._input(position), self._all, self.info)
+        self.rules[position] = rule
+        self.stages[position] = stage
+        return self._propagate(position + 1, _diff(old, stage, self._all))
+
+    def remove(self, position):
+        old = self.stages.pop(position)
+        del self.rules[position]
+        return self._propagate(position, _diff(old, self._input(position), self._all))
+
+    def move(self, position, step):
+        """Swap rule position with its neighbour; order can change the result."""
+        other = position + step
+        rule = self.rules[position]
+        changed = set(self.remove(position))
+        changed.update(self.insert(other, rule))
+        return sorted(changed)
+
+
+def apply_rules(rules, names, info=None):
+    """New names for names after every rule, in one batch per rule."""
+    indices = range(len(names))
+    info = info or FileInfo(names=names)
+    for rule in rules:
+        names = rule.apply(names, indices, info)
+    return names
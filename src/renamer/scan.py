@@ -0,0 +1,209 @@
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Files per chunk handed from the scanner to its consumer
+SCAN_CHUNK = 2000
+
+# Concurrent directory reads of the recursive walk.  Each read mostly waits
+# on the disk or the network, so this is well above the CPU count.
+WALK_WORKERS = 32
+
+# Where subfolders of the input end up: same relative path, or all files
+# directly in the output folder
+LAYOUTS = ("mirror", "flatten")
+
+
+def _file_row(entry, name, details):
+    """(name, size), or with details (name, size, mtime, inode), of one entry.
+
+    The stat is the one DirEntry caches, so details cost no extra call on
+    POSIX.  Unreadable values are None, NaN and 0.
+    """
+    try:
+        st = entry.stat()
+    except OSError:
+        return (name, None, math.nan, 0) if details else (name, None)
+    if not details:
+        return name, st.st_size
+    try:
+        inode = entry.inode()
+    except OSError:
+        inode = 0
+    return name, st.st_size, st.st_mtime, inode
+
+
+def scan_files(path, cancel=None, chunk_size=SCAN_CHUNK, details=False):
+    """Yield lists of (name, size) for the regular files in path.
+
+    Built on os.scandir so the file type comes from the directory listing
+    and the size needs at most one stat (none on Windows).  size is None if
+    it can't be read.  With ``details`` the tuples also carry the mtime and
+    inode, for snapshots that are compared later (see diff_snapshot()).
+    Stops early once ``cancel`` (a threading.Event) is set.
+    """
+    chunk = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if cancel is not None and cancel.is_set():
+                return
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            chunk.append(_file_row(entry, entry.name, details))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _read_dir(root, rel, details=False):
+    """(files, subdirs) of one folder below root, paths relative to root."""
+    files = []
+    subdirs = []
+    with os.scandir(os.path.join(root, rel) if rel else root) as it:
+        for entry in it:
+            name = os.path.join(rel, entry.name) if rel else entry.name
+            try:
+                # symlinked folders are not followed, they could loop
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(name)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            files.append(_file_row(entry, name, details))
+    return files, subdirs
+
+
+def walk_files(path, cancel=None, chunk_size=SCAN_CHUNK, workers=WALK_WORKERS, details=False):
+    """Yield lists of (relative path, size) for every file below path.
+
+    Like scan_files(), but every folder found is read on a thread pool as
+    soon as its parent has been listed, so many directory reads are in
+    flight at once instead of one sequential walk.  Folders that can't be
+    read are skipped; only an unreadable ``path`` itself raises OSError.
+    Order is not defined.
+    """
+    chunk = []
+    files, subdirs = _read_dir(path, "", details)
+    chunk.extend(files)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="walk")
+    try:
+        pending = {executor.submit(_read_dir, path, rel, details) for rel in subdirs}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                return
+            for future in done:
+                try:
+                    files, subdirs = future.result()
+                except OSError:
+                    continue
+                chunk.extend(files)
+                pending.update(executor.submit(_read_dir, path, rel, details) for rel in subdirs)
+            while len(chunk) >= chunk_size:
+                yield chunk[:chunk_size]
+                del chunk[:chunk_size]
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    if chunk:
+        yield chunk
+
+
+def list_files(path, recursive=False):
+    """All (name, size) pairs of path, sorted by name.  With recursive the
+    names are paths relative to path."""
+    files = []
+    for chunk in (walk_files if recursive else scan_files)(path):
+        files.extend(chunk)
+    files.sort()
+    return files
+
+
+class SnapshotDiff:
+    """What changed between a stored listing and a fresh one.
+
+    ``changed`` holds (row, size, mtime, inode) for files still there whose
+    size, mtime or inode differ, ``removed`` the rows that are gone and
+    ``added`` the new (name, size, mtime, inode) entries.  ``moved`` pairs a
+    gone row with the new entry carrying the same inode and size: the file
+    was renamed on disk.
+    """
+
+    def __init__(self):
+        self.changed = []
+        self.removed = []
+        self.added = []
+        self.moved = []
+
+    def __bool__(self):
+        return bool(self.changed or self.removed or self.added or self.moved)
+
+    def summary(self):
+        parts = [
+            f"{len(items)} {label}"
+            for items, label in ((self.added, "new"), (self.removed, "gone"),
+                                 (self.moved, "renamed"), (self.changed, "changed"))
+            if items
+        ]
+        return ", ".join(parts) or "no changes"
+
+
+def diff_snapshot(names, sizes, mtimes, inodes, fresh):
+    """Compare rows (parallel sequences, size -1 and mtime NaN for unknown)
+    with fresh (name, size, mtime, inode) tuples from a details scan.
+
+    One dict lookup per fresh entry, so the cost is linear in the size of
+    the folder and nothing depends on how many files changed.
+    """
+    diff = SnapshotDiff()
+    rows = {name: row for row, name in enumerate(names)}
+    seen = bytearray(len(names))
+    for entry in fresh:
+        name, size, mtime, inode = entry
+        row = rows.get(name)
+        if row is None:
+            diff.added.append(entry)
+            continue
+        seen[row] = 1
+        size = -1 if size is None else size
+        old_mtime = mtimes[row]
+        same_mtime = old_mtime == mtime or (math.isnan(old_mtime) and math.isnan(mtime))
+        if sizes[row] != size or not same_mtime or inodes[row] != inode:
+            diff.changed.append((row, size, mtime, inode))
+    diff.removed = [row for row, flag in enumerate(seen) if not flag]
+
+    if diff.removed and diff.added:
+        gone = {(inodes[row], sizes[row]): row for row in diff.removed if inodes[row]}
+        added = []
+        for entry in diff.added:
+            size = -1 if entry[1] is None else entry[1]
+            row = gone.pop((entry[3], size), None) if entry[3] else None
+            if row is None:
+                added.append(entry)
+            else:
+                diff.moved.append((row, entry))
+        if diff.moved:
+            moved = {row for row, _ in diff.moved}
+            diff.removed = [row for row in diff.removed if row not in moved]
+            diff.added = added
+    return diff
+
+
+def output_name(original, new, layout="mirror"):
+    """Path of a renamed file relative to the output folder.
+
+    With "mirror" a bare new name stays in the subfolder the original came
+    from; a new name that already has a folder part is used as given.
+    """
+    if layout == "mirror" and os.path.basename(new) == new:
+        folder = os.path.dirname(original)
+        if folder:
+            return os.path.join(folder, new)
+    return new
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+
+from .paths import scan_cache_dir
+
+MAGIC = b"RNSCAN"
+CACHE_VERSION = 1
+
+# header length after the magic, then the JSON header
+_LENGTH = struct.Struct("<I")
+
+
+class CachedScan:
+    """The rows of a folder's last scan, as parallel columns.
+
+    ``fresh`` is true when the folder's own mtime is the one the cache was
+    written with, so no file was added, removed or renamed in it since;
+    changes deeper in a subfolder or to a file's content don't show in it,
+    which is why a cached listing is always reconciled with the folder.
+    """
+
+    __slots__ = ("originals", "sizes", "mtimes", "inodes", "fresh")
+
+    def __init__(self, originals, sizes, mtimes, inodes, fresh):
+        self.originals = originals
+        self.sizes = sizes
+        self.mtimes = mtimes
+        self.inodes = inodes
+        self.fresh = fresh
+
+    def __len__(self):
+        return len(self.originals)
+
+
+def cache_path(folder, recursive):
+    """Cache file of a folder listing, one per folder and subfolder setting."""
+    key = f"{os.path.abspath(folder)}\0{int(bool(recursive))}"
+    name = hashlib.sha1(key.encode("utf-8", "surrogatepass")).hexdigest()
+    return os.path.join(scan_cache_dir(), f"{name}.scan")
+
+
+def save_scan(folder, recursive, originals, sizes, mtimes, inodes):
+    """Write a listing as one header and four columns, atomically.
+
+    The numbers are the arrays' raw bytes and the names one NUL-separated
+    UTF-8 block, so a million rows load with a few reads and no per-row
+    parsing.  Raises OSError.
+    """
+    st = os.stat(folder)
+    names = "\0".join(originals).encode("utf-8", "surrogatepass")
+    header = json.dumps({
+        "version": CACHE_VERSION,
+        "folder": os.path.abspath(folder),
+        "recursive": bool(recursive),
+        "dev": st.st_dev,
+        "ino": st.st_ino,
+        "mtime_ns": st.st_mtime_ns,
+        "count": len(originals),
+        "names": len(names),
+        "byteorder": sys.byteorder,
+    }).encode("utf-8", "surrogatepass")
+
+    path = cache_path(folder, recursive)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(_LENGTH.pack(len(header)))
+            f.write(header)
+            for column in (sizes, mtimes, inodes):
+                column.tofile(f)
+            f.write(names)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def load_scan(folder, recursive):
+    """The cached listing of a folder, or None.
+
+    A missing, damaged or foreign cache is None, and so is one written for
+    another folder at the same path (its device or inode differ).  Never
+    raises for a bad cache file; OSError only when the folder itself can't
+    be read.
+    """
+    st = os.stat(folder)
+    try:
+        with open(cache_path(folder, recursive), "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+            header = json.loads(f.read(length).decode("utf-8", "surrogatepass"))
+            if (header.get("version") != CACHE_VERSION
+                    or header.get("folder") != os.path.abspath(folder)
+                    or header.get("recursive") != bool(recursive)
+                    or header.get("dev") != st.st_dev
+                    or header.get("ino") != st.st_ino):
+                return None
+            count = header["count"]
+            columns = [array("q"), array("d"), array("Q")]
+            for column in columns:
+                column.fromfile(f, count)
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+            names = f.read(header["names"])
+            if len(names) != header["names"]:
+                return None
+            originals = names.decode("utf-8", "surrogatepass").split("\0") if count else []
+    except (OSError, EOFError, ValueError, KeyError, TypeError, AttributeError, struct.error):
+        # missing or unreadable cache: the folder is simply scanned
+        return None
+    if len(originals) != count:
+        return None
+    sizes, mtimes, inodes = columns
+    return CachedScan(originals, sizes, mtimes, inodes, header["mtime_ns"] == st.st_mtime_ns)
@@ -0,0 +1,146 @@
+import os
+import queue
+import struct
+import sys
+from collections import deque
+from concurrent.futures import Future
+
+# "plan" transfers rows in plan order, "inode" by source inode number,
+# "extent" by the physical offset of each source's first extent where the
+# filesystem tells (Linux FIEMAP), else by inode
+SCHEDULE_MODES = ("plan", "inode", "extent")
+
+# Files up to this size are copied in batches, one pool task per batch
+SMALL_FILE = 256 * 1024
+
+# A batch holds at most this many files and bytes
+BATCH_FILES = 32
+BATCH_BYTES = 4 * 1024 * 1024
+
+# Files from this size on stream on their own workers, so a few big copies
+# neither block the small ones nor seek against each other
+LARGE_FILE = 64 * 1024 * 1024
+STREAM_WORKERS = 2
+
+# Rows statted per pool task while working out the layout
+LAYOUT_CHUNK = 1024
+
+# Linux FS_IOC_FIEMAP and the sizes of struct fiemap and one fiemap_extent
+FIEMAP = 0xC020660B
+_FIEMAP_HEADER = struct.Struct("=QQIIII")
+_FIEMAP_EXTENT = struct.Struct("=QQQQQIIII")
+
+
+def physical_offset(path):
+    """Byte offset of the first extent of path on its device, or None.
+
+    None on other platforms, for empty or inline files and on filesystems
+    without FIEMAP (tmpfs, network mounts, ...).
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    import fcntl
+    request = bytearray(_FIEMAP_HEADER.size + _FIEMAP_EXTENT.size)
+    # fm_start 0, fm_length everything, no flags, room for one extent
+    _FIEMAP_HEADER.pack_into(request, 0, 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.ioctl(fd, FIEMAP, request)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    if not _FIEMAP_HEADER.unpack_from(request)[3]:
+        return None
+    return _FIEMAP_EXTENT.unpack_from(request, _FIEMAP_HEADER.size)[1]
+
+
+def disk_layout(rows, mode="inode", executor=None):
+    """key -> (size, device, position) of the (key, path) rows that exist.
+
+    The position is the physical offset for "extent" where there is one,
+    else the inode number, which most filesystems hand out roughly in
+    allocation order.  Rows are statted in chunks on ``executor``; a row
+    that can't be statted is left out and fails later in its transfer.
+    """
+    def measure(chunk):
+        found = []
+        for key, path in chunk:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            position = physical_offset(path) if mode == "extent" and st.st_size else None
+            found.append((key, (st.st_size, st.st_dev, st.st_ino if position is None else position)))
+        return found
+
+    chunks = [rows[i:i + LAYOUT_CHUNK] for i in range(0, len(rows), LAYOUT_CHUNK)]
+    layout = {}
+    for found in (executor.map(measure, chunks) if executor is not None else map(measure, chunks)):
+        layout.update(found)
+    return layout
+
+
+def disk_order(plan, layout):
+    """plan with the rows in ``layout`` sorted by device and position.
+
+    Rows without a layout (nothing to transfer, or not found) come first in
+    plan order; they are reported at once and never touch the disk.
+    """
+    rest = [row for row in plan if row[0] not in layout]
+    placed = [row for row in plan if row[0] in layout]
+    placed.sort(key=lambda row: layout[row[0]][1:])
+    return rest + placed
+
+
+class ResultQueue:
+    """The rows of a job between submission and report().
+
+    Entries are (key, original, new, result) with a final result tuple or
+    a Future.  ``ordered`` hands them back strictly in the order they were
+    added; otherwise each comes back as soon as its result is there, so a
+    long transfer doesn't hold up the rows behind it.
+    """
+
+    def __init__(self, ordered=True):
+        self.ordered = ordered
+        self._entries = deque()
+        self._ready = queue.SimpleQueue()
+        self._waiting = 0
+
+    def __len__(self):
+        return len(self._entries) if self.ordered else self._waiting
+
+    def add(self, entry):
+        if self.ordered:
+            self._entries.append(entry)
+            return
+        self._waiting += 1
+        result = entry[3]
+        if isinstance(result, Future):
+            result.add_done_callback(lambda _: self._ready.put(entry))
+        else:
+            self._ready.put(entry)
+
+    def take(self, block_until):
+        """Yield entries whose result is there, waiting for more while over
+        ``block_until`` are outstanding."""
+        if self.ordered:
+            entries = self._entries
+            while entries:
+                result = entries[0][3]
+                if isinstance(result, Future) and len(entries) <= block_until and not result.done():
+                    return
+                # past block_until the caller waits on the head's result
+                yield entries.popleft()
+            return
+        while self._waiting:
+            try:
+                entry = self._ready.get(block=self._waiting > block_until)
+            except queue.Empty:
+                return
+            self._waiting -= 1
+            yield entry
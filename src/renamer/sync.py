@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .paths import user_state_dir
+from .transfer import COPY_CHUNK, DEFAULT_WORKERS
+
+# "quick" compares size and mtime, "hash" also compares file contents
+SYNC_MODES = ("off", "quick", "hash")
+
+# Some filesystems (FAT, SMB) store mtimes with 2 second granularity
+MTIME_SLACK_NS = 2_000_000_000
+
+
+def signature(st):
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _content_digest(path, chunk_size=COPY_CHUNK):
+    # blake2b, not verify.hash_file: the digests are kept in the sync
+    # index, and a collision here would leave a changed file uncopied
+    digest = hashlib.blake2b(digest_size=20)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb") as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def stat_names(path):
+    """{name: signature} for the regular files in path, one scandir pass."""
+    stats = {}
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        stats[entry.name] = signature(entry.stat())
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return stats
+
+
+class SyncIndex:
+    """What earlier runs wrote into one output folder.
+
+    Maps each destination name to ``[src_size, src_mtime_ns, dst_size,
+    dst_mtime_ns, digest]`` so a later run can tell an unchanged file from
+    the two signatures alone.  Stored as JSON in the per-user state folder.
+    """
+
+    def __init__(self, output_dir, folder=None):
+        folder = folder or os.path.join(user_state_dir(), "sync")
+        os.makedirs(folder, exist_ok=True)
+        key = hashlib.sha1(os.path.abspath(output_dir).encode("utf-8", "surrogatepass")).hexdigest()
+        self.path = os.path.join(folder, key + ".json")
+        self.entries = {}
+        self.changed = False
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        return self
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self.changed = False
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def put(self, name, src_sig, dst_sig, digest=None):
+        entry = src_sig + dst_sig + [digest]
+        if self.entries.get(name) != entry:
+            self.entries[name] = entry
+            self.changed = True
+
+
+def _same_signature(src_sig, dst_sig):
+    return src_sig[0] == dst_sig[0] and abs(src_sig[1] - dst_sig[1]) <= MTIME_SLACK_NS
+
+
+def find_up_to_date(rows, input_dir, output_dir, index, mode="quick", workers=DEFAULT_WORKERS):
+    """Keys of the (key, original, new) rows whose destination is current.
+
+    A row is current if the index has the same source and destination
+    signatures as now, or, without an index entry, if source and
+    destination have the same size and mtime.  In "hash" mode the contents
+    are compared as well.  Checks run on a thread pool.
+    """
+    if not rows:
+        return set()
+    dst_stats = {}
+
+    def compare(row):
+        key, orig, new = row
+        dst_sig = dst_stats.get(new)
+        if dst_sig is None:
+            return None
+        src = os.path.join(input_dir, orig)
+        try:
+            src_sig = signature(os.stat(src))
+        except OSError:
+            return None
+
+        entry = index.get(new)
+        if entry is not None and entry[:2] == src_sig and entry[2:4] == dst_sig:
+            digest = entry[4]
+        elif entry is None and _same_signature(src_sig, dst_sig):
+            digest = None
+        else:
+            return None
+
+        if mode == "hash":
+            src_digest = _content_digest(src)
+            if digest is None:
+                digest = _content_digest(os.path.join(output_dir, new))
+            if src_digest != digest:
+                return None
+        return key, new, src_sig, dst_sig, digest
+
+    current = set()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sync") as executor:
+        # one scandir per output folder the rows land in
+        folders = list({os.path.dirname(new) for _, _, new in rows})
+        for folder, stats in zip(folders, executor.map(
+                lambda folder: stat_names(os.path.join(output_dir, folder)), folders)):
+            for name, sig in stats.items():
+                dst_stats[os.path.join(folder, name)] = sig
+
+        for match in executor.map(compare, rows):
+            if match is None:
+                continue
+            key, new, src_sig, dst_sig, digest = match
+            index.put(new, src_sig, dst_sig, digest)
+            current.add(key)
+    return current
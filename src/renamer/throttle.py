@@ -0,0 +1,110 @@
+import threading
+import time
+
+# A bucket holds at most this many seconds' worth of tokens, so an idle
+# moment allows a short burst but never a long one
+BURST_SECONDS = 1.0
+
+# Longest single sleep, so stop() and new limits are noticed quickly
+MAX_SLEEP = 0.1
+
+# Smallest copy chunk while bytes are limited
+MIN_THROTTLED_CHUNK = 64 * 1024
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` tokens per second, 0 = unlimited.
+
+    take(n) always reserves its tokens at once and then waits until the
+    bucket is out of debt, so concurrent callers share the rate fairly and
+    a request larger than the bucket still goes through.
+    """
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self.tokens = 0.0
+        self.stamp = time.monotonic()
+        self.set_rate(rate)
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.rate * BURST_SECONDS, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def set_rate(self, rate):
+        rate = max(0.0, float(rate or 0))
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if not self.rate and rate:
+                # a fresh limit starts with a full bucket
+                self.tokens = rate * BURST_SECONDS
+            self.rate = rate
+            if not rate:
+                self.tokens = 0.0
+
+    def take(self, n=1, stop=None):
+        """Take n tokens, sleeping while the bucket is in debt.
+
+        Returns the seconds spent waiting.  Gives up early when ``stop()``
+        turns true or the rate is set to unlimited.
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= n
+        waited = 0.0
+        while True:
+            with self._lock:
+                if not self.rate:
+                    return waited
+                self._refill(time.monotonic())
+                debt = -self.tokens / self.rate
+            if debt <= 0 or (stop is not None and stop()):
+                return waited
+            pause = min(debt, MAX_SLEEP)
+            time.sleep(pause)
+            waited += pause
+
+
+class RateLimiter:
+    """Byte and file rate limits for a transfer, adjustable while it runs.
+
+    0 means unlimited; with both limits at 0 nothing ever waits.
+    """
+
+    def __init__(self, mb_per_s=0, files_per_s=0):
+        self.bytes = TokenBucket()
+        self.files = TokenBucket()
+        self.set_limits(mb_per_s, files_per_s)
+
+    def set_limits(self, mb_per_s=None, files_per_s=None):
+        """Change either limit; None leaves it as it is."""
+        if mb_per_s is not None:
+            self.bytes.set_rate(mb_per_s * 2**20)
+        if files_per_s is not None:
+            self.files.set_rate(files_per_s)
+
+    @property
+    def limits(self):
+        return self.bytes.rate / 2**20, self.files.rate
+
+    @property
+    def unlimited(self):
+        return not self.bytes.rate and not self.files.rate
+
+    def wait_file(self, stop=None):
+        return self.files.take(1, stop)
+
+    def wait_bytes(self, n, stop=None):
+        return self.bytes.take(n, stop)
+
+    def chunk_size(self, chunk_size):
+        """Copy chunk to use now: smaller while bytes are limited, so the
+        pacing stays smooth instead of one long pause per chunk."""
+        rate = self.bytes.rate
+        if not rate:
+            return chunk_size
+        return max(MIN_THROTTLED_CHUNK, min(chunk_size, int(rate * MAX_SLEEP)))
@@ -0,0 +1,271 @@
+import errno
+import mmap
+import os
+import shutil
+import sys
+
+TRANSFER_MODES = ("auto", "copy", "move", "hardlink", "reflink")
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Bytes per copy_file_range/sendfile/write call
+COPY_CHUNK = 8 * 1024 * 1024
+
+# Errors meaning "this kernel copy call can't be used here", not "copy failed"
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), errno.EBADF}
+
+# Linux FICLONE ioctl (btrfs, xfs, bcachefs, ...)
+FICLONE = 0x40049409
+
+# Errors of FICLONE meaning "this filesystem can't clone", not "clone failed"
+_NO_CLONE_ERRNOS = {errno.EOPNOTSUPP, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), errno.EINVAL,
+                    errno.ENOTTY, errno.ENOSYS, errno.EXDEV}
+
+# Errors of os.link meaning "can't link here" (other device, fs without
+# hard links, link count at its limit), so the file is copied instead
+_NO_LINK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK}
+
+# Devices FICLONE turned out not to work on, so later files skip the attempt
+_no_clone_devices = set()
+
+
+def same_device(path_a, path_b):
+    try:
+        return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+    except OSError:
+        return False
+
+
+def reflink_file(src, dst):
+    """Copy-on-write clone of src to dst, raises OSError if not supported.
+
+    The clone is made beside dst and swapped in, so an existing dst is only
+    replaced once the clone worked.  dst being src itself, or a hard link
+    of it, raises shutil.SameFileError like copy_file().
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflink not supported on this platform")
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    import fcntl
+    with open(src, "rb") as fsrc:
+        device = os.fstat(fsrc.fileno()).st_dev
+        if device in _no_clone_devices:
+            raise OSError(errno.EOPNOTSUPP, "Reflink not supported on this filesystem", dst)
+        tmp = f"{dst}.~clone{os.getpid()}"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            try:
+                fcntl.ioctl(fd, FICLONE, fsrc.fileno())
+            finally:
+                os.close(fd)
+            shutil.copystat(src, tmp)
+            os.replace(tmp, dst)
+        except OSError as e:
+            if e.errno in _NO_CLONE_ERRNOS:
+                _no_clone_devices.add(device)
+            os.unlink(tmp)
+            raise
+
+
+def _link_replace(src, dst):
+    # os.link refuses to overwrite, so link beside dst and swap it in
+    tmp = f"{dst}.~link{os.getpid()}"
+    os.link(src, tmp)
+    try:
+        os.replace(tmp, dst)
+    except OSError:
+        os.unlink(tmp)
+        raise
+
+
+def _kernel_copy(fsrc, fdst, chunk_size, on_bytes):
+    """Copy with copy_file_range or sendfile; False if neither can be used."""
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+    calls = []
+    if hasattr(os, "copy_file_range"):
+        calls.append(lambda offset: os.copy_file_range(infd, outfd, chunk_size))
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        calls.append(lambda offset: os.sendfile(outfd, infd, offset, chunk_size))
+
+    for copy in calls:
+        offset = 0
+        while True:
+            try:
+                sent = copy(offset)
+            except OSError as e:
+                if offset == 0 and e.errno in _FALLBACK_ERRNOS:
+                    break
+                raise
+            if sent == 0:
+                return True
+            offset += sent
+            if on_bytes is not None:
+                on_bytes(sent)
+    return False
+
+
+def _buffered_copy(fsrc, fdst, size, chunk_size, on_bytes, digest=None):
+    """Copy through a memory map of the source, or a reused buffer.
+
+    Every chunk also goes to ``digest.update`` if given, so the data is
+    hashed on the same read that copies it.
+    """
+    if size > 0:
+        try:
+            with mmap.mmap(fsrc.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), chunk_size):
+                        with view[offset:offset + chunk_size] as chunk:
+                            if digest is not None:
+                                digest.update(chunk)
+                            written = fdst.write(chunk)
+                        if on_bytes is not None:
+                            on_bytes(written)
+                finally:
+                    view.release()
+            return
+        except (OSError, ValueError):
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            if digest is not None:
+                digest.reset()
+
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while True:
+        n = fsrc.readinto(buf)
+        if not n:
+            break
+        if digest is not None:
+            digest.update(view[:n])
+        fdst.write(view[:n])
+        if on_bytes is not None:
+            on_bytes(n)
+
+
+def copy_file(src, dst, chunk_size=COPY_CHUNK, on_bytes=None, throttle=None, digest=None):
+    """Drop-in for shutil.copy2 between two file paths.
+
+    Data goes through copy_file_range (in-kernel, may use server-side copy
+    on NFS/SMB) or sendfile where available, otherwise through a memory map
+    of the source, ``chunk_size`` bytes per call.  ``on_bytes(n)`` is called
+    as data is written, then ``throttle(n)``, which may sleep to hold a byte
+    rate.  With a ``digest`` (see verify.StreamHash) the data has to pass
+    through this process, so the memory map is always used and every chunk
+    is hashed as it is copied.  Metadata is copied with shutil.copystat
+    like copy2.
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+
+    if throttle is not None:
+        report = on_bytes
+
+        def on_bytes(n):
+            if report is not None:
+                report(n)
+            throttle(n)
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if digest is not None or not _kernel_copy(fsrc, fdst, chunk_size, on_bytes):
+            _buffered_copy(fsrc, fdst, size, chunk_size, on_bytes, digest)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def make_dirs(root, folders, executor=None):
+    """Create root/folder for every relative folder, before any transfer.
+
+    Only the deepest folders go to os.makedirs (it creates the parents), and
+    with an executor they are created concurrently.  Failures are ignored;
+    the transfer into that folder then reports the real error.
+    """
+    parents = set()
+    for folder in folders:
+        parent = os.path.dirname(folder)
+        while parent and parent not in parents:
+            parents.add(parent)
+            parent = os.path.dirname(parent)
+    leaves = [os.path.join(root, folder) for folder in folders if folder and folder not in parents]
+
+    def make(path):
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError:
+            pass
+
+    if executor is None:
+        for path in leaves:
+            make(path)
+    else:
+        for _ in executor.map(make, leaves):
+            pass
+
+
+def transfer_file(src, dst, mode="copy", same_dev=None, chunk_size=COPY_CHUNK, on_bytes=None,
+                  throttle=None, digest=None, verify=None):
+    """Put src at dst using the given transfer mode.
+
+    Returns the method actually used: "copy", "move", "hardlink" or "reflink".
+    "reflink" and "auto" fall back to a plain copy when cloning is not
+    possible (different filesystem, unsupported fs, ...), "hardlink" when
+    linking isn't.  "auto" never
+    hard-links: a linked output would be the input itself, and editing one
+    would edit the other.  For methods that don't copy data, ``on_bytes``
+    gets the file size at once; ``throttle`` and ``digest`` only see bytes
+    that are really copied.  ``verify(dst)`` is called once the data is in
+    place; a move between devices deletes src only after it returned.
+    """
+    if same_dev is None:
+        same_dev = same_device(os.path.dirname(src) or ".", os.path.dirname(dst) or ".")
+
+    def copy(s, d):
+        return copy_file(s, d, chunk_size, on_bytes, throttle, digest)
+
+    def copy_verified(s, d):
+        copy(s, d)
+        if verify is not None:
+            verify(d)
+
+    def done(method):
+        if on_bytes is not None:
+            try:
+                on_bytes(os.path.getsize(dst))
+            except OSError:
+                pass
+        if verify is not None:
+            verify(dst)
+        return method
+
+    if mode == "move":
+        if same_dev:
+            os.replace(src, dst)
+            return done("move")
+        copy_verified(src, dst)
+        os.unlink(src)
+        return "move"
+
+    if mode == "hardlink":
+        try:
+            _link_replace(src, dst)
+            return done("hardlink")
+        except OSError as e:
+            if e.errno not in _NO_LINK_ERRNOS:
+                raise
+
+    if mode in ("reflink", "auto") and same_dev:
+        try:
+            reflink_file(src, dst)
+            return done("reflink")
+        except shutil.SameFileError:
+            raise
+        except OSError:
+            pass
+
+    copy_verified(src, dst)
+    return "copy"
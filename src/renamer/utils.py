@@ -0,0 +1,48 @@
+import os
+
+RESERVED_NAMES = frozenset([
+    'CON', 'PRN', 'AUX', 'NUL',
+    'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9',
+    'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9'
+])
+
+INVALID_CHARS = '<>:"/\\|?*'
+
+
+def validate_filename(name):
+    """Return (is_valid, error_message) for a Windows-safe file name."""
+    for char in INVALID_CHARS:
+        if char in name:
+            return False, f"Invalid character: '{char}'"
+
+    if name.upper().split('.')[0] in RESERVED_NAMES:
+        return False, "Reserved Windows filename"
+
+    if len(name) > 255:
+        return False, "Filename too long (max 255 chars)"
+
+    return True, ""
+
+
+def validate_path(path):
+    """validate_filename() for a path relative to the output folder; every
+    folder part must be a valid name as well and may not climb out of it."""
+    if os.path.isabs(path):
+        return False, "Absolute path"
+    if os.altsep:
+        path = path.replace(os.altsep, os.sep)
+    for part in path.split(os.sep):
+        if part in ("", ".", ".."):
+            return False, "Invalid folder in path"
+        is_valid, error_msg = validate_filename(part)
+        if not is_valid:
+            return False, error_msg
+    return True, ""
+
+
+def human_readable_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
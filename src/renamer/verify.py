@@ -0,0 +1,118 @@
+import errno
+import hashlib
+import os
+import zlib
+
+from .transfer import COPY_CHUNK
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# "fast" is xxh3-128 when the xxhash package is installed, else CRC-32,
+# the fastest checksum in the standard library
+VERIFY_MODES = ("off", "fast", "sha256")
+
+
+class Crc32:
+    """zlib.crc32 behind the hashlib interface."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+
+def algorithm(mode):
+    """(name, constructor, manifest extension) of the hash behind a mode."""
+    if mode == "sha256":
+        return "sha256", hashlib.sha256, "sha256"
+    if xxhash is not None:
+        return "xxh3_128", xxhash.xxh3_128, "xxh128"
+    return "crc32", Crc32, "crc32"
+
+
+class StreamHash:
+    """Hash of the bytes a copy streams through, fed by copy_file().
+
+    ``size`` counts what was hashed, so a transfer that copied no data
+    (rename, link, clone) is told apart from one that did.
+    """
+
+    __slots__ = ("name", "_new", "hash", "size")
+
+    def __init__(self, mode):
+        self.name, self._new, _ = algorithm(mode)
+        self.hash = self._new()
+        self.size = 0
+
+    def update(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+
+    def reset(self):
+        self.hash = self._new()
+        self.size = 0
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+
+def hash_file(path, mode, chunk_size=COPY_CHUNK):
+    digest = StreamHash(mode)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, "rb") as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def check_copy(dst, digest, mode, readback=True, chunk_size=COPY_CHUNK):
+    """Digest of dst after a transfer that fed ``digest``.
+
+    When data was streamed, dst is read back once and must hash the same,
+    or raises OSError (EIO); without ``readback`` the streamed digest is
+    trusted.  When nothing was streamed dst is hashed once.
+    """
+    if digest.size == 0:
+        return hash_file(dst, mode, chunk_size)
+    expected = digest.hexdigest()
+    if readback and hash_file(dst, mode, chunk_size) != expected:
+        raise OSError(errno.EIO, "Checksum mismatch after copy", dst)
+    return expected
+
+
+class Manifest:
+    """Checksum file in the "<hex>  <path>" format of sha256sum and xxhsum
+    -H2, so ``sha256sum -c`` and friends can check the output folder later.
+
+    Lines are appended as rows finish; paths are relative to the folder
+    the manifest is in and always use "/".
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self._file = open(path, "a" if append else "w", encoding="utf-8", newline="\n")
+
+    @classmethod
+    def for_job(cls, output_dir, mode, job_id=None, append=False):
+        _, _, ext = algorithm(mode)
+        name = f"checksums-{job_id}.{ext}" if job_id else f"checksums.{ext}"
+        return cls(os.path.join(output_dir, name), append)
+
+    def add(self, name, hexdigest):
+        self._file.write(f"{hexdigest}  {name.replace(os.sep, '/')}\n")
+
+    def close(self):
+        self._file.close()
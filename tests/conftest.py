@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """Journals, metrics and caches of a test stay in its own folder."""
+    state = tmp_path / "state"
+    for name in ("XDG_STATE_HOME", "XDG_CACHE_HOME", "LOCALAPPDATA"):
+        monkeypatch.setenv(name, str(state))
+    if sys.platform == "darwin":
+        monkeypatch.setenv("HOME", str(state))
+    return state
+
+
+def write_files(folder, files):
+    """Create {name: text} under folder and return its path as a str."""
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, text in files.items():
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return str(folder)
+
+
+def read_files(folder):
+    """{name: text} of the regular files directly in folder."""
+    return {
+        entry.name: entry.read_text()
+        for entry in sorted(folder.iterdir())
+        if entry.is_file()
+    }
@@ -0,0 +1,67 @@
+from conftest import read_files, write_files
+
+from renamer import (
+    DEFERRED, DONE, SKIPPED, Journal, RenameEngine, find_unfinished, read_summary, undo_job,
+)
+from renamer.cli import main
+
+PLAN = [(0, "a.txt", "a.txt"), (1, "b.txt", "b.txt"), (2, "c.txt", "c.txt")]
+
+
+def start(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "new a", "b.txt": "new b", "c.txt": "new c"})
+    out = write_files(tmp_path / "out", {"a.txt": "old a", "b.txt": "old b"})
+    results = {}
+    journal = Journal.create(src, out, "copy", "defer")
+    engine = RenameEngine(src, out, mode="copy", conflict="defer")
+    engine.run(PLAN, lambda key, orig, tag, message: results.__setitem__(key, tag), journal=journal)
+    return engine, journal, results
+
+
+def test_conflicts_wait_while_the_rest_runs(tmp_path):
+    engine, journal, results = start(tmp_path)
+    assert results == {0: DEFERRED, 1: DEFERRED, 2: DONE}
+    assert [key for key, _, _ in engine.deferred] == [0, 1]
+    assert read_files(tmp_path / "out") == {"a.txt": "old a", "b.txt": "old b", "c.txt": "new c"}
+    # not finished while rows wait for a decision
+    assert find_unfinished().path == journal.path
+
+
+def test_resolve_overwrites_chosen_rows_and_skips_the_rest(tmp_path):
+    engine, journal, results = start(tmp_path)
+    counts = engine.resolve({0}, lambda key, orig, tag, message: results.__setitem__(key, tag), journal)
+
+    assert results == {0: DONE, 1: SKIPPED, 2: DONE}
+    assert (counts[DONE], counts[SKIPPED], counts[DEFERRED]) == (2, 1, 0)
+    assert read_files(tmp_path / "out") == {"a.txt": "new a", "b.txt": "old b", "c.txt": "new c"}
+    assert read_summary(journal.path).closed
+    assert find_unfinished() is None
+
+    undo_job(Journal.load(journal.path))
+    assert read_files(tmp_path / "out") == {"a.txt": "old a", "b.txt": "old b"}
+
+
+def test_resumed_job_offers_deferred_rows_again(tmp_path):
+    start(tmp_path)
+    journal = find_unfinished()
+    engine = RenameEngine.from_journal(journal)
+    results = {}
+    engine.run(journal.plan, lambda key, orig, tag, message: results.__setitem__(key, tag),
+               journal=journal)
+    assert results == {0: DEFERRED, 1: DEFERRED, 2: DONE}
+    engine.resolve({1}, journal=journal)
+    assert read_files(tmp_path / "out") == {"a.txt": "old a", "b.txt": "new b", "c.txt": "new c"}
+
+
+def test_cli_resume_keeps_deferred_rows_without_a_policy(tmp_path, capsys):
+    start(tmp_path)
+    assert main(["--resume", "--quiet"]) == 1
+    assert read_files(tmp_path / "out") == {"a.txt": "old a", "b.txt": "old b", "c.txt": "new c"}
+    assert find_unfinished() is not None
+
+
+def test_cli_resume_resolves_deferred_rows_with_a_policy(tmp_path, capsys):
+    start(tmp_path)
+    assert main(["--resume", "--quiet", "--on-conflict", "overwrite"]) == 0
+    assert read_files(tmp_path / "out") == {"a.txt": "new a", "b.txt": "new b", "c.txt": "new c"}
+    assert find_unfinished() is None
@@ -0,0 +1,91 @@
+import math
+import os
+from array import array
+
+import pytest
+
+from renamer import SnapshotDiff
+
+from app import FAILED, PENDING, READY, FileModel, RowFilter
+
+
+def model(*rows):
+    files = FileModel()
+    files.extend([(name, 5, 1.0, inode) for name, inode in rows])
+    return files
+
+
+def moved(files, row, name):
+    diff = SnapshotDiff()
+    diff.moved = [(row, (name, 5, 1.0, files.inodes[row]))]
+    return diff
+
+
+def test_unedited_row_follows_rename_on_disk():
+    files = model(("a.txt", 11), ("b.txt", 12))
+    files.apply_diff(moved(files, 0, "c.txt"))
+    assert files.originals == ["b.txt", "c.txt"]
+    assert files.news == ["b.txt", "c.txt"]
+    assert files.codes[1] == PENDING
+
+
+def test_edited_row_keeps_its_new_name():
+    files = model(("a.txt", 11), ("b.txt", 12))
+    files.set(0, new="edited.txt", code=READY)
+    files.apply_diff(moved(files, 0, "c.txt"))
+    assert files.originals == ["b.txt", "c.txt"]
+    assert files.news == ["b.txt", "edited.txt"]
+    assert files.codes[1] == READY
+
+
+def test_extend_defaults_new_names_to_the_file_names():
+    files = FileModel()
+    files.extend([(os.path.join("sub", "b.txt"), None, math.nan, 0), ("a.txt", 2048, 1.0, 7)])
+    assert files.news == ["b.txt", "a.txt"]
+    assert files.size(0) is None and files.size(1) == 2048
+    assert files.status(0) == "Pending"
+    assert files.status(1) == "Pending (2.0 KB)"
+    assert files.rows_version == files.names_version == 1
+
+
+def test_sort_keeps_names_statuses_and_messages_together():
+    files = model(("c.txt", 3), ("a.txt", 1), ("b.txt", 2))
+    files.set(0, new="new c", code=FAILED, message="disk full")
+    files.set(2, new="new b", code=READY)
+    files.sort()
+    assert files.originals == ["a.txt", "b.txt", "c.txt"]
+    assert files.news == ["a.txt", "new b", "new c"]
+    assert list(files.inodes) == [1, 2, 3]
+    assert files.state(2) == ("new c", FAILED, "disk full")
+    assert files.messages == {2: "disk full"}
+
+
+def test_set_names_clears_old_messages():
+    files = model(("a.txt", 1), ("b.txt", 2))
+    files.set(1, code=FAILED, message="oops")
+    before = files.names_version
+    files.set_names({0: "x.txt", 1: "y.txt"}, READY)
+    assert files.news == ["x.txt", "y.txt"]
+    assert bytes(files.codes) == bytes([READY, READY])
+    assert files.messages == {}
+    assert files.names_version == before + 1
+
+
+def test_from_columns_takes_the_columns_over():
+    sizes, mtimes, inodes = array("q", [1, 2]), array("d", [0.0, 0.0]), array("Q", [5, 6])
+    files = FileModel.from_columns(["a.txt", os.path.join("s", "b.txt")], sizes, mtimes, inodes)
+    assert files.sizes is sizes
+    assert files.news == ["a.txt", "b.txt"]
+    assert len(files) == 2 and bytes(files.codes) == bytes(2)
+
+
+@pytest.mark.parametrize("query, rows", [
+    (r"\.jpg$", [0]),
+    (r"^holiday", [0]),
+    (r"^img_\d+\.png$", [1]),
+    (r"jpg.*holiday", []),
+])
+def test_regex_anchors_match_either_name(query, rows):
+    files = model(("IMG_001.jpg", 1), ("IMG_002.png", 2))
+    files.set(0, new="Holiday_001.JPG", code=READY)
+    assert RowFilter(files).match(query, regex=True) == rows
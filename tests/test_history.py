@@ -0,0 +1,51 @@
+import json
+import os
+
+from conftest import read_files, write_files
+
+from renamer import Journal, RenameEngine, read_summary, redo_candidate, redo_job, undo_candidate, undo_job
+
+
+def copy_job(src, out, names):
+    os.makedirs(out, exist_ok=True)
+    journal = Journal.create(src, out, "copy", "skip")
+    RenameEngine(src, out, mode="copy").run(
+        [(key, name, "x_" + name) for key, name in enumerate(names)], journal=journal)
+    return journal
+
+
+def test_undo_and_redo_load_only_the_chosen_journal(tmp_path, monkeypatch):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha", "b.txt": "beta"})
+    first = copy_job(src, str(tmp_path / "one"), ["a.txt"])
+    second = copy_job(src, str(tmp_path / "two"), ["b.txt"])
+
+    loaded = []
+    load = Journal.load.__func__
+    monkeypatch.setattr(Journal, "load",
+                        classmethod(lambda cls, path: loaded.append(path) or load(cls, path)))
+
+    assert undo_candidate().path == second.path
+    assert loaded == [second.path]
+    undo_job(undo_candidate())
+    assert read_files(tmp_path / "two") == {}
+    assert undo_candidate().path == first.path
+
+    loaded.clear()
+    assert redo_candidate().path == second.path
+    assert loaded == [second.path]
+    redo_job(redo_candidate())
+    assert read_files(tmp_path / "two") == {"x_b.txt": "beta"}
+    assert redo_candidate() is None
+
+
+def test_journal_without_counts_is_still_found(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    journal = copy_job(src, str(tmp_path / "out"), ["a.txt"])
+    with open(journal.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    with open(journal.path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps({"op": "close"} if record["op"] == "close" else record) + "\n")
+
+    assert read_summary(journal.path).done is None
+    assert undo_candidate().path == journal.path
@@ -0,0 +1,45 @@
+from conftest import read_files, write_files
+
+from renamer import DONE, Journal, RenameEngine, order_renames, undo_job
+from renamer.inplace import TEMP_PREFIX
+
+
+def test_chain_runs_from_its_far_end():
+    chains = order_renames([(0, "a", "b"), (1, "b", "c")])
+    assert chains == [[(1, "b", "c"), (0, "a", "b")]]
+
+
+def test_unrelated_renames_are_separate_chains():
+    chains = order_renames([(0, "a", "x"), (1, "b", "y")])
+    assert sorted(chains) == [[(0, "a", "x")], [(1, "b", "y")]]
+
+
+def test_cycle_parks_one_file():
+    chains = order_renames([(0, "a", "b"), (1, "b", "c"), (2, "c", "a")])
+    assert len(chains) == 1
+    chain = chains[0]
+    assert len(chain) == 4
+    first, last = chain[0], chain[-1]
+    assert first[0] == last[0]
+    assert first[2] == last[1] and TEMP_PREFIX in first[2]
+    # every other step frees the name the next one needs
+    steps = chain[1:-1]
+    assert [dst for _, _, dst in steps] == [first[1]] + [src for _, src, _ in steps[:-1]]
+
+
+def test_engine_rotates_a_cycle_in_place_and_undoes_it(tmp_path):
+    files = {"a.txt": "alpha", "b.txt": "beta", "c.txt": "gamma", "d.txt": "delta"}
+    folder = write_files(tmp_path / "in", files)
+    plan = [(0, "a.txt", "b.txt"), (1, "b.txt", "c.txt"), (2, "c.txt", "a.txt"),
+            (3, "d.txt", "e.txt")]
+    results = {}
+    journal = Journal.create(folder, folder, "move", "skip")
+    engine = RenameEngine(folder, folder, mode="move", conflict="skip")
+    assert engine.in_place
+    engine.run(plan, lambda key, orig, tag, message: results.__setitem__(key, tag), journal=journal)
+
+    assert results == {0: DONE, 1: DONE, 2: DONE, 3: DONE}
+    assert read_files(tmp_path / "in") == {"a.txt": "gamma", "b.txt": "alpha", "c.txt": "beta",
+                                           "e.txt": "delta"}
+    undo_job(Journal.load(journal.path))
+    assert read_files(tmp_path / "in") == files
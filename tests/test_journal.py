@@ -0,0 +1,114 @@
+import os
+import shutil
+
+import pytest
+from conftest import read_files, write_files
+
+import renamer.journal
+from renamer import (
+    DONE, UP_TO_DATE, Journal, RenameEngine, find_unfinished, journal_dir, list_journals,
+    prune_journals, read_summary, undo_job,
+)
+from renamer.engine import replace_with_backup
+
+
+def test_copy_onto_itself_with_overwrite_is_a_no_op(tmp_path):
+    files = {"a.txt": "alpha", "b.txt": "beta"}
+    folder = write_files(tmp_path / "in", files)
+    plan = [(0, "a.txt", "a.txt"), (1, "b.txt", "b.txt")]
+    results = {}
+    engine = RenameEngine(folder, folder, mode="copy", conflict="overwrite")
+    journal = Journal.create(folder, folder, "copy", "overwrite")
+    counts = engine.run(plan, lambda key, orig, tag, message: results.__setitem__(key, tag),
+                        journal=journal)
+
+    assert results == {0: UP_TO_DATE, 1: UP_TO_DATE}
+    assert counts["error"] == 0
+    assert read_files(tmp_path / "in") == files
+
+
+def test_backup_of_the_source_itself_is_refused(tmp_path):
+    folder = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    path = f"{folder}/a.txt"
+    with pytest.raises(shutil.SameFileError):
+        replace_with_backup(path, f"{folder}/./a.txt", str(tmp_path / "backup" / "a.txt"))
+    assert read_files(tmp_path / "in") == {"a.txt": "alpha"}
+
+
+def copy_job(src, out, names, conflict="skip"):
+    os.makedirs(out, exist_ok=True)
+    journal = Journal.create(src, out, "copy", conflict)
+    plan = [(key, name, "x_" + name) for key, name in enumerate(names)]
+    RenameEngine(src, out, mode="copy", conflict=conflict).run(plan, journal=journal)
+    return journal
+
+
+def test_summary_reads_counts_from_the_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(renamer.journal, "JOURNAL_TAIL", 256)
+    names = [f"file{i:04d}.txt" for i in range(200)]
+    src = write_files(tmp_path / "in", {name: name for name in names})
+    journal = copy_job(src, str(tmp_path / "out"), names)
+    assert os.path.getsize(journal.path) > 256
+
+    summary = read_summary(journal.path)
+    assert (summary.closed, summary.undone, summary.done, summary.backups) == (True, False, 200, 0)
+    assert summary.header["input"] == src
+    undo_job(Journal.load(journal.path))
+    assert read_summary(journal.path).undone
+
+
+def test_resume_finds_an_interrupted_job(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha", "b.txt": "beta"})
+    done = copy_job(src, str(tmp_path / "one"), ["a.txt"])
+    (tmp_path / "two").mkdir()
+    interrupted = Journal.create(src, str(tmp_path / "two"), "copy", "skip")
+    interrupted.record_plan([(0, "a.txt", "x_a.txt"), (1, "b.txt", "x_b.txt")])
+    interrupted.record_end(0, "done", "copy")
+    interrupted.close(finished=False)
+
+    journal = find_unfinished()
+    assert journal.path == interrupted.path
+    engine = RenameEngine.from_journal(journal)
+    engine.run(journal.plan, journal=journal)
+    assert read_files(tmp_path / "two") == {"x_b.txt": "beta"}
+    assert find_unfinished() is None
+    assert read_summary(done.path).closed
+
+
+def test_prune_keeps_newest_and_jobs_with_backups(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    out = tmp_path / "out"
+    old = copy_job(src, str(out), ["a.txt"])
+    # replaces x_a.txt, so this job keeps a backup for undo
+    backed_up = copy_job(src, str(out), ["a.txt"], conflict="overwrite")
+    newest = copy_job(src, str(tmp_path / "other"), ["a.txt"])
+    assert read_summary(backed_up.path).backups == 1
+
+    prune_journals(keep=1)
+    assert sorted(list_journals()) == sorted([backed_up.path, newest.path])
+    assert not os.path.exists(old.path)
+    assert os.path.dirname(newest.path) == journal_dir()
+
+
+def test_resume_counts_moves_whose_records_were_lost(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha", "b.txt": "beta"})
+    out = write_files(tmp_path / "out", {"x_b.txt": "old"})
+    plan = [(0, "a.txt", "x_a.txt"), (1, "b.txt", "x_b.txt")]
+    journal = Journal.create(src, out, "move", "overwrite")
+    journal.record_plan(plan, {1})
+    # the crash came after both moves, before their records were flushed
+    os.replace(os.path.join(src, "a.txt"), os.path.join(out, "x_a.txt"))
+    os.makedirs(os.path.dirname(journal.backup_path("x_b.txt")))
+    os.replace(os.path.join(out, "x_b.txt"), journal.backup_path("x_b.txt"))
+    os.replace(os.path.join(src, "b.txt"), os.path.join(out, "x_b.txt"))
+    journal.close(finished=False)
+
+    journal = find_unfinished()
+    results = {}
+    RenameEngine.from_journal(journal).run(
+        journal.plan, lambda key, orig, tag, message: results.__setitem__(key, tag), journal=journal)
+    assert results == {0: DONE, 1: DONE}
+
+    undo_job(Journal.load(journal.path))
+    assert read_files(tmp_path / "in") == {"a.txt": "alpha", "b.txt": "beta"}
+    assert read_files(tmp_path / "out") == {"x_b.txt": "old"}
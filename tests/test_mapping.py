@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from renamer import join_mapping, read_mapping
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_csv_with_bom_skips_rows_without_an_original(tmp_path):
+    path = write(tmp_path, "map.csv", "\ufeffa.txt, x.txt\n,orphan\nshort\n\"b,c.txt\",y.txt\n")
+    assert read_mapping(path) == [("a.txt", "x.txt"), ("b,c.txt", "y.txt")]
+
+
+@pytest.mark.parametrize("name", ["map.tsv", "map.txt"])
+def test_tab_separated(tmp_path, name):
+    assert read_mapping(write(tmp_path, name, "a, 1.txt\tx.txt\n")) == [("a, 1.txt", "x.txt")]
+
+
+@pytest.mark.parametrize("data", [
+    {"a.txt": "x.txt", "b.txt": None},
+    [["a.txt", "x.txt"], ["b.txt", ""]],
+    [{"original": "a.txt", "new": "x.txt"}, {"original": "b.txt"}, {"new": "lost"}],
+])
+def test_json_shapes(tmp_path, data):
+    path = write(tmp_path, "map.json", json.dumps(data))
+    assert read_mapping(path) == [("a.txt", "x.txt"), ("b.txt", "")]
+
+
+def test_bad_json_is_a_value_error(tmp_path):
+    with pytest.raises(ValueError):
+        read_mapping(write(tmp_path, "map.json", json.dumps([1, 2])))
+    with pytest.raises(ValueError):
+        read_mapping(write(tmp_path, "map.json", '"text"'))
+
+
+def test_join_by_path_then_by_unique_file_name():
+    sub = os.path.join("sub", "b.txt")
+    originals = ["a.txt", sub, os.path.join("one", "c.txt"), os.path.join("two", "c.txt"), "d.txt"]
+    result = join_mapping(originals, [
+        ("a.txt", "x.txt"),
+        ("b.txt", "y.txt"),        # found in its subfolder
+        ("c.txt", "z.txt"),        # in two subfolders: not guessed
+        ("sub/b.txt", "y2.txt"),   # "/" works on every platform
+        ("gone.txt", "w.txt"),
+    ])
+    assert result.updates == {0: "x.txt", 1: "y2.txt"}
+    assert result.unknown == ["c.txt", "gone.txt"]
+    assert result.missing == [2, 3, 4]
+    assert result.repeated == 1
+    assert result.summary() == "2 matched, 3 files without a new name, 2 names not found, 1 listed twice"
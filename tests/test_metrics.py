@@ -0,0 +1,57 @@
+import csv
+import json
+
+import pytest
+
+from renamer import Histogram, Metrics
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram()
+    for seconds in [0.000_001] * 90 + [0.001] * 9 + [0.5]:
+        histogram.record(seconds)
+    assert histogram.count == 100
+    assert histogram.max == 0.5
+    assert histogram.total == pytest.approx(0.000_09 + 0.009 + 0.5)
+    # 1us falls in the bucket "below 2us", 1ms in "below 1024us"
+    assert histogram.percentile(50) == 2 / 1_000_000
+    assert histogram.percentile(95) == 1024 / 1_000_000
+    assert histogram.percentile(100) == 0.5
+    assert histogram.to_dict()["buckets"] == {"le_2us": 90, "le_1024us": 9, "le_524288us": 1}
+
+
+def test_empty_histogram():
+    assert Histogram().percentile(95) == 0.0
+    assert Histogram().to_dict()["mean_ms"] == 0.0
+
+
+def test_very_long_samples_go_to_the_last_bucket():
+    histogram = Histogram()
+    histogram.record(10 ** 6)
+    assert histogram.counts[-1] == 1
+
+
+def test_metrics_phases_ops_and_busy_time():
+    metrics = Metrics(workers=2)
+    with metrics.phase("transfer"):
+        metrics.record("copy", 0.01, worker=True)
+        metrics.record("copy", 0.03, worker=True)
+        metrics.record("callback", 0.02)
+    assert metrics.busy == pytest.approx(0.04)
+    assert metrics.ops["copy"].count == 2
+    assert metrics.phase_time("transfer") == metrics.phases["transfer"] > 0
+    snapshot = metrics.snapshot(files=2, bytes_done=2**20)
+    assert snapshot["files"] == 2
+    assert 0 < snapshot["utilisation"] <= 1.0
+    # the bucket bound (32.768ms) is capped by the slowest sample
+    assert snapshot["p95_ms"] == pytest.approx(30.0)
+
+
+def test_metrics_write_json_and_csv(tmp_path):
+    metrics = Metrics()
+    metrics.record("copy", 0.001)
+    data = json.loads(open(metrics.write(str(tmp_path / "m.json"), files=1)).read())
+    assert data["ops"]["copy"]["count"] == 1
+    with open(metrics.write(str(tmp_path / "sub" / "m.csv"))) as f:
+        rows = dict(csv.reader(f))
+    assert rows["ops.copy.count"] == "1"
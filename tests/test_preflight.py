@@ -0,0 +1,37 @@
+from conftest import write_files
+
+from renamer import check_plan
+
+
+def test_invalid_names_are_errors(tmp_path):
+    out = write_files(tmp_path / "out", {})
+    result = check_plan([(0, "a", "a?.txt"), (1, "b", "CON.txt"), (2, "c", "../c.txt"),
+                         (3, "d", "sub/d.txt"), (4, "e", "  ")], out)
+    assert set(result.errors) == {0, 1, 2}
+    assert not result.conflicts and not result.duplicates
+
+
+def test_second_claim_on_a_name_is_a_duplicate(tmp_path):
+    out = write_files(tmp_path / "out", {})
+    result = check_plan([(0, "a", "x.txt"), (1, "b", "y.txt"), (2, "c", "x.txt")], out)
+    assert result.duplicates == {2: 0}
+    assert not result.errors and not result.conflicts
+
+
+def test_existing_destinations_are_conflicts(tmp_path):
+    out = write_files(tmp_path / "out", {"x.txt": "", "sub/y.txt": ""})
+    result = check_plan([(0, "a", "x.txt"), (1, "b", "sub/y.txt"), (2, "c", "sub/z.txt"),
+                         (3, "d", "missing/x.txt")], out)
+    assert result.conflicts == {0: "x.txt", 1: "sub/y.txt"}
+    assert result.summary() == "2 already exist"
+
+
+def test_case_insensitive_output_folds_names(tmp_path):
+    out = write_files(tmp_path / "out", {"Report.TXT": ""})
+    plan = [(0, "a", "report.txt"), (1, "b", "X.txt"), (2, "c", "x.TXT")]
+    folded = check_plan(plan, out, case_insensitive=True)
+    assert folded.conflicts == {0: "report.txt"}
+    assert folded.duplicates == {2: 1}
+
+    exact = check_plan(plan, out, case_insensitive=False)
+    assert not exact.conflicts and not exact.duplicates
@@ -0,0 +1,30 @@
+import json
+import re
+
+import pytest
+from conftest import write_files
+
+from renamer import cli
+from renamer.rules import compile_replacement, make_rule
+
+
+@pytest.mark.parametrize("replacement", [r"\g<missing>", r"\g<5>", r"\3"])
+def test_bad_group_reference_is_a_value_error(replacement):
+    with pytest.raises(ValueError, match="Invalid replacement"):
+        make_rule("regex", "(a)", replacement)
+
+
+def test_cli_reports_bad_group_reference(tmp_path, capsys):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    status = cli.main([src, str(tmp_path / "out"), "--rule", "regex", "(a)", r"\g<missing>"])
+    assert status == 2
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert events[-1]["event"] == "error"
+    assert "unknown group name" in events[-1]["message"]
+
+
+@pytest.mark.parametrize("replacement", [r"x\0y", r"x\07y", r"\1\123", r"\2-\1", r"\g<1>0"])
+def test_compiled_replacement_matches_re(replacement):
+    pattern = re.compile(r"(a)(b)(c)(d)(e)(f)(g)(h)(i)(j)(k)(l)")
+    fast = compile_replacement(pattern, replacement)
+    assert pattern.sub(fast, "abcdefghijkl!") == pattern.sub(replacement, "abcdefghijkl!")
@@ -0,0 +1,81 @@
+import math
+import os
+import threading
+
+from conftest import write_files
+
+from renamer import diff_snapshot, list_files, output_name, walk_files
+
+TREE = {"a.txt": "a", "sub/b.txt": "bb", "sub/deep/c.txt": "ccc", "other/d.txt": ""}
+
+
+def test_walk_finds_every_file_below_the_folder(tmp_path):
+    root = write_files(tmp_path / "in", TREE)
+    os.symlink(os.path.join(root, "sub"), os.path.join(root, "loop"))
+    rows = [row for chunk in walk_files(root, chunk_size=2, workers=3) for row in chunk]
+    expected = {os.path.normpath(name): len(text) for name, text in TREE.items()}
+    assert dict(rows) == expected
+    assert len(rows) == len(expected)
+
+
+def test_list_files_is_flat_unless_recursive(tmp_path):
+    root = write_files(tmp_path / "in", TREE)
+    assert list_files(root) == [("a.txt", 1)]
+    assert [name for name, _ in list_files(root, recursive=True)] == sorted(
+        os.path.normpath(name) for name in TREE)
+
+
+def test_walk_stops_when_cancelled(tmp_path):
+    root = write_files(tmp_path / "in", TREE)
+    cancel = threading.Event()
+    cancel.set()
+    assert list(walk_files(root, cancel=cancel)) == []
+
+
+def test_output_name_layouts():
+    path = os.path.join("sub", "a.txt")
+    assert output_name(path, "b.txt") == os.path.join("sub", "b.txt")
+    assert output_name(path, "b.txt", "flatten") == "b.txt"
+    assert output_name(path, os.path.join("x", "b.txt")) == os.path.join("x", "b.txt")
+    assert output_name("a.txt", "b.txt") == "b.txt"
+
+
+def snapshot(*rows):
+    names, sizes, mtimes, inodes = (list(column) for column in zip(*rows))
+    return names, sizes, mtimes, inodes
+
+
+def test_diff_snapshot_sorts_changes():
+    old = snapshot(("a", 1, 1.0, 11), ("b", 2, 2.0, 12), ("c", 3, 3.0, 13), ("d", 4, 4.0, 14))
+    fresh = [
+        ("a", 1, 1.0, 11),      # untouched
+        ("b", 5, 9.0, 12),      # rewritten
+        ("c2", 3, 3.0, 13),     # c renamed on disk
+        ("e", 6, 6.0, 16),      # new
+    ]
+    diff = diff_snapshot(*old, fresh)
+    assert diff.changed == [(1, 5, 9.0, 12)]
+    assert diff.moved == [(2, ("c2", 3, 3.0, 13))]
+    assert diff.removed == [3]
+    assert diff.added == [("e", 6, 6.0, 16)]
+    assert diff.summary() == "1 new, 1 gone, 1 renamed, 1 changed"
+
+
+def test_unknown_values_compare_equal():
+    old = snapshot(("a", -1, math.nan, 0))
+    diff = diff_snapshot(*old, [("a", None, math.nan, 0)])
+    assert not diff
+    assert diff.summary() == "no changes"
+
+
+def test_files_without_inode_are_never_paired_as_renames():
+    old = snapshot(("a", 1, 1.0, 0))
+    diff = diff_snapshot(*old, [("b", 1, 1.0, 0)])
+    assert diff.moved == []
+    assert diff.removed == [0] and diff.added == [("b", 1, 1.0, 0)]
+
+
+def test_same_inode_with_another_size_is_not_a_rename():
+    old = snapshot(("a", 1, 1.0, 7))
+    diff = diff_snapshot(*old, [("b", 2, 1.0, 7)])
+    assert diff.moved == []
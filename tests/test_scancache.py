@@ -0,0 +1,80 @@
+import os
+from array import array
+
+from conftest import write_files
+
+from renamer import load_scan, save_scan
+from renamer.scancache import MAGIC, cache_path
+
+
+def columns(n):
+    sizes = array("q", range(n))
+    mtimes = array("d", (i / 2 for i in range(n)))
+    inodes = array("Q", range(100, 100 + n))
+    return sizes, mtimes, inodes
+
+
+def test_round_trip_keeps_every_column(tmp_path):
+    folder = write_files(tmp_path / "in", {"a.txt": "", "b.txt": ""})
+    names = ["a.txt", "b.txt", "sub/café.txt", "bad\udcff.txt"]
+    sizes, mtimes, inodes = columns(len(names))
+    save_scan(folder, True, names, sizes, mtimes, inodes)
+
+    cached = load_scan(folder, True)
+    assert cached.fresh
+    assert len(cached) == 4
+    assert cached.originals == names
+    assert (cached.sizes, cached.mtimes, cached.inodes) == (sizes, mtimes, inodes)
+
+
+def test_empty_listing_round_trips(tmp_path):
+    folder = write_files(tmp_path / "in", {})
+    save_scan(folder, False, [], *columns(0))
+    cached = load_scan(folder, False)
+    assert cached.originals == []
+    assert cached.fresh
+
+
+def test_folder_change_marks_the_cache_stale(tmp_path):
+    folder = write_files(tmp_path / "in", {"a.txt": ""})
+    save_scan(folder, False, ["a.txt"], *columns(1))
+    st = os.stat(folder)
+    os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+
+    cached = load_scan(folder, False)
+    assert cached.originals == ["a.txt"]
+    assert not cached.fresh
+
+
+def test_recursive_and_flat_listings_are_cached_apart(tmp_path):
+    folder = write_files(tmp_path / "in", {"a.txt": "", "sub/b.txt": ""})
+    save_scan(folder, False, ["a.txt"], *columns(1))
+    assert cache_path(folder, False) != cache_path(folder, True)
+    assert load_scan(folder, True) is None
+
+    save_scan(folder, True, ["a.txt", "sub/b.txt"], *columns(2))
+    assert load_scan(folder, False).originals == ["a.txt"]
+    assert load_scan(folder, True).originals == ["a.txt", "sub/b.txt"]
+
+
+def test_damaged_or_foreign_cache_is_ignored(tmp_path):
+    folder = write_files(tmp_path / "in", {"a.txt": ""})
+    assert load_scan(folder, False) is None
+    path = save_scan(folder, False, ["a.txt"], *columns(1))
+    with open(path, "rb") as f:
+        data = f.read()
+
+    truncated = (data[:len(MAGIC) + 2], data[:-3])
+    for damaged in (b"", b"garbage", *truncated, MAGIC + data[len(MAGIC) + 2:]):
+        with open(path, "wb") as f:
+            f.write(damaged)
+        assert load_scan(folder, False) is None
+
+
+def test_cache_of_a_replaced_folder_is_ignored(tmp_path):
+    folder = write_files(tmp_path / "in", {"a.txt": ""})
+    save_scan(folder, False, ["a.txt"], *columns(1))
+    os.rename(folder, tmp_path / "old")
+    write_files(tmp_path / "in", {"a.txt": ""})
+    # same path, but another directory: its inode differs
+    assert load_scan(folder, False) is None
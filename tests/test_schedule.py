@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import Future
+
+from conftest import read_files, write_files
+
+import renamer.engine
+import renamer.schedule
+from renamer import DONE, RenameEngine
+from renamer.schedule import ResultQueue, disk_layout, disk_order
+
+
+def test_disk_order_puts_unplaced_rows_first_then_sorts_by_device_and_position():
+    plan = [(0, "a", "a"), (1, "b", "b"), (2, "c", "c"), (3, "d", "d"), (4, "e", "e")]
+    layout = {0: (10, 2, 5), 1: (10, 1, 900), 3: (10, 1, 7), 4: (10, 2, 1)}
+    assert [row[0] for row in disk_order(plan, layout)] == [2, 3, 1, 4, 0]
+
+
+def test_extent_layout_falls_back_to_the_inode(tmp_path, monkeypatch):
+    folder = write_files(tmp_path / "in", {"a.txt": "alpha", "b.txt": "beta", "empty.txt": ""})
+    paths = {name: os.path.join(folder, name) for name in ("a.txt", "b.txt", "empty.txt")}
+    asked = []
+
+    def physical_offset(path):
+        asked.append(os.path.basename(path))
+        return 4096 if path == paths["a.txt"] else None
+
+    monkeypatch.setattr(renamer.schedule, "physical_offset", physical_offset)
+    rows = [(0, paths["a.txt"]), (1, paths["b.txt"]), (2, paths["empty.txt"]),
+            (3, os.path.join(folder, "missing.txt"))]
+    layout = disk_layout(rows, "extent")
+
+    # empty files have no extent to ask about, missing ones no layout at all
+    assert sorted(asked) == ["a.txt", "b.txt"]
+    assert set(layout) == {0, 1, 2}
+    assert layout[0] == (5, os.stat(paths["a.txt"]).st_dev, 4096)
+    assert layout[1][2] == os.stat(paths["b.txt"]).st_ino
+    assert layout[2][2] == os.stat(paths["empty.txt"]).st_ino
+    assert disk_layout(rows[:2], "inode")[0][2] == os.stat(paths["a.txt"]).st_ino
+
+
+def run_batched(tmp_path, monkeypatch, files):
+    """Run a scheduled copy of files and return the sizes of its batches."""
+    batches = []
+    submit = RenameEngine._submit_batch
+
+    def record(self, executor, batch):
+        batches.append(len(batch))
+        return submit(self, executor, batch)
+
+    monkeypatch.setattr(RenameEngine, "_submit_batch", record)
+    src = write_files(tmp_path / "in", files)
+    out = tmp_path / "out"
+    out.mkdir()
+    plan = [(i, name, name) for i, name in enumerate(sorted(files))]
+    engine = RenameEngine(src, str(out), mode="copy", workers=4, schedule="inode")
+    counts = engine.run(plan)
+    assert counts[DONE] == len(files)
+    assert read_files(out) == files
+    return batches
+
+
+def test_batches_close_at_the_file_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(renamer.engine, "BATCH_FILES", 4)
+    files = {f"{i:02}.txt": "x" * 10 for i in range(10)}
+    assert run_batched(tmp_path, monkeypatch, files) == [4, 4, 2]
+
+
+def test_batches_close_at_the_byte_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(renamer.engine, "BATCH_BYTES", 25)
+    files = {f"{i:02}.txt": "x" * 10 for i in range(7)}
+    assert run_batched(tmp_path, monkeypatch, files) == [3, 3, 1]
+
+
+def test_files_over_the_small_limit_are_not_batched(tmp_path, monkeypatch):
+    monkeypatch.setattr(renamer.engine, "SMALL_FILE", 50)
+    files = {"big.txt": "x" * 100, "a.txt": "x", "b.txt": "y"}
+    assert run_batched(tmp_path, monkeypatch, files) == [2]
+
+
+def entries(*results):
+    return [(key, f"{key}.txt", f"{key}.txt", result) for key, result in enumerate(results)]
+
+
+def test_ordered_queue_keeps_submission_order():
+    first, second = Future(), Future()
+    rows = entries(first, second, (DONE, "", "copy"))
+    pending = ResultQueue(ordered=True)
+    for row in rows:
+        pending.add(row)
+
+    # the head isn't done, nothing behind it may pass
+    assert list(pending.take(3)) == []
+    # over block_until the caller gets the head to wait on
+    assert list(pending.take(2)) == rows[:1]
+    assert len(pending) == 2
+    second.set_result(None)
+    assert list(pending.take(2)) == rows[1:]
+    assert len(pending) == 0
+
+
+def test_unordered_queue_hands_back_rows_as_they_finish():
+    first, second = Future(), Future()
+    rows = entries(first, second, (DONE, "", "copy"))
+    pending = ResultQueue(ordered=False)
+    for row in rows:
+        pending.add(row)
+    second.set_result(None)
+
+    assert [row[0] for row in pending.take(1)] == [2, 1]
+    assert len(pending) == 1
+    first.set_result(None)
+    assert list(pending.take(0)) == rows[:1]
+    assert len(pending) == 0
@@ -0,0 +1,51 @@
+import os
+import time
+
+from conftest import read_files, write_files
+
+from renamer import DONE, UP_TO_DATE, Journal, RenameEngine, undo_job
+
+PLAN = [(0, "a.txt", "a.txt"), (1, "b.txt", "b.txt")]
+
+
+def run_sync(src, out, journal=None):
+    results = {}
+    engine = RenameEngine(src, out, mode="copy", conflict="skip", sync="quick")
+    engine.run(PLAN, lambda key, orig, tag, message: results.__setitem__(key, tag),
+               journal=journal)
+    return results
+
+
+def test_changed_source_is_copied_again_despite_skip(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha", "b.txt": "beta"})
+    out = tmp_path / "out"
+    out.mkdir()
+    assert run_sync(src, str(out)) == {0: DONE, 1: DONE}
+
+    (tmp_path / "in" / "b.txt").write_text("beta, edited")
+    later = time.time() + 10
+    os.utime(tmp_path / "in" / "b.txt", (later, later))
+
+    assert run_sync(src, str(out)) == {0: UP_TO_DATE, 1: DONE}
+    assert read_files(out) == {"a.txt": "alpha", "b.txt": "beta, edited"}
+
+
+def test_replaced_stale_destination_is_backed_up(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha", "b.txt": "beta"})
+    out = write_files(tmp_path / "out", {"a.txt": "old alpha"})
+
+    journal = Journal.create(src, out, "copy", "skip", sync="quick")
+    assert run_sync(src, out, journal) == {0: DONE, 1: DONE}
+    assert read_files(tmp_path / "out") == {"a.txt": "alpha", "b.txt": "beta"}
+
+    undo_job(Journal.load(journal.path))
+    assert read_files(tmp_path / "out") == {"a.txt": "old alpha"}
+
+
+def test_changed_destination_does_not_trip_abort(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    out = write_files(tmp_path / "out", {"a.txt": "old"})
+    engine = RenameEngine(src, out, mode="copy", conflict="abort", sync="quick")
+    counts = engine.run([(0, "a.txt", "a.txt")])
+    assert counts[DONE] == 1
+    assert read_files(tmp_path / "out") == {"a.txt": "alpha"}
@@ -0,0 +1,73 @@
+import pytest
+
+import renamer.throttle
+from renamer import RateLimiter, TokenBucket
+from renamer.throttle import MIN_THROTTLED_CHUNK
+
+
+class Clock:
+    """Stands in for the time module: sleeping just moves the clock on."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(renamer.throttle, "time", clock)
+    return clock
+
+
+def test_unlimited_bucket_never_waits(clock):
+    assert TokenBucket().take(10 ** 9) == 0.0
+
+
+def test_full_bucket_allows_one_burst_then_paces(clock):
+    bucket = TokenBucket(100)
+    assert bucket.take(100) == 0.0
+    assert bucket.take(50) == pytest.approx(0.5)
+    # idle time refills, but never past one second's worth
+    clock.sleep(60)
+    assert bucket.take(100) == 0.0
+    assert bucket.take(100) == pytest.approx(1.0)
+
+
+def test_request_larger_than_the_bucket_goes_through(clock):
+    bucket = TokenBucket(10)
+    assert bucket.take(35) == pytest.approx(2.5)
+
+
+def test_stop_ends_the_wait(clock):
+    bucket = TokenBucket(1)
+    bucket.take(1)
+    assert bucket.take(100, stop=lambda: clock.now > 1000.25) == pytest.approx(0.3)
+
+
+def test_lifting_the_limit_ends_the_wait(clock):
+    bucket = TokenBucket(10)
+    bucket.take(10)
+    bucket.set_rate(0)
+    assert bucket.take(1000) == 0.0
+
+
+def test_rate_limiter_limits_and_chunks(clock):
+    limiter = RateLimiter()
+    assert limiter.unlimited
+    assert limiter.chunk_size(8 * 2**20) == 8 * 2**20
+
+    limiter.set_limits(mb_per_s=4)
+    assert limiter.limits == (4.0, 0)
+    assert limiter.chunk_size(8 * 2**20) == int(4 * 2**20 * 0.1)
+    limiter.set_limits(mb_per_s=0.1)
+    assert limiter.chunk_size(8 * 2**20) == MIN_THROTTLED_CHUNK
+
+    limiter.set_limits(files_per_s=2)
+    assert limiter.limits == (0.1, 2)
+    assert [limiter.wait_file() for _ in range(3)] == [0.0, 0.0, pytest.approx(0.5)]
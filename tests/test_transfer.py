@@ -0,0 +1,162 @@
+import errno
+import json
+import os
+
+import pytest
+from conftest import read_files, write_files
+
+import renamer.engine
+from renamer import DONE, ERROR, Journal, RenameEngine, copy_file, find_unfinished, transfer_file
+from renamer.cli import main
+
+
+def test_auto_never_hardlinks(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    dst = tmp_path / "out"
+    dst.mkdir()
+    how = transfer_file(os.path.join(src, "a.txt"), str(dst / "a.txt"), "auto")
+    assert how in ("copy", "reflink")
+    assert os.stat(dst / "a.txt").st_ino != os.stat(os.path.join(src, "a.txt")).st_ino
+    assert os.stat(os.path.join(src, "a.txt")).st_nlink == 1
+
+
+@pytest.mark.parametrize("mode", ["copy", "reflink", "auto"])
+def test_rerun_over_hardlinked_output_keeps_sources(tmp_path, mode):
+    files = {"a.txt": "alpha", "b.txt": "beta"}
+    src = write_files(tmp_path / "in", files)
+    out = tmp_path / "out"
+    out.mkdir()
+    for name in files:
+        os.link(os.path.join(src, name), out / name)
+
+    plan = [(0, "a.txt", "a.txt"), (1, "b.txt", "b.txt")]
+    engine = RenameEngine(src, str(out), mode=mode, conflict="overwrite")
+    counts = engine.run(plan)
+
+    assert read_files(tmp_path / "in") == files
+    assert read_files(out) == files
+    assert counts["done"] == 0
+
+
+def test_reflink_overwrite_in_same_folder_keeps_sources(tmp_path):
+    files = {"a.txt": "alpha", "b.txt": "beta"}
+    folder = write_files(tmp_path / "in", files)
+    code = main([folder, folder, "--mode", "reflink", "--on-conflict", "overwrite",
+                 "--no-journal", "--quiet"])
+    assert read_files(tmp_path / "in") == files
+    assert code in (0, 1)
+
+
+def test_move_between_devices_keeps_source_until_verified(tmp_path):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    dst = tmp_path / "out"
+    dst.mkdir()
+
+    def corrupt(path):
+        raise OSError(5, "Checksum mismatch after copy", path)
+
+    with pytest.raises(OSError):
+        transfer_file(os.path.join(src, "a.txt"), str(dst / "a.txt"), "move", same_dev=False,
+                      verify=corrupt)
+    assert read_files(tmp_path / "in") == {"a.txt": "alpha"}
+
+
+def test_failed_verify_fails_move_and_keeps_source(tmp_path, monkeypatch):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    out = tmp_path / "out"
+    out.mkdir()
+
+    def mismatch(dst, *args):
+        raise OSError(5, "Checksum mismatch after copy", dst)
+
+    monkeypatch.setattr(renamer.engine, "same_device", lambda a, b: False)
+    monkeypatch.setattr(renamer.engine, "check_copy", mismatch)
+    results = {}
+    engine = RenameEngine(src, str(out), mode="move", verify="sha256")
+    engine.run([(0, "a.txt", "b.txt")], lambda key, orig, tag, message: results.__setitem__(key, tag))
+    assert results == {0: ERROR}
+    assert read_files(tmp_path / "in") == {"a.txt": "alpha"}
+
+
+def test_manifest_failure_is_a_job_error(tmp_path, monkeypatch):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+
+    def unwritable(*args, **kwargs):
+        raise PermissionError(13, "Permission denied")
+
+    monkeypatch.setattr(renamer.engine.Manifest, "for_job", unwritable)
+    journal = Journal.create(src, str(tmp_path / "out"), "copy", "skip", verify="sha256")
+    engine = RenameEngine(src, str(tmp_path / "out"), mode="copy", verify="sha256")
+    counts = engine.run([(0, "a.txt", "b.txt")], journal=journal)
+    assert counts[DONE] == 0
+    assert "Permission denied" in engine.error
+    assert find_unfinished() is None
+
+
+def test_cli_reports_job_failure(tmp_path, capsys, monkeypatch):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(renamer.engine.RenameEngine, "run", broken)
+    assert main([src, str(tmp_path / "out"), "--prefix", "x_"]) == 2
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert {"event": "error", "message": "disk on fire"} in events
+    assert any(event["event"] == "summary" and event["stopped"] for event in events)
+
+
+@pytest.mark.parametrize("error", [errno.EXDEV, errno.EPERM, errno.EMLINK])
+def test_hardlink_falls_back_to_a_copy(tmp_path, monkeypatch, error):
+    src = write_files(tmp_path / "in", {"a.txt": "alpha"})
+    dst = tmp_path / "out"
+    dst.mkdir()
+
+    def refuse(src, dst):
+        raise OSError(error, os.strerror(error))
+
+    monkeypatch.setattr(os, "link", refuse)
+    how = transfer_file(os.path.join(src, "a.txt"), str(dst / "a.txt"), "hardlink")
+    assert how == "copy"
+    assert read_files(dst) == {"a.txt": "alpha"}
+    assert os.stat(os.path.join(src, "a.txt")).st_nlink == 1
+
+
+DATA = bytes(range(256)) * 1000
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 4096, 1 << 20])
+def test_copy_file_copies_bytes_and_metadata(tmp_path, chunk_size):
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.bin"
+    src.write_bytes(DATA)
+    os.utime(src, (1_000_000, 1_000_000))
+    seen = []
+    copy_file(str(src), str(dst), chunk_size, on_bytes=seen.append)
+    assert dst.read_bytes() == DATA
+    assert sum(seen) == len(DATA)
+    assert os.stat(dst).st_mtime == 1_000_000
+
+
+def test_copy_file_without_kernel_copy(tmp_path, monkeypatch):
+    def unsupported(*args):
+        raise OSError(errno.ENOSYS, "not here")
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+    monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.bin"
+    src.write_bytes(DATA)
+    (tmp_path / "empty").write_bytes(b"")
+    seen = []
+    copy_file(str(src), str(dst), 3000, on_bytes=seen.append)
+    copy_file(str(tmp_path / "empty"), str(tmp_path / "empty.copy"))
+    assert dst.read_bytes() == DATA
+    assert max(seen) == 3000 and sum(seen) == len(DATA)
+    assert (tmp_path / "empty.copy").read_bytes() == b""
+
+
+def test_copy_file_throttles_every_chunk(tmp_path):
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.bin"
+    src.write_bytes(DATA)
+    throttled = []
+    copy_file(str(src), str(dst), 50_000, throttle=throttled.append)
+    assert sum(throttled) == len(DATA) and max(throttled) <= 50_000
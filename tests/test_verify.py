@@ -0,0 +1,80 @@
+import errno
+import hashlib
+import os
+
+import pytest
+from conftest import read_files, write_files
+
+from renamer import DONE, Manifest, RenameEngine, StreamHash, check_copy, copy_file, hash_file
+
+
+def test_stream_hash_matches_hashlib_and_counts_bytes():
+    digest = StreamHash("sha256")
+    digest.update(b"hello ")
+    digest.update(memoryview(b"world"))
+    assert digest.name == "sha256"
+    assert digest.size == 11
+    assert digest.hexdigest() == hashlib.sha256(b"hello world").hexdigest()
+
+    digest.reset()
+    assert digest.size == 0
+    assert digest.hexdigest() == hashlib.sha256().hexdigest()
+
+
+def test_copy_feeds_the_digest_it_is_given(tmp_path):
+    src = write_files(tmp_path / "in", {"a.bin": "x" * 100_000})
+    dst = str(tmp_path / "a.bin")
+    digest = StreamHash("fast")
+    copy_file(os.path.join(src, "a.bin"), dst, chunk_size=4096, digest=digest)
+
+    assert digest.size == 100_000
+    assert check_copy(dst, digest, "fast") == hash_file(os.path.join(src, "a.bin"), "fast")
+
+
+def test_check_copy_raises_eio_when_readback_differs(tmp_path):
+    dst = tmp_path / "a.txt"
+    dst.write_bytes(b"on disk")
+    digest = StreamHash("sha256")
+    digest.update(b"streamed")
+
+    with pytest.raises(OSError) as info:
+        check_copy(str(dst), digest, "sha256")
+    assert info.value.errno == errno.EIO
+    # without readback the streamed digest is trusted
+    assert check_copy(str(dst), digest, "sha256", readback=False) == digest.hexdigest()
+
+
+def test_check_copy_hashes_the_file_when_nothing_was_streamed(tmp_path):
+    dst = tmp_path / "a.txt"
+    dst.write_bytes(b"linked")
+    digest = check_copy(str(dst), StreamHash("sha256"), "sha256")
+    assert digest == hashlib.sha256(b"linked").hexdigest()
+
+
+def test_manifest_uses_sha256sum_format_and_appends(tmp_path):
+    manifest = Manifest.for_job(str(tmp_path), "sha256", job_id="job1")
+    manifest.add(os.path.join("sub", "a.txt"), "ab" * 32)
+    manifest.close()
+    assert manifest.path == str(tmp_path / "checksums-job1.sha256")
+
+    manifest = Manifest.for_job(str(tmp_path), "sha256", job_id="job1", append=True)
+    manifest.add("b.txt", "cd" * 32)
+    manifest.close()
+    with open(manifest.path, "rb") as f:
+        assert f.read() == f"{'ab' * 32}  sub/a.txt\n{'cd' * 32}  b.txt\n".encode()
+
+
+def test_verified_job_lists_every_copy_in_its_manifest(tmp_path):
+    files = {"a.txt": "alpha", "b.txt": "beta"}
+    src = write_files(tmp_path / "in", files)
+    out = tmp_path / "out"
+    out.mkdir()
+    engine = RenameEngine(src, str(out), mode="copy", verify="sha256")
+    counts = engine.run([(0, "a.txt", "x.txt"), (1, "b.txt", "y.txt")])
+
+    assert counts[DONE] == 2
+    with open(engine.manifest_path, encoding="utf-8") as f:
+        lines = sorted(f.read().splitlines())
+    assert lines == sorted(f"{hashlib.sha256(files[orig].encode()).hexdigest()}  {new}"
+                           for orig, new in (("a.txt", "x.txt"), ("b.txt", "y.txt")))
+    assert read_files(out)["x.txt"] == "alpha"